@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+#
+#  engines.py
+"""
+Compare the speed of the :class:`~flake8_dunder_all.Visitor`, :class:`~flake8_dunder_all.Scanner`
+and :class:`~flake8_dunder_all.TokenScanner` engines.
+
+The times for :class:`~flake8_dunder_all.TokenScanner` include tokenizing the source,
+whereas the others are given an already parsed module.
+
+Run with ``python benchmarks/engines.py``.
+"""
+
+# stdlib
+import ast
+import os
+import sys
+import timeit
+from typing import Dict
+
+# this package
+from flake8_dunder_all import Engine, TokenScanner
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# this package
+from synthetic import many_defs  # noqa: E402  # isort: skip
+
+__all__ = ("main", )
+
+
+def main() -> None:  # noqa: D103
+	for n_defs in (100, 1_000, 10_000):
+		source = many_defs(n_defs)
+		tree = ast.parse(source)
+		timings: Dict[Engine, float] = {}
+
+		for engine in (Engine.VISITOR, Engine.SCANNER):
+
+			def run(engine: Engine = engine) -> None:
+				engine.make_visitor(use_endlineno=True).visit(tree)
+
+			timings[engine] = min(timeit.repeat(run, number=5, repeat=5)) / 5
+
+		def scan() -> None:
+			TokenScanner().scan(source)
+
+		timings[Engine.TOKENIZE] = min(timeit.repeat(scan, number=5, repeat=5)) / 5
+
+		speedup = timings[Engine.VISITOR] / timings[Engine.SCANNER]
+		print(
+				f"{n_defs:>6} defs:",
+				*(f"{engine.value} {timing * 1000:8.3f}ms" for engine, timing in timings.items()),
+				f"speedup {speedup:.1f}x",
+				)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
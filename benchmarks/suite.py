@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+#
+#  suite.py
+"""
+Microbenchmarks for :class:`~flake8_dunder_all.Visitor`, :class:`~flake8_dunder_all.TokenScanner`,
+:meth:`Plugin.run() <flake8_dunder_all.Plugin.run>` and :func:`~flake8_dunder_all.check_and_add_all`.
+
+Run with ``python benchmarks/suite.py``. Results can be saved as JSON with ``--output``,
+and compared against previously saved results with ``--baseline``.
+"""
+
+# stdlib
+import argparse
+import ast
+import functools
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# this package
+from flake8_dunder_all import AlphabeticalOptions, Engine, Plugin, TokenScanner, check_and_add_all
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# this package
+from synthetic import SHAPES  # noqa: E402  # isort: skip
+
+__all__ = ("Benchmark", "collect", "compare", "main", "measure")
+
+
+class Benchmark(NamedTuple):
+	"""
+	A single benchmark.
+	"""
+
+	#: The name of the benchmark.
+	name: str
+
+	#: The function being timed.
+	run: Callable[[], object]
+
+	#: Called before each call of ``run``, but not timed.
+	setup: Optional[Callable[[], object]] = None
+
+
+@functools.lru_cache(maxsize=None)
+def _source(shape: str) -> str:
+	return SHAPES[shape]()
+
+
+@functools.lru_cache(maxsize=None)
+def _tree(shape: str) -> ast.Module:
+	return ast.parse(_source(shape))
+
+
+@functools.lru_cache(maxsize=None)
+def _without_all(shape: str) -> str:
+	return re.sub(r"^__all__ = \[.*?\]\n", '', _source(shape), flags=re.MULTILINE | re.DOTALL)
+
+
+def _write(filename: str, source: str) -> None:
+	with open(filename, 'w', encoding="UTF-8") as fp:
+		fp.write(source)
+
+
+def collect(tmpdir: str) -> Iterator[Benchmark]:
+	"""
+	Returns an iterator over the benchmarks.
+
+	The synthetic modules are only constructed when a benchmark which uses them is first run.
+
+	:param tmpdir: A directory for the files used by the :func:`~flake8_dunder_all.check_and_add_all` benchmarks.
+	"""
+
+	for shape in SHAPES:
+		for engine in (Engine.VISITOR, Engine.SCANNER):
+			yield Benchmark(
+					f"visit[{engine.value}-{shape}]",
+					lambda engine=engine, shape=shape: engine.make_visitor(use_endlineno=True).visit(_tree(shape)),
+					)
+
+		yield Benchmark(f"scan[tokenize-{shape}]", lambda shape=shape: TokenScanner().scan(_source(shape)))
+
+	for option in AlphabeticalOptions:
+
+		def run_plugin(option: AlphabeticalOptions = option) -> None:
+			plugin = Plugin(_tree("huge_all"), _source("huge_all").splitlines(keepends=True))
+			plugin.dunder_all_alphabetical = option
+			list(plugin.run())
+
+		yield Benchmark(f"plugin.run[{option.value}-huge_all]", run_plugin)
+
+	for shape in SHAPES:
+		filename = os.path.join(tmpdir, f"{shape}.py")
+		noop_filename = os.path.join(tmpdir, f"{shape}_noop.py")
+
+		yield Benchmark(
+				f"check_and_add_all[insert-{shape}]",
+				lambda filename=filename: check_and_add_all(filename),
+				lambda filename=filename, shape=shape: _write(filename, _without_all(shape)),
+				)
+
+		yield Benchmark(
+				f"check_and_add_all[noop-{shape}]",
+				lambda filename=noop_filename: check_and_add_all(filename),
+				lambda filename=noop_filename, shape=shape: _write(filename, f"__all__ = []\n{_without_all(shape)}"),
+				)
+
+
+def measure(benchmark: Benchmark, min_rounds: int = 5, max_time: float = 1.0) -> Dict[str, float]:
+	"""
+	Time ``benchmark``, calling it at least ``min_rounds`` times and for up to ``max_time`` seconds.
+
+	:param benchmark:
+	:param min_rounds:
+	:param max_time:
+
+	:returns: Statistics about the time taken for each call, in seconds.
+	"""
+
+	timings: List[float] = []
+	deadline = time.perf_counter() + max_time
+
+	while len(timings) < min_rounds or time.perf_counter() < deadline:
+		if benchmark.setup is not None:
+			benchmark.setup()
+
+		start = time.perf_counter()
+		benchmark.run()
+		timings.append(time.perf_counter() - start)
+
+	return {
+			"min": min(timings),
+			"median": statistics.median(timings),
+			"mean": statistics.mean(timings),
+			"stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+			"rounds": len(timings),
+			}
+
+
+def compare(
+		results: Dict[str, Dict[str, float]],
+		baseline: Dict[str, Dict[str, float]],
+		threshold: float = 0.1,
+		) -> Tuple[List[str], List[str]]:
+	"""
+	Compare ``results`` with ``baseline``, using the fastest time of each benchmark.
+
+	:param results:
+	:param baseline:
+	:param threshold: The fraction by which a benchmark may be slower than the baseline before it is a regression.
+
+	:returns: A report with one line per benchmark, and the names of any benchmarks which regressed.
+	"""
+
+	report = []
+	regressions = []
+
+	for name, stats in results.items():
+		if name not in baseline:
+			report.append(f"{name:<45} {stats['min'] * 1000:10.3f}ms  (new)")
+			continue
+
+		ratio = stats["min"] / baseline[name]["min"]
+		marker = ''
+		if ratio > 1 + threshold:
+			regressions.append(name)
+			marker = "  REGRESSION"
+
+		report.append(f"{name:<45} {stats['min'] * 1000:10.3f}ms  {ratio:6.2f}x baseline{marker}")
+
+	return report, regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:  # noqa: D103
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("-k", "--filter", help="Only run benchmarks whose name contains this string.")
+	parser.add_argument("-o", "--output", help="Save the results as JSON to this file.")
+	parser.add_argument("-b", "--baseline", help="Compare the results with those saved in this file.")
+	parser.add_argument(
+			"--threshold",
+			type=float,
+			default=0.1,
+			help="The fraction by which a benchmark may be slower than the baseline. Default 0.1.",
+			)
+	parser.add_argument(
+			"--max-time",
+			type=float,
+			default=1.0,
+			help="The maximum time to spend on each benchmark, in seconds. Default 1.0.",
+			)
+	parser.add_argument("--min-rounds", type=int, default=5, help="The minimum number of rounds. Default 5.")
+	args = parser.parse_args(argv)
+
+	results: Dict[str, Dict[str, float]] = {}
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		for benchmark in collect(tmpdir):
+			if args.filter and args.filter not in benchmark.name:
+				continue
+
+			results[benchmark.name] = measure(benchmark, min_rounds=args.min_rounds, max_time=args.max_time)
+
+			if not args.baseline:
+				stats = results[benchmark.name]
+				print(f"{benchmark.name:<45} {stats['min'] * 1000:10.3f}ms  ({stats['rounds']} rounds)")
+
+	if args.output:
+		document = {
+				"python": platform.python_version(),
+				"implementation": platform.python_implementation(),
+				"machine": platform.machine(),
+				"benchmarks": results,
+				}
+		with open(args.output, 'w', encoding="UTF-8") as fp:
+			json.dump(document, fp, indent=2)
+			fp.write('\n')
+
+	if args.baseline:
+		with open(args.baseline, encoding="UTF-8") as fp:
+			baseline = json.load(fp)["benchmarks"]
+
+		report, regressions = compare(results, baseline, threshold=args.threshold)
+		print('\n'.join(report))
+
+		if regressions:
+			print(f"{len(regressions)} benchmark(s) slower than the baseline.", file=sys.stderr)
+			return 1
+
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+#  synthetic.py
+"""
+Synthetic modules of various shapes, used by the benchmarks.
+"""
+
+# stdlib
+from typing import Callable, Dict
+
+__all__ = ("SHAPES", "deep_imports", "heavy_decorators", "huge_all", "many_defs")
+
+
+def many_defs(n_defs: int) -> str:
+	"""
+	Construct the source of a large module, with ``n_defs`` functions and classes.
+
+	:param n_defs:
+	"""
+
+	parts = ['"""A large module."""', "import sys", "from typing import TYPE_CHECKING, overload"]
+
+	parts.append("if TYPE_CHECKING:\n\tfrom collections import OrderedDict")
+	parts.append("try:\n\timport ujson as json\nexcept ImportError:\n\timport json")
+
+	for idx in range(n_defs):
+		parts.append(f"@overload\ndef function_{idx}(x: int) -> int: ...")
+		parts.append(f"@decorator.one\n@decorator.two(3)\ndef function_{idx}(x):\n\ty = x * 2\n\treturn y")
+		parts.append(f"class Class{idx}:\n\tattr = {idx}\n\n\tdef method(self):\n\t\treturn self.attr")
+
+	return "\n\n\n".join(parts) + '\n'
+
+
+def huge_all(n_names: int) -> str:
+	"""
+	Construct the source of a module with ``n_names`` functions, all listed in a sorted ``__all__``.
+
+	The names mix upper and lower case and embedded numbers, so they sort the same way with every
+	:class:`~flake8_dunder_all.AlphabeticalOptions` option.
+
+	:param n_names:
+	"""
+
+	names = [f"func_{idx:06d}" for idx in range(n_names)]
+	entries = ''.join(f"\t\t{name!r},\n" for name in names)
+	parts = ["import os", f"__all__ = [\n{entries}\t\t]"]
+	parts.extend(f"def {name}():\n\treturn os.sep" for name in names)
+
+	return "\n\n\n".join(parts) + '\n'
+
+
+def deep_imports(depth: int, width: int = 10) -> str:
+	"""
+	Construct the source of a module with imports nested ``depth`` levels deep
+	in alternating ``if TYPE_CHECKING:`` and ``try`` blocks.
+
+	:param depth:
+	:param width: The number of import statements at each level.
+	"""
+
+	lines = ["from typing import TYPE_CHECKING"]
+
+	for level in range(depth):
+		indent = '\t' * level
+		if level % 2:
+			lines.append(f"{indent}try:")
+		else:
+			lines.append(f"{indent}if TYPE_CHECKING:")
+		lines.extend(f"{indent}\timport module_{level}_{idx}" for idx in range(width))
+
+	for level in reversed(range(depth)):
+		if level % 2:
+			indent = '\t' * level
+			lines.append(f"{indent}except ImportError:")
+			lines.append(f"{indent}\tpass")
+
+	lines.extend(f"\n\ndef function_{idx}():\n\treturn {idx}" for idx in range(width))
+
+	return '\n'.join(lines) + '\n'
+
+
+def heavy_decorators(n_defs: int, n_decorators: int = 10) -> str:
+	"""
+	Construct the source of a module with ``n_defs`` functions, each with ``n_decorators`` decorators.
+
+	:param n_defs:
+	:param n_decorators:
+	"""
+
+	decorators = ''.join(f"@decorators.decorator_{idx}(arg={idx}, key='value')\n" for idx in range(n_decorators))
+	parts = ["import decorators"]
+	parts.extend(f"{decorators}def function_{idx}(a, b, *args, **kwargs):\n\treturn a + b" for idx in range(n_defs))
+
+	return "\n\n\n".join(parts) + '\n'
+
+
+#: The shapes of module used by the benchmarks, at the sizes used by the benchmarks.
+SHAPES: Dict[str, Callable[[], str]] = {
+		"many_defs": lambda: many_defs(2_000),
+		"huge_all": lambda: huge_all(5_000),
+		"deep_imports": lambda: deep_imports(50, width=20),
+		"heavy_decorators": lambda: heavy_decorators(1_000),
+		}
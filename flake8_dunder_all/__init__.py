@@ -31,39 +31,67 @@ A Flake8 plugin and pre-commit hook which checks to ensure modules have defined
 
 # stdlib
 import ast
+import functools
+import io
+import itertools
+import marshal
+import os
 import sys
+import tokenize
 from enum import Enum
-from typing import TYPE_CHECKING, Any, Generator, Iterator, List, Optional, Sequence, Set, Tuple, Type, Union, cast
-
-# 3rd party
-import natsort
-from consolekit.terminal_colours import Fore
-from domdf_python_tools.paths import PathPlus
-from domdf_python_tools.typing import PathLike
-from domdf_python_tools.utils import stderr_writer
-from flake8.options.manager import OptionManager  # type: ignore[import-untyped]
+from typing import (
+		TYPE_CHECKING,
+		Any,
+		Callable,
+		Dict,
+		Generator,
+		Iterable,
+		Iterator,
+		List,
+		NamedTuple,
+		Optional,
+		Sequence,
+		Set,
+		TextIO,
+		Tuple,
+		Type,
+		Union,
+		cast
+		)
 
 # this package
-from flake8_dunder_all.utils import find_noqa, get_docstring_lineno, mark_text_ranges
+from flake8_dunder_all import profiling
+from flake8_dunder_all._version import __version__
+from flake8_dunder_all.utils import decode_source, find_noqa_codes, get_docstring_lineno
 
 if TYPE_CHECKING:
 	# stdlib
 	from argparse import Namespace
 
+	# 3rd party
+	from domdf_python_tools.typing import PathLike
+	from flake8.options.manager import OptionManager  # type: ignore[import-untyped]
+
+	# this package
+	from flake8_dunder_all.cache import ResultCache
+
 __author__: str = "Dominic Davis-Foster"
 __copyright__: str = "2020 Dominic Davis-Foster"
 __license__: str = "MIT"
-__version__: str = "0.5.0"
 __email__: str = "dominic@davis-foster.co.uk"
 
 __all__ = (
 		"check_and_add_all",
 		"AlphabeticalOptions",
+		"Engine",
 		"DALL000",
 		"DALL001",
 		"DALL002",
 		"Plugin",
+		"Scanner",
+		"TokenScanner",
 		"Visitor",
+		"VisitorResult",
 		)
 
 DALL000 = "DALL000 Module lacks __all__."
@@ -84,6 +112,80 @@ class AlphabeticalOptions(Enum):
 	NONE = "none"
 
 
+class VisitorResult(NamedTuple):
+	"""
+	The results of visiting a module with a :class:`~.Visitor`, as returned by :meth:`Visitor.result`.
+
+	Unlike the visitor itself, which also holds the state of the traversal, this is immutable and
+	cheap to pickle, and can be converted to and from a compact binary form with :meth:`~.to_bytes`
+	and :meth:`~.from_bytes`, or stored as JSON.
+
+	.. versionadded:: 0.6.0
+	"""
+
+	#: Whether a ``__all__`` declaration was found.
+	found_all: bool
+
+	#: The public functions and classes defined in the module, sorted.
+	members: Tuple[str, ...]
+
+	#: The line number of the last top-level or conditional import.
+	last_import: int
+
+	#: The value of ``__all__``, converted to a tuple if it is a list.
+	all_members: Optional[Sequence[Any]]
+
+	#: The line number where ``__all__`` is defined, or ``-1``.
+	all_lineno: int
+
+	#: The line number and column offset of each entry in ``__all__``, if it is a list or tuple literal.
+	all_positions: Optional[Tuple[Tuple[int, int], ...]]
+
+	def to_bytes(self) -> bytes:
+		"""
+		Returns the compact binary form of the result.
+		"""
+
+		return marshal.dumps(tuple(self), 4)
+
+	@classmethod
+	def from_bytes(cls, data: bytes) -> "VisitorResult":
+		"""
+		Construct a :class:`~.VisitorResult` from the binary form returned by :meth:`~.to_bytes`.
+
+		:param data:
+
+		:raises ValueError: If ``data`` is not a valid result.
+		"""
+
+		try:
+			fields = marshal.loads(data)
+		except (EOFError, TypeError, ValueError) as e:
+			raise ValueError("Invalid VisitorResult data") from e
+
+		if not isinstance(fields, tuple) or len(fields) != len(cls._fields):
+			raise ValueError("Invalid VisitorResult data")
+
+		return cls._make(fields)
+
+	@classmethod
+	def from_json(cls, data: Sequence[Any]) -> "VisitorResult":
+		"""
+		Construct a :class:`~.VisitorResult` from its JSON form, which is the list of its fields.
+
+		:param data:
+		"""
+
+		found_all, members, last_import, all_members, all_lineno, all_positions = data
+
+		if isinstance(all_members, list):
+			all_members = tuple(all_members)
+		if all_positions is not None:
+			all_positions = tuple(map(tuple, all_positions))
+
+		return cls(found_all, tuple(members), last_import, all_members, all_lineno, all_positions)
+
+
 class Visitor(ast.NodeVisitor):
 	"""
 	AST :class:`~ast.NodeVisitor` to check a module has defined ``__all__``, and add one if it not.
@@ -95,6 +197,8 @@ class Visitor(ast.NodeVisitor):
 	.. versionchanged:: 0.5.0
 
 		Added the ``sorted_upper_first``, ``sorted_lower_first`` and ``all_lineno`` attributes.
+
+	.. versionchanged:: 0.6.0  Added the ``all_positions`` attribute.
 	"""
 
 	found_all: bool  #: Flag to indicate a ``__all__`` declaration has been found in the AST.
@@ -104,6 +208,9 @@ class Visitor(ast.NodeVisitor):
 	all_members: Optional[Sequence[str]]  #: The value of ``__all__``.
 	all_lineno: int  #: The line number where ``__all__`` is defined.
 
+	#: The line number and column offset of each entry in ``__all__``, if it is a list or tuple literal.
+	all_positions: Optional[List[Tuple[int, int]]]
+
 	def __init__(self, use_endlineno: bool = False) -> None:
 		self.found_all = False
 		self.members = set()
@@ -111,6 +218,31 @@ class Visitor(ast.NodeVisitor):
 		self.use_endlineno = use_endlineno
 		self.all_members = None
 		self.all_lineno = -1
+		self.all_positions = None
+
+	def result(self) -> VisitorResult:
+		"""
+		Returns the results of the visit as an immutable :class:`~.VisitorResult`.
+
+		.. versionadded:: 0.6.0
+		"""
+
+		all_members = self.all_members
+		if all_members is not None and not isinstance(all_members, (str, bytes)):
+			all_members = tuple(all_members)
+
+		all_positions = self.all_positions
+		if all_positions is not None:
+			all_positions = tuple(map(tuple, all_positions))  # type: ignore[assignment]
+
+		return VisitorResult(
+				self.found_all,
+				tuple(sorted(self.members)),
+				self.last_import,
+				all_members,
+				self.all_lineno,
+				all_positions,  # type: ignore[arg-type]
+				)
 
 	def visit_Assign(self, node: ast.Assign) -> None:  # noqa: D102
 		targets = []
@@ -122,6 +254,7 @@ class Visitor(ast.NodeVisitor):
 			self.found_all = True
 			self.all_lineno = node.lineno
 			self.all_members = self._parse_all(cast(ast.List, node.value))
+			self.all_positions = self._all_positions(node.value)
 
 	def visit_AnnAssign(self, node: ast.AnnAssign) -> None:  # noqa: D102
 		if isinstance(node.target, ast.Name):
@@ -129,6 +262,14 @@ class Visitor(ast.NodeVisitor):
 				self.all_lineno = node.lineno
 				self.found_all = True
 				self.all_members = self._parse_all(cast(ast.List, node.value))
+				self.all_positions = self._all_positions(node.value)
+
+	@staticmethod
+	def _all_positions(all_node: Optional[ast.expr]) -> Optional[List[Tuple[int, int]]]:
+		if isinstance(all_node, (ast.List, ast.Tuple)):
+			return [(elt.lineno, elt.col_offset) for elt in all_node.elts]
+
+		return None
 
 	@staticmethod
 	def _parse_all(all_node: ast.List) -> Optional[Sequence[str]]:
@@ -239,47 +380,705 @@ class Visitor(ast.NodeVisitor):
 		# Don't generic visit
 		self.handle_import(node)
 
-	def visit_If(self, node: ast.If) -> None:
+	def handle_if(self, node: ast.If) -> None:
 		"""
-		Visit an if statement and check if it's for `TYPE_CHECKING`.
+		Handles an ``if`` statement, checking if it's for `TYPE_CHECKING`.
 
 		:param node: The node being visited.
+
+		.. versionadded:: 0.6.0
 		"""
 
 		if _is_type_checking(node.test):
 			if self.use_endlineno and node.end_lineno is not None:
 				self.last_import = max(self.last_import, node.end_lineno)
 			else:
-				self.last_import = max(self.last_import, max(_descend_node(node)))
+				self.last_import = max(self.last_import, _last_lineno(node))
+
+	def visit_If(self, node: ast.If) -> None:
+		"""
+		Visit an if statement and check if it's for `TYPE_CHECKING`.
+
+		:param node: The node being visited.
+		"""
 
+		self.handle_if(node)
 		self.generic_visit(node)
 
-	def visit_Try(self, node: ast.Try) -> None:
+	def handle_try(self, node: ast.Try) -> None:
 		"""
-		Visit a Try statement.
+		Handles a ``try`` statement, checking if it contains imports.
 
 		:param node: The node being visited.
+
+		.. versionadded:: 0.6.0
 		"""
 
 		if any(isinstance(n, (ast.Import, ast.ImportFrom)) for n in node.body):
 			if self.use_endlineno and node.end_lineno is not None and sys.implementation.name != "pypy":  # pragma: no cover (pypy)
 				self.last_import = max(self.last_import, node.end_lineno)
 			else:  # pragma: no cover (!pypy)
-				end_lineno = max(
-						*_descend_node(node),
-						*_descend_node(node, "handlers"),
-						*_descend_node(node, "orelse"),
-						*_descend_node(node, "finalbody"),
-						)
+				end_lineno = _last_lineno(node, ("body", "handlers", "orelse", "finalbody"))
 				self.last_import = max(self.last_import, end_lineno)
 
+	def visit_Try(self, node: ast.Try) -> None:
+		"""
+		Visit a Try statement.
+
+		:param node: The node being visited.
+		"""
+
+		self.handle_try(node)
 		self.generic_visit(node)
 
 
-def _descend_node(node: ast.AST, attr: str = "body") -> Iterator[int]:
-	for child in getattr(node, attr, []):
-		yield child.lineno
-		yield from _descend_node(child)
+#: Mapping of compound statements to the attributes holding the statements nested within them.
+_BLOCK_FIELDS: Dict[Type[ast.AST], Tuple[str, ...]] = {
+		ast.Module: ("body", ),
+		ast.If: ("body", "orelse"),
+		ast.For: ("body", "orelse"),
+		ast.AsyncFor: ("body", "orelse"),
+		ast.While: ("body", "orelse"),
+		ast.With: ("body", ),
+		ast.AsyncWith: ("body", ),
+		ast.Try: ("body", "handlers", "orelse", "finalbody"),
+		ast.ExceptHandler: ("body", ),
+		}
+
+if sys.version_info >= (3, 10):  # pragma: no cover (<py310)
+	_BLOCK_FIELDS[ast.Match] = ("cases", )
+	_BLOCK_FIELDS[ast.match_case] = ("body", )
+
+if sys.version_info >= (3, 11):  # pragma: no cover (<py311)
+	_BLOCK_FIELDS[ast.TryStar] = ("body", "handlers", "orelse", "finalbody")
+
+
+class Scanner(Visitor):
+	"""
+	Alternative to :class:`~.Visitor` which scans the module's statements directly.
+
+	Rather than dispatching to a ``visit_*`` method for every node in the tree,
+	the scanner walks the list of statements in the module, only descending into compound statements
+	(such as ``if`` and ``try`` blocks) and never into expressions or the bodies of functions and classes.
+	The results are identical to those of :class:`~.Visitor`.
+
+	:param use_endlineno: Flag to indicate whether the end_lineno functionality is available.
+		This functionality is available on Python 3.8 and above, or when the tree has been passed through
+		:func:`flake8_dunder_all.utils.mark_text_ranges``.
+
+	.. versionadded:: 0.6.0
+	"""
+
+	def visit(self, node: ast.AST) -> None:
+		"""
+		Scan the statements in the given node.
+
+		:param node: The node to scan, usually an :class:`ast.Module`.
+		"""
+
+		# pylint: disable=loop-invariant-statement
+		block_fields = _BLOCK_FIELDS
+		ClassDef, FunctionDef, AsyncFunctionDef = ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef
+		Import, ImportFrom, Assign, AnnAssign = ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign
+		If, Try = ast.If, ast.Try
+
+		# Statements are pushed in reverse so they are popped in source order,
+		# which matters if ``__all__`` is defined more than once.
+		stack: List[ast.AST] = [node]
+
+		while stack:
+			node = stack.pop()
+			node_type = type(node)
+
+			if node_type is FunctionDef or node_type is AsyncFunctionDef or node_type is ClassDef:
+				self.handle_def(node)  # type: ignore[arg-type]
+				continue
+			elif node_type is Import or node_type is ImportFrom:
+				self.handle_import(node)  # type: ignore[arg-type]
+				continue
+			elif node_type is Assign:
+				self.visit_Assign(node)  # type: ignore[arg-type]
+				continue
+			elif node_type is AnnAssign:
+				self.visit_AnnAssign(node)  # type: ignore[arg-type]
+				continue
+			elif node_type is If:
+				self.handle_if(node)  # type: ignore[arg-type]
+			elif node_type is Try:
+				self.handle_try(node)  # type: ignore[arg-type]
+
+			fields = block_fields.get(node_type)
+			if fields is not None:
+				for field in reversed(fields):
+					stack.extend(reversed(getattr(node, field)))
+		# pylint: enable=loop-invariant-statement
+
+	def handle_def(self, node: Union[ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef]) -> None:
+		"""
+		Handles ``def foo(): ...``, ``async def foo(): ...`` and ``class Foo: ...``.
+
+		:param node: The node being visited.
+		"""
+
+		name = node.name
+		if name.startswith('_'):
+			return
+
+		for deco in node.decorator_list:
+			deco_type = type(deco)
+			if deco_type is ast.Name:
+				if deco.id == "overload":  # type: ignore[attr-defined]
+					return
+			elif deco_type is ast.Attribute:
+				if deco.attr == "overload":  # type: ignore[attr-defined]
+					return
+
+		self.members.add(name)
+
+
+#: The keywords which begin a compound statement, apart from the soft keywords ``match`` and ``case``.
+_HEADER_KEYWORDS = frozenset({
+		"async", "class", "def", "elif", "else", "except", "finally", "for", "if", "try", "while", "with"
+		})
+
+#: The keywords which continue an ``if`` or ``try`` statement begun on an earlier line at the same indentation.
+_CONTINUATIONS = {"if": frozenset({"elif", "else"}), "try": frozenset({"except", "else", "finally"})}
+
+
+def _parse_expression(text: str) -> ast.expr:
+	"""
+	Parse an expression taken from the middle of a statement.
+
+	The expression is parsed within brackets, so it may span several lines and begin with whitespace.
+	Positions on its first line are therefore one column further right than in ``text``.
+	"""
+
+	return ast.parse(f"({text}\n)", mode="eval").body  # type: ignore[attr-defined]
+
+
+def _is_dunder_all(tokens: List[str]) -> bool:
+	"""
+	Returns whether the tokens of an assignment target are the name ``__all__``, possibly in parentheses.
+	"""
+
+	while len(tokens) > 2 and tokens[0] == '(' and tokens[-1] == ')':
+		tokens = tokens[1:-1]
+
+	return tokens == ["__all__"]
+
+
+class _Compound:
+	# An ``if`` or ``try`` statement which TokenScanner needs the last line of.
+
+	__slots__ = ("keyword", "level", "in_body", "has_import", "star")
+
+	def __init__(self, keyword: str, level: int):
+		self.keyword = keyword
+		self.level = level  # The indentation level of the statement.
+		self.in_body = True  # Whether later statements are within the body of a try, not a handler.
+		self.has_import = False  # Whether the body of a try contains an import.
+		self.star = False  # Whether a try has ``except*`` handlers.
+
+
+class TokenScanner(Visitor):
+	"""
+	Alternative to :class:`~.Visitor` which finds the same information from the module's tokens,
+	without parsing the module.
+
+	The tokens are read one at a time, keeping track of the indentation, so the memory used doesn't grow
+	with the size of the module. Only small parts of the module are ever parsed,
+	such as the value of ``__all__`` and the conditions of ``if`` statements.
+	This trades speed for memory: scanning typically takes one and a half to two times as long as parsing,
+	but uses a small fraction of the memory, which matters for very large modules such as generated code.
+
+	The results are the same as those of :class:`~.Visitor` for any valid module.
+	However, tokenizing doesn't detect every error in the source,
+	so a module which can be tokenized but not parsed may be scanned without an error being raised.
+
+	:param use_endlineno: Ignored, as the end of each statement is always known.
+
+	.. versionadded:: 0.6.0
+	"""
+
+	#: The line number of the end of the module's docstring, worked out as for inserting ``__all__``,
+	#: or ``0`` if the module has no docstring.
+	docstring_end: int
+
+	def __init__(self, use_endlineno: bool = True) -> None:
+		super().__init__(use_endlineno=True)
+		self.docstring_end = 0
+
+	def scan(self, source: str) -> None:
+		"""
+		Scan the tokens of the given source.
+
+		:param source: The source of the module.
+
+		:raises SyntaxError: If the source couldn't be tokenized.
+		:raises tokenize.TokenError: If the source ends within a statement.
+		"""
+
+		# pylint: disable=loop-invariant-statement
+		NAME, OP, STRING, NEWLINE, NL, COMMENT = (
+				tokenize.NAME, tokenize.OP, tokenize.STRING, tokenize.NEWLINE, tokenize.NL, tokenize.COMMENT
+				)
+		INDENT, DEDENT, ENDMARKER = tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER
+
+		# The offsets of the starts of the lines of the current statement, so parts of it can be parsed.
+		line_starts: Dict[int, int] = {}
+		buffer = io.StringIO(source)
+		lines_read = 0
+		offset = 0
+
+		def readline() -> str:
+			nonlocal lines_read, offset
+
+			line = buffer.readline()
+			lines_read += 1
+			line_starts[lines_read] = offset
+			offset += len(line)
+			return line
+
+		def text(start: Tuple[int, int], end: Tuple[int, int]) -> str:
+			return source[line_starts[start[0]] + start[1]:line_starts[end[0]] + end[1]]
+
+		# The kind of each indented block: "def" for the bodies of functions and classes,
+		# "match" for the bodies of match statements, and '' for any other block.
+		levels: List[str] = []
+		hidden = 0  # The number of function and class bodies the current statement is within.
+		block_kind = ''  # The kind of block the next indent begins.
+		level = 0
+
+		# The if and try statements which haven't ended yet, innermost last.
+		pending: List[_Compound] = []
+
+		depth = 0
+		lambdas = 0
+		end = (0, 0)  # Where the last significant token ended.
+		line_start = True
+		first_statement = True
+		overload = False  # Whether one of the decorators of the next function or class is ``overload``.
+
+		# Statements after the colon of a compound statement, on the same line.
+		inline = False
+		inline_hidden = False
+		inline_owner: Optional[_Compound] = None
+
+		# Whether the last token was a colon which may end the header of a compound statement,
+		# and the kind of block that statement's body is.
+		after_colon = False
+		colon_kind = ''
+
+		# The current statement.
+		kind = ''  # "header", "import", "decorator" or "statement", or '' between statements.
+		keyword = ''
+		start = (0, 0)
+		part_start = (0, 0)
+		visible = True
+		first_token = True
+		name_next = False
+		mentions = False
+		docstring = False
+		segment: List[str] = []
+		targets_all = False
+		annotated = False
+		expect_value = False
+		value_start: Optional[Tuple[int, int]] = None
+
+		def close(compound: _Compound) -> None:
+			if compound.keyword == "if" or (compound.has_import and not compound.star):
+				self.last_import = max(self.last_import, end[0])
+
+		def end_statement() -> None:
+			nonlocal overload, first_statement
+
+			if kind == "import" and visible:
+				self.last_import = max(self.last_import, end[0])
+
+				owner: Optional[_Compound] = None
+				if inline:
+					owner = inline_owner
+				elif pending and pending[-1].keyword == "try" and pending[-1].level + 1 == level:
+					owner = pending[-1]
+
+				if owner is not None and owner.in_body:
+					owner.has_import = True
+
+			elif kind == "decorator" and visible and mentions:
+				decorator = _parse_expression(text(part_start, end))
+				if isinstance(decorator, ast.Name):
+					overload = overload or decorator.id == "overload"
+				elif isinstance(decorator, ast.Attribute):
+					overload = overload or decorator.attr == "overload"
+
+			elif kind == "statement":
+				if visible and targets_all:
+					self.found_all = True
+					self.all_lineno = start[0]
+
+					if value_start is None:
+						self.all_members = self.all_positions = None
+					else:
+						value = _parse_expression(text(value_start, end))
+						self.all_members = self._parse_all(cast(ast.List, value))
+						positions = self._all_positions(value)
+
+						if positions is not None:
+							# Undo the shift caused by parsing the value within brackets.
+							first_line = value_start[0]
+							column = len(text((first_line, 0), value_start).encode("UTF-8")) - 1
+							positions = [
+									(first_line, col_offset + column)
+									if lineno == 1 else (lineno + first_line - 1, col_offset)
+									for lineno, col_offset in positions
+									]
+
+						self.all_positions = positions
+
+				if docstring:
+					value = _parse_expression(text(start, end))
+					try:
+						docstring_value = ast.literal_eval(value)
+					except ValueError:
+						docstring_value = None
+
+					if isinstance(docstring_value, str):
+						lineno = value.lineno + start[0] - 1
+						self.docstring_end = len(docstring_value.split('\n')) + lineno - 1
+
+			if kind != "decorator":
+				overload = False
+
+			first_statement = False
+
+		for token in tokenize.generate_tokens(readline):
+			token_type = token.type
+
+			if token_type == COMMENT or token_type == NL:
+				continue
+
+			elif token_type == INDENT:
+				levels.append(block_kind)
+				if block_kind == "def":
+					hidden += 1
+				continue
+
+			elif token_type == DEDENT:
+				if levels.pop() == "def":
+					hidden -= 1
+				continue
+
+			elif token_type == NEWLINE or token_type == ENDMARKER:
+				if kind:
+					end_statement()
+					kind = ''
+
+				block_kind = colon_kind if after_colon else ''
+				after_colon = inline = inline_hidden = False
+				inline_owner = None
+				line_start = True
+				depth = lambdas = 0
+
+				if token_type == ENDMARKER:
+					while pending:
+						close(pending.pop())
+
+				continue
+
+			string = token.string
+			after_colon = False
+
+			if line_start:
+				line_start = False
+				level = len(levels)
+
+				# Close the if and try statements which this line comes after the end of.
+				while pending and pending[-1].level >= level:
+					compound = pending[-1]
+					if compound.level == level and token_type == NAME and string in _CONTINUATIONS[compound.keyword]:
+						compound.in_body = False
+						break
+
+					close(pending.pop())
+
+				for lineno in [lineno for lineno in line_starts if lineno < token.start[0]]:
+					del line_starts[lineno]
+
+			if not kind:
+				start = token.start
+				visible = not hidden and not inline_hidden
+				first_token = True
+				mentions = docstring = False
+
+				if token_type == NAME and (
+						string in _HEADER_KEYWORDS
+						or (string == "case" and not inline and levels and levels[-1] == "match")
+						):
+					kind, keyword = "header", string
+					name_next = string in {"def", "class"}
+				elif token_type == NAME and (string == "import" or string == "from"):
+					kind = "import"
+				elif token_type == OP and string == '@':
+					kind = "decorator"
+				else:
+					kind = "statement"
+					segment = [string]
+					targets_all = annotated = expect_value = False
+					value_start = None
+					docstring = first_statement and not inline and (token_type == STRING or string == '(')
+
+				if kind != "statement":
+					end = token.end
+					continue
+
+			elif kind == "header":
+				if keyword == "async":
+					keyword = string
+					name_next = string == "def"
+				elif name_next:
+					name_next = False
+					if visible and not string.startswith('_') and not overload:
+						self.members.add(string)
+				elif first_token:
+					if keyword == "except" and string == '*':
+						if pending and pending[-1].keyword == "try" and pending[-1].level == level:
+							pending[-1].star = True
+					elif keyword == "if" or keyword == "elif":
+						part_start = token.start
+
+				if keyword != "async":
+					first_token = False
+
+				if token_type == NAME and (string == "TYPE_CHECKING" or string == "False"):
+					mentions = True
+
+			elif kind == "decorator":
+				if first_token:
+					first_token = False
+					part_start = token.start
+
+				if token_type == NAME and string == "overload":
+					mentions = True
+
+			elif kind == "statement":
+				if expect_value:
+					expect_value = False
+					value_start = token.start
+
+				if len(segment) < 9:
+					segment.append(string)
+
+				if docstring and not (token_type == STRING or (token_type == OP and string in {'(', ')', ';'})):
+					docstring = False
+
+			if token_type == OP:
+				if string in "([{":
+					depth += 1
+				elif string in ")]}":
+					depth -= 1
+					if depth < 0:
+						raise SyntaxError(f"unmatched {string!r} on line {token.start[0]}")
+
+				elif depth:
+					pass
+
+				elif string == ':':
+					if lambdas:
+						lambdas -= 1
+
+					elif kind == "header":
+						# The end of the header of a compound statement. Any statements after it are its body.
+						if visible:
+							if keyword in {"if", "elif"} and mentions:
+								if _is_type_checking(_parse_expression(text(part_start, token.start))):
+									pending.append(_Compound("if", level))
+							elif keyword == "try":
+								pending.append(_Compound("try", level))
+
+						if keyword in {"def", "class"}:
+							overload = False
+
+						inline = True
+						inline_hidden = keyword in {"def", "class"}
+						inline_owner = pending[-1] if keyword == "try" and visible else None
+						after_colon = True
+						colon_kind = "def" if inline_hidden else ''
+						first_statement = False
+						kind = ''
+						continue
+
+					elif kind == "statement" and not annotated:
+						# An annotated assignment, or the header of a match statement if nothing follows it.
+						annotated = True
+						targets_all = _is_dunder_all(segment[:-1])
+						after_colon = True
+						colon_kind = "match" if segment[:1] == ["match"] else ''
+
+				elif string == '=' and kind == "statement" and not lambdas:
+					if not annotated and _is_dunder_all(segment[:-1]):
+						targets_all = True
+					segment = []
+					expect_value = True
+
+				elif string == ';':
+					if kind:
+						end_statement()
+						kind = ''
+					continue
+
+			elif token_type == NAME and string == "lambda" and not depth:
+				lambdas += 1
+
+			end = token.end
+
+		# pylint: enable=loop-invariant-statement
+
+
+class Engine(Enum):
+	"""
+	Enum of the engines which can be used to find the members of a module and its ``__all__``.
+
+	.. versionadded:: 0.6.0
+	"""
+
+	#: Use :class:`~.Visitor`.
+	VISITOR = "visitor"
+
+	#: Use :class:`~.Scanner`.
+	SCANNER = "scanner"
+
+	#: Use :class:`~.TokenScanner`, without parsing the module.
+	TOKENIZE = "tokenize"
+
+	#: Use :py:attr:`~.Engine.TOKENIZE` for modules of at least :py:data:`~.TOKENIZE_THRESHOLD` bytes,
+	#: and :py:attr:`~.Engine.VISITOR` for smaller modules.
+	AUTO = "auto"
+
+	def for_size(self, size: int) -> "Engine":
+		"""
+		Returns the engine to use for a module of the given size.
+
+		This is only different from this engine for :py:attr:`~.Engine.AUTO`.
+
+		:param size: The size of the module, in bytes.
+		"""
+
+		if self is Engine.AUTO:
+			return Engine.TOKENIZE if size >= TOKENIZE_THRESHOLD else Engine.VISITOR
+		else:
+			return self
+
+	def make_visitor(self, use_endlineno: bool = False) -> Visitor:
+		"""
+		Construct the visitor for this engine.
+
+		Modules which have already been parsed, such as those checked by the Flake8 plugin,
+		are scanned with :class:`~.Scanner` by :py:attr:`~.Engine.TOKENIZE`,
+		and with :class:`~.Visitor` by :py:attr:`~.Engine.AUTO`.
+
+		:param use_endlineno: Flag to indicate whether the end_lineno functionality is available.
+		"""
+
+		if self is Engine.SCANNER or self is Engine.TOKENIZE:
+			return Scanner(use_endlineno)
+		else:
+			return Visitor(use_endlineno)
+
+
+#: The size, in bytes, from which :py:attr:`Engine.AUTO <.Engine.AUTO>` checks modules with
+#: :class:`~.TokenScanner` rather than parsing them.
+#: Parsing a module can take more than a hundred times its size in memory, so above this size
+#: the memory saved outweighs the slower scan. Below it the memory used by parsing is negligible.
+TOKENIZE_THRESHOLD = 1024 * 1024
+
+
+def _last_lineno(node: ast.AST, fields: Tuple[str, ...] = ("body", )) -> int:
+	"""
+	Returns the line number of the last statement nested within the given fields of ``node``,
+	descending through the ``body`` of each nested statement.
+
+	Statements are in source order, so only the last statement of each block needs to be looked at.
+	"""
+
+	last = 0
+
+	for field in fields:
+		body = getattr(node, field, None)
+
+		while body:
+			child = body[-1]
+			if child.lineno > last:
+				last = child.lineno
+			body = getattr(child, "body", None)
+
+	return last
+
+
+def _end_lineno(node: ast.AST, lines: Sequence[str]) -> int:
+	"""
+	Returns the line number of the last line of the statement ``node``, which was parsed from ``lines``.
+	"""
+
+	# The last line of a compound statement is the last line of the last statement nested within it.
+	while True:
+		for field in reversed(_BLOCK_FIELDS.get(type(node), ("body", ))):
+			body = getattr(node, field, None)
+			if body:
+				node = body[-1]
+				break
+		else:
+			break
+
+	# A simple statement ends at the end of its logical line, or at a semicolon.
+	# The statement may follow a semicolon, so tokens are only counted from where it starts.
+	start, col_offset = node.lineno, node.col_offset  # type: ignore[attr-defined]
+	readline = (f"{line}\n" for line in lines[start - 1:]).__next__
+	depth = 0
+
+	try:
+		for token in tokenize.generate_tokens(readline):
+			if token.type == tokenize.OP and (token.start[0] > 1 or token.start[1] >= col_offset):
+				if token.string in "([{":
+					depth += 1
+				elif token.string in ")]}":
+					depth -= 1
+				elif token.string == ';' and depth <= 0:
+					return start + token.start[0] - 1
+			elif token.type == tokenize.NEWLINE or (token.type == tokenize.NL and depth <= 0):
+				return start + token.start[0] - 1
+	except (tokenize.TokenError, SyntaxError):  # pragma: no cover
+		pass
+
+	return start  # pragma: no cover
+
+
+#: The statements :class:`~.Visitor` uses the ``end_lineno`` attribute of.
+_END_LINENO_TYPES = (ast.Import, ast.ImportFrom, ast.If, ast.Try)
+
+
+def _mark_end_linenos(tree: ast.Module, source: str) -> None:
+	"""
+	Set the ``end_lineno`` attribute of the statements in ``tree`` which :class:`~.Visitor` needs it for.
+
+	Python 3.8 and above set this attribute when parsing. On earlier versions this avoids marking
+	the positions of every node in the tree, as :func:`~flake8_dunder_all.utils.mark_text_ranges` does.
+	Only imports, ``if`` statements and ``try`` statements outside of functions and classes are marked.
+	"""
+
+	lines = source.split('\n')
+	stack: List[ast.AST] = list(tree.body)
+
+	while stack:
+		node = stack.pop()
+		node_type = type(node)
+
+		if node_type in _END_LINENO_TYPES:
+			node.end_lineno = _end_lineno(node, lines)  # type: ignore[attr-defined]
+
+		fields = _BLOCK_FIELDS.get(node_type)
+		if fields is not None:
+			for field in fields:
+				stack.extend(getattr(node, field))
 
 
 _nameconstant = ast.Constant if sys.version_info >= (3, 8) else ast.NameConstant
@@ -301,19 +1100,60 @@ def _is_type_checking(node: ast.AST) -> bool:
 	return False
 
 
+_sort_qualifiers = {
+		AlphabeticalOptions.IGNORE: '',
+		AlphabeticalOptions.UPPER: " (uppercase first)",
+		AlphabeticalOptions.LOWER: " (lowercase first)",
+		}
+
+
+@functools.lru_cache()
+def _get_sort_key(option: AlphabeticalOptions) -> Callable[[str], Any]:
+	"""
+	Returns the natural sort key function for ``option``.
+
+	:param option:
+	"""
+
+	# 3rd party
+	import natsort  # Only needed when DALL001 is enabled
+
+	if option == AlphabeticalOptions.IGNORE:
+		# Alphabetical, upper or lower don't matter
+		return natsort.natsort_keygen(key=str.lower)
+	elif option == AlphabeticalOptions.UPPER:
+		# Alphabetical, uppercase grouped first
+		return natsort.natsort_keygen()
+	elif option == AlphabeticalOptions.LOWER:
+		# Alphabetical, lowercase grouped first
+		return natsort.natsort_keygen(alg=natsort.ns.LOWERCASEFIRST)
+	else:
+		raise ValueError(f"No sort key for {option}")
+
+
 class Plugin:
 	"""
 	A Flake8 plugin which checks to ensure modules have defined ``__all__``.
 
 	:param tree: The abstract syntax tree (AST) to check.
+	:param lines: The lines of the source file, used to look up results in the :attr:`~.cache`.
+
+	.. versionchanged:: 0.6.0  Added the ``lines`` argument and the ``cache`` and ``dunder_all_engine`` attributes.
 	"""
 
 	name: str = __name__
 	version: str = __version__  #: The plugin version
 	dunder_all_alphabetical: AlphabeticalOptions = AlphabeticalOptions.NONE
 
-	def __init__(self, tree: ast.AST):
+	#: The engine used to check the module.
+	dunder_all_engine: Engine = Engine.VISITOR
+
+	#: The cache of results, or :py:obj:`None` to disable caching.
+	cache: Optional["ResultCache"] = None
+
+	def __init__(self, tree: ast.AST, lines: Optional[Sequence[str]] = None):
 		self._tree = tree
+		self._lines = lines
 
 	def run(self) -> Generator[Tuple[int, int, str, Type[Any]], None, None]:
 		"""
@@ -327,37 +1167,69 @@ class Plugin:
 		#. The class of the plugin raising the error.
 		"""
 
-		visitor = Visitor()
+		key = None
+
+		if self.cache is not None and self._lines is not None:
+			# this package
+			from flake8_dunder_all.cache import make_key
+
+			key = make_key(
+					"plugin",
+					''.join(self._lines).encode("UTF-8"),
+					dunder_all_alphabetical=self.dunder_all_alphabetical.value,
+					)
+			cached = self.cache.get(key)
+			if cached is not None:
+				for lineno, col_offset, message in cached["errors"]:
+					yield lineno, col_offset, message, type(self)
+				return
+
+		visitor = self.dunder_all_engine.make_visitor()
 		visitor.visit(self._tree)
+		errors = list(self._check(visitor))
+
+		if key is not None:
+			self.cache.set(key, {"errors": errors, "visitor": visitor.result()})  # type: ignore[union-attr]
 
+		for lineno, col_offset, message in errors:
+			yield lineno, col_offset, message, type(self)
+
+	def _check(self, visitor: Visitor) -> Iterator[Tuple[int, int, str]]:
 		if visitor.found_all:
 			if visitor.all_members is None:
-				yield visitor.all_lineno, 0, DALL002, type(self)
-
-			elif self.dunder_all_alphabetical == AlphabeticalOptions.IGNORE:
-				# Alphabetical, upper or lower don't matter
-				sorted_alphabetical = natsort.natsorted(visitor.all_members, key=str.lower)
-				if list(visitor.all_members) != sorted_alphabetical:
-					yield visitor.all_lineno, 0, f"{DALL001}.", type(self)
-			elif self.dunder_all_alphabetical == AlphabeticalOptions.UPPER:
-				# Alphabetical, uppercase grouped first
-				sorted_alphabetical = natsort.natsorted(visitor.all_members)
-				if list(visitor.all_members) != sorted_alphabetical:
-					yield visitor.all_lineno, 0, f"{DALL001} (uppercase first).", type(self)
-			elif self.dunder_all_alphabetical == AlphabeticalOptions.LOWER:
-				# Alphabetical, lowercase grouped first
-				sorted_alphabetical = natsort.natsorted(visitor.all_members, alg=natsort.ns.LOWERCASEFIRST)
-				if list(visitor.all_members) != sorted_alphabetical:
-					yield visitor.all_lineno, 0, f"{DALL001} (lowercase first).", type(self)
-
-		elif not visitor.members:
-			return
+				yield visitor.all_lineno, 0, DALL002
+			elif self.dunder_all_alphabetical != AlphabeticalOptions.NONE:
+				yield from self._check_sorted(visitor)
 
-		else:
-			yield 1, 0, DALL000, type(self)
+		elif visitor.members:
+			yield 1, 0, DALL000
+
+	def _check_sorted(self, visitor: Visitor) -> Iterator[Tuple[int, int, str]]:
+		all_members = cast(Sequence[str], visitor.all_members)
+		key = _get_sort_key(self.dunder_all_alphabetical)
+
+		# Checking each pair stops at the first entry which is out of order,
+		# rather than sorting a copy of the whole list.
+		previous = None
+		previous_key = None
+
+		for idx, member in enumerate(all_members):
+			member_key = key(member)
+
+			if previous_key is not None and member_key < previous_key:
+				if visitor.all_positions is not None and len(visitor.all_positions) == len(all_members):
+					lineno, col_offset = visitor.all_positions[idx]
+				else:
+					lineno, col_offset = visitor.all_lineno, 0
+
+				qualifier = _sort_qualifiers[self.dunder_all_alphabetical]
+				yield lineno, col_offset, f"{DALL001}{qualifier}: {member!r} should come before {previous!r}."
+				return
+
+			previous, previous_key = member, member_key
 
 	@classmethod
-	def add_options(cls, option_manager: OptionManager) -> None:  # noqa: D102  # pragma: no cover
+	def add_options(cls, option_manager: "OptionManager") -> None:  # noqa: D102  # pragma: no cover
 
 		option_manager.add_option(
 				"--dunder-all-alphabetical",
@@ -369,87 +1241,701 @@ class Plugin:
 						"(Default: %(default)s)"
 						),
 				)
+		option_manager.add_option(
+				"--dunder-all-engine",
+				choices=[member.value for member in Engine],
+				parse_from_config=True,
+				default=Engine.VISITOR.value,
+				help="The engine used to find the members of each module. (Default: %(default)s)",
+				)
+		option_manager.add_option(
+				"--dunder-all-cache-dir",
+				parse_from_config=True,
+				default=None,
+				help="The directory to cache results in. (Default: the user's cache directory)",
+				)
+		option_manager.add_option(
+				"--dunder-all-no-cache",
+				action="store_true",
+				parse_from_config=True,
+				default=False,
+				help="Disable the cache of results.",
+				)
 
 	@classmethod
 	def parse_options(cls, options: "Namespace") -> None:  # noqa: D102  # pragma: no cover
 		# note: this sets the option on the class and not the instance
 		cls.dunder_all_alphabetical = AlphabeticalOptions(options.dunder_all_alphabetical)
+		if cls.dunder_all_alphabetical != AlphabeticalOptions.NONE:
+			# Build the key function up front rather than for each file.
+			_get_sort_key(cls.dunder_all_alphabetical)
+		cls.dunder_all_engine = Engine(options.dunder_all_engine)
 
-
-def check_and_add_all(filename: PathLike, quote_type: str = '"', use_tuple: bool = False) -> int:
+		if options.dunder_all_no_cache:
+			cls.cache = None
+		else:
+			# this package
+			from flake8_dunder_all.cache import default_cache_dir, get_cache
+
+			cls.cache = get_cache(options.dunder_all_cache_dir or default_cache_dir())
+
+
+def check_and_add_all(
+		filename: "PathLike",
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		cache: Optional["ResultCache"] = None,
+		engine: Engine = Engine.VISITOR,
+		prefilter: bool = False,
+		write: bool = True,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		) -> int:
 	"""
 	Check the given filename for the presence of a ``__all__`` declaration, and add one if none is found.
 
 	:param filename: The filename of the Python source file (``.py``) to check.
 	:param quote_type: The type of quote to use for strings.
 	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param cache: A cache of results for files which did not need changing.
+	:param engine: The engine used to find the members of the module.
+	:param prefilter: Whether to try to decide the result from the raw bytes of the file before parsing it.
+		See :mod:`flake8_dunder_all.prefilter` for details.
+	:param write: If :py:obj:`False`, the file is never modified. Instead, the ``__all__`` declaration
+		which would be added, and where, is reported on standard error.
+	:param sort: If not :py:obj:`AlphabeticalOptions.NONE <.AlphabeticalOptions.NONE>`,
+		an existing ``__all__`` which is not sorted in this order is sorted,
+		and any ``__all__`` which is added is sorted in this order.
+		The prefilter is not used when sorting, as it doesn't look at the order of ``__all__``.
 
 	:returns:
 
 	* ``0`` if the file already contains a ``__all__`` declaration,
 	  has no function or class definitions, or has a ``  # noqa: DALL000  ` comment.
-	* ``1`` If ``__all__`` is absent.
+	* ``1`` If ``__all__`` is absent, or if it is not sorted and ``sort`` is given.
 	* ``4`` if an error was encountered when parsing the file.
+	* ``8`` if the file was modified by something else while it was being checked,
+	  in which case it is left alone.
 
 	.. versionchanged:: 0.2.0
 
 		Now returns ``0`` and doesn't add ``__all__`` if the file contains a ``noqa: DALL000`` comment.
 
 	.. versionchanged:: 0.3.0  Added the ``use_tuple`` argument.
+	.. versionchanged:: 0.6.0
+
+		* Added the ``cache``, ``engine``, ``prefilter``, ``write`` and ``sort`` arguments.
+		* The file is now decoded using the encoding it declares (:pep:`263`), defaulting to UTF-8.
+		* The file is now replaced atomically, and only if it hasn't been modified since it was read.
 	"""
 
+	return _check_file(filename, quote_type, use_tuple, cache, engine, prefilter, write, sort)[0]
+
+
+def _check_file(
+		filename: "PathLike",
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		cache: Optional["ResultCache"] = None,
+		engine: Engine = Engine.VISITOR,
+		prefilter: bool = False,
+		write: bool = True,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		stderr: Optional[TextIO] = None,
+		) -> Tuple[int, Optional["_Edit"]]:
+	"""
+	Implementation of :func:`~.check_and_add_all`, which also returns the change made to the file, if any.
+
+	Messages are written to ``stderr`` if given, rather than to :py:obj:`sys.stderr`,
+	so the file can be checked from a thread without redirecting the process-wide stream.
+	"""
+
+	# 3rd party
+	from domdf_python_tools.paths import PathPlus
+
 	filename = PathPlus(filename)
 
-	try:
-		source = filename.read_text()
-		for line in source.splitlines():
-			noqas = find_noqa(line)
-			if noqas is not None:
-				if noqas["codes"]:
-					# pylint: disable=loop-invariant-statement
-					noqa_list: List[str] = noqas["codes"].rstrip().upper().split(',')
-					if "DALL000" in noqa_list:
-						return 0
-					# pylint: enable=loop-invariant-statement
-
-		tree = ast.parse(source)
-		if sys.version_info < (3, 8):  # pragma: no cover (py38+)
-			mark_text_ranges(tree, source)
-
-	except SyntaxError:
-		stderr_writer(Fore.RED(f"'{filename}' does not appear to be a valid Python source file."))
-		return 4
-
-	visitor = Visitor(use_endlineno=True)
-	visitor.visit(tree)
+	with profiling.phase(profiling.FILE_PHASE, filename):
+		# The file is read exactly once, as bytes; the same buffer is used for parsing and rewriting.
+		with profiling.phase("read", filename):
+			# Taken before reading, so a change made while the file is being read is also noticed.
+			before = os.stat(filename) if write else None
 
-	if visitor.found_all:
-		return 0
-	else:
-		docstring_start = (get_docstring_lineno(tree) or 0) - 1
-		docstring = ast.get_docstring(tree, clean=False) or ''
-		docstring_end = len(docstring.split('\n')) + docstring_start
+			if prefilter and sort is AlphabeticalOptions.NONE:
+				# this package
+				from flake8_dunder_all.prefilter import read_and_prefilter
+
+				verdict, data = read_and_prefilter(filename)
+			else:
+				verdict, data = None, filename.read_bytes()
+
+		if verdict is not None:
+			return verdict, None
+
+		retv, insertion = _check_data(
+				data,
+				filename,
+				quote_type=quote_type,
+				use_tuple=use_tuple,
+				cache=cache,
+				engine=engine,
+				sort=sort,
+				stderr=stderr,
+				)
 
-		insertion_position = max(docstring_end, visitor.last_import) + 1
+		if insertion is not None:
+			if write:
+				with profiling.phase("write", filename):
+					retv = _write_insertion(filename, insertion, data, before, stderr)
+			else:
+				_report_insertion(filename, insertion, stderr)
+
+		return retv, insertion
+
+
+class _Insertion(NamedTuple):
+	"""
+	A ``__all__`` declaration which should be added to a file.
+	"""
 
-		if not visitor.members:
-			return 0
+	#: The current source of the file.
+	source: str
 
-		members = f"{quote_type}, {quote_type}".join(sorted(visitor.members))
+	#: The encoding of the file.
+	encoding: str
 
-		lines = filename.read_text().split('\n')
+	#: The index of the line the declaration should be inserted before.
+	index: int
+
+	#: The declaration.
+	line: str
+
+	#: The names listed in the declaration.
+	members: Tuple[str, ...] = ()
+
+	def apply(self) -> str:
+		"""
+		Returns the source with the declaration inserted.
+		"""
+
+		lines = self.source.split('\n')
+
+		# The declaration may belong after the last line, e.g. in a package's ``__init__.py``
+		# which consists only of imports.
+		if self.index >= len(lines):
+			lines.extend([''] * (self.index - len(lines) + 1))
 
 		# Ensure there don't end up too many lines
-		if lines[insertion_position].strip():
-			lines.insert(insertion_position, '\n')
+		if lines[self.index].strip():
+			lines.insert(self.index, '\n')
 		else:
-			lines.insert(insertion_position, '')
+			lines.insert(self.index, '')
+
+		lines.insert(self.index, self.line)
+
+		return '\n'.join(lines)
+
+	@property
+	def lineno(self) -> int:
+		"""
+		The line number the declaration is inserted at.
+		"""
+
+		return self.index + 1
+
+	@property
+	def message(self) -> str:
+		"""
+		Describes the change.
+		"""
+
+		return f"__all__ is missing. Would add: {self.line}"
 
-		if use_tuple:
-			lines.insert(insertion_position, f"__all__ = ({quote_type}{members}{quote_type}, )")
+	@property
+	def code(self) -> str:
+		"""
+		The code of the problem the change fixes.
+		"""
+
+		return "DALL000"
+
+
+class _Replacement(NamedTuple):
+	"""
+	A span of a file's source which should be replaced, such as the entries of an unsorted ``__all__``.
+	"""
+
+	#: The current source of the file.
+	source: str
+
+	#: The encoding of the file.
+	encoding: str
+
+	#: The offset of the start of the span in :attr:`~.source`.
+	start: int
+
+	#: The offset of the end of the span in :attr:`~.source`.
+	end: int
+
+	#: The text to replace the span with.
+	text: str
+
+	#: The line number of the statement being changed.
+	lineno: int
+
+	#: Describes the change.
+	message: str
+
+	#: The code of the problem the change fixes.
+	code: str
+
+	def apply(self) -> str:
+		"""
+		Returns the source with the span replaced.
+		"""
+
+		return f"{self.source[:self.start]}{self.text}{self.source[self.end:]}"
+
+
+_Edit = Union[_Insertion, _Replacement]
+
+
+def _write_stderr(message: str, stderr: Optional[TextIO] = None) -> None:
+	# Writes ``message`` to ``stderr``, or to sys.stderr (after flushing sys.stdout) if it isn't given.
+	if stderr is None:
+		# 3rd party
+		from domdf_python_tools.utils import stderr_writer
+
+		stderr_writer(message)
+	else:
+		stderr.write(f"{message}\n")
+
+
+def _report_insertion(filename: "PathLike", insertion: _Edit, stderr: Optional[TextIO] = None) -> None:
+	_write_stderr(f"{filename}:{insertion.lineno}: {insertion.message}", stderr)
+
+
+def _fixed_source(insertion: _Edit) -> str:
+	"""
+	Returns the source with ``insertion`` applied, as it would be written to the file.
+	"""
+
+	# 3rd party
+	from domdf_python_tools.stringlist import StringList
+
+	# The same clean-up as PathPlus.write_clean: trailing whitespace removed and a single final newline.
+	buffer = StringList(insertion.apply())
+	buffer.blankline(ensure_single=True)
+	return str(buffer)
+
+
+def _write_insertion(
+		filename: "PathLike",
+		insertion: _Edit,
+		data: bytes,
+		before: Optional[os.stat_result] = None,
+		stderr: Optional[TextIO] = None,
+		) -> int:
+	"""
+	Write the source with ``insertion`` applied to ``filename``, which was read as ``data``.
+
+	The file is only replaced if it still contains ``data``, and, if given, its size and modification
+	time are still as given by ``before``. Otherwise a message is written to ``stderr``
+	(by default :py:obj:`sys.stderr`).
+
+	:returns: ``1`` if the file was written, ``0`` if the new content is identical to ``data``,
+		or ``8`` if the file has been modified since it was read.
+	"""
+
+	# this package
+	from flake8_dunder_all.utils import write_atomic
+
+	text = _fixed_source(insertion)
+
+	if os.linesep != '\n':  # pragma: no cover (!Windows)
+		text = text.replace('\n', os.linesep)
+
+	new_data = text.encode(insertion.encoding)
+	if new_data == data:
+		return 0
+
+	try:
+		with open(filename, "rb") as fp:
+			current = os.fstat(fp.fileno())
+			modified = before is not None and (
+					current.st_size != before.st_size or current.st_mtime_ns != before.st_mtime_ns
+					)
+			modified = modified or fp.read() != data
+	except FileNotFoundError:
+		modified = True
+
+	if modified:
+		_write_stderr(f"'{filename}' was modified while it was being checked, so it was not changed.", stderr)
+		return 8
+
+	write_atomic(filename, new_data)
+	return 1
+
+
+def _check_data(
+		data: bytes,
+		filename: "PathLike",
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		cache: Optional["ResultCache"] = None,
+		engine: Engine = Engine.VISITOR,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		stderr: Optional[TextIO] = None,
+		) -> Tuple[int, Optional[_Edit]]:
+	"""
+	Check the content of a Python source file for the presence of a ``__all__`` declaration.
+
+	:param data: The content of the file.
+	:param filename: The filename of the file, used in error messages.
+	:param quote_type: The type of quote to use for strings.
+	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param cache: A cache of results for files which did not need changing.
+	:param engine: The engine used to find the members of the module.
+	:param sort: The order to sort ``__all__`` in, if at all.
+	:param stderr: The stream to write error messages to. Defaults to :py:obj:`sys.stderr`.
+
+	:returns: The value :func:`~.check_and_add_all` should return and, if ``__all__`` should be added
+		or sorted, the change to make.
+	"""
+
+	# 3rd party
+	from consolekit.terminal_colours import Fore
+
+	key = None
+	engine = engine.for_size(len(data))
+
+	if cache is not None:
+		# this package
+		from flake8_dunder_all.cache import make_key
+
+		with profiling.phase("cache", filename):
+			# The engine is part of the key as TokenScanner doesn't detect every syntax error,
+			# so a module it accepted may still be invalid when parsed.
+			key = make_key(
+					"fixer",
+					data,
+					quote_type=quote_type,
+					use_tuple=use_tuple,
+					sort=sort.value,
+					engine=engine.value,
+					)
+			cached = cache.get(key)
+
+		if cached is not None:
+			if cached["retv"] == 4:
+				_write_stderr(Fore.RED(f"'{filename}' does not appear to be a valid Python source file."), stderr)
+			return cached["retv"], None
+
+	try:
+		with profiling.phase("decode", filename):
+			source, encoding = decode_source(data)
+
+		with profiling.phase("noqa", filename):
+			noqa_codes = find_noqa_codes(source)
+
+		add_all = "DALL000" not in noqa_codes
+		sort_all = sort is not AlphabeticalOptions.NONE and "DALL001" not in noqa_codes
+
+		if not (add_all or sort_all):
+			if key is not None:
+				cache.set(key, {"retv": 0, "visitor": None})  # type: ignore[union-attr]
+			return 0, None
+
+		if engine is Engine.TOKENIZE:
+			# The module is never parsed, which uses far less memory for very large modules.
+			with profiling.phase("scan", filename):
+				scanner = TokenScanner()
+				scanner.scan(source)
 		else:
-			lines.insert(insertion_position, f"__all__ = [{quote_type}{members}{quote_type}]")
+			with profiling.phase("parse", filename):
+				tree = ast.parse(data)
+				if sys.version_info < (3, 8):  # pragma: no cover (py38+)
+					_mark_end_linenos(tree, source)
+
+	except (SyntaxError, UnicodeDecodeError, tokenize.TokenError):
+		_write_stderr(Fore.RED(f"'{filename}' does not appear to be a valid Python source file."), stderr)
+		if key is not None:
+			cache.set(key, {"retv": 4, "visitor": None})  # type: ignore[union-attr]
+		return 4, None
+
+	if engine is Engine.TOKENIZE:
+		visitor: Visitor = scanner
+		docstring_end = scanner.docstring_end
+	else:
+		with profiling.phase("visit", filename):
+			visitor = engine.make_visitor(use_endlineno=True)
+			visitor.visit(tree)
+		docstring_end = _docstring_end(tree)
+
+	edit: Optional[_Edit] = None
+
+	if visitor.found_all:
+		if sort_all:
+			edit = _sort_all(source, encoding, visitor, sort)
+	elif visitor.members and add_all:
+		edit = _insert_all(
+				source,
+				encoding,
+				docstring_end,
+				visitor.last_import,
+				visitor.members,
+				quote_type,
+				use_tuple,
+				sort,
+				)
+
+	if edit is None:
+		# Only unchanged files are cached, as the key for a file which is rewritten would be stale.
+		if key is not None:
+			cache.set(key, {"retv": 0, "visitor": visitor.result()})  # type: ignore[union-attr]
+		return 0, None
+
+	return 1, edit
+
+
+def _docstring_end(tree: ast.Module) -> int:
+	"""
+	Returns the line number of the end of the module's docstring, or ``0`` if it has no docstring.
+	"""
+
+	docstring_start = (get_docstring_lineno(tree) or 0) - 1
+	docstring = ast.get_docstring(tree, clean=False) or ''
+	return len(docstring.split('\n')) + docstring_start
+
+
+def _insert_all(
+		source: str,
+		encoding: str,
+		docstring_end: int,
+		last_import: int,
+		members: Iterable[str],
+		quote_type: str,
+		use_tuple: bool,
+		sort: AlphabeticalOptions,
+		) -> _Insertion:
+	"""
+	Returns the ``__all__`` declaration to add to a module, and where to add it.
+	"""
+
+	insertion_position = max(docstring_end, last_import) + 1
+
+	sorted_members = _sorted_members(members, sort)
+	joined = f"{quote_type}, {quote_type}".join(sorted_members)
+
+	if use_tuple:
+		line = f"__all__ = ({quote_type}{joined}{quote_type}, )"
+	else:
+		line = f"__all__ = [{quote_type}{joined}{quote_type}]"
+
+	return _Insertion(source, encoding, insertion_position, line, tuple(sorted_members))
+
+
+def _sorted_members(members: Iterable[str], sort: AlphabeticalOptions) -> List[str]:
+	"""
+	Sort the members of ``__all__`` in the order given by ``sort``, or in code point order if no order is given.
+	"""
+
+	if sort is AlphabeticalOptions.NONE:
+		return sorted(members)
+	else:
+		return sorted(members, key=_get_sort_key(sort))
+
+
+class _Element(NamedTuple):
+	# An entry in a ``__all__`` literal, as offsets into the source.
+	start: int
+	end: int
+	lineno: int
+	end_lineno: int
 
-		filename.write_clean('\n'.join(lines))
 
-		return 1
+class _AllLiteral(NamedTuple):
+	# The list or tuple literal assigned to ``__all__``.
+
+	#: The entries.
+	elements: List[_Element]
+
+	#: The start and end offsets of any comments within the literal, keyed by line number.
+	comments: Dict[int, Tuple[int, int]]
+
+	#: The offset of the opening bracket.
+	start: int
+
+	#: The offset just after the closing bracket.
+	end: int
+
+	#: The line number of the opening bracket.
+	lineno: int
+
+	#: The line number of the closing bracket.
+	end_lineno: int
+
+
+def _all_literal(source: str, lineno: int) -> Optional[_AllLiteral]:
+	"""
+	Find the ``__all__`` list or tuple literal assigned on line ``lineno``.
+
+	:returns: :py:obj:`None` if the value assigned isn't a list or tuple in brackets.
+	"""
+
+	lines = source.split('\n')
+	line_offsets = [0, *itertools.accumulate(len(line) + 1 for line in lines)]
+
+	def offset(position: Tuple[int, int]) -> int:
+		return line_offsets[position[0] + lineno - 2] + position[1]
+
+	elements: List[_Element] = []
+	comments: Dict[int, Tuple[int, int]] = {}
+	current: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
+	opening = (0, 0)
+
+	# 0: looking for the name, 1: looking for the ``=``, 2: expecting the opening bracket, 3: within the literal.
+	state = 0
+	depth = 0
+
+	readline = (f"{line}\n" for line in lines[lineno - 1:]).__next__
+
+	try:
+		for token in tokenize.generate_tokens(readline):
+			token_type, string = token.type, token.string
+
+			if state < 3:
+				if token_type == tokenize.NEWLINE or token_type == tokenize.ENDMARKER:
+					return None
+				elif state == 0:
+					if token_type == tokenize.NAME and string == "__all__":
+						state = 1
+				elif state == 2:
+					if token_type != tokenize.OP or string not in "([":
+						return None
+					state, depth, opening = 3, 1, token.start
+				elif token_type == tokenize.OP:
+					if string in "([{":
+						depth += 1
+					elif string in ")]}":
+						depth -= 1
+					elif string == '=' and depth == 0:
+						state = 2
+				continue
+
+			if token_type == tokenize.COMMENT:
+				comments[token.start[0] + lineno - 1] = (offset(token.start), offset(token.end))
+				continue
+			elif token_type == tokenize.NL:
+				continue
+			elif token_type == tokenize.OP:
+				if string in ")]}":
+					depth -= 1
+					if depth == 0:
+						if current is not None:
+							elements.append(_make_element(current, offset, lineno))
+						return _AllLiteral(
+								elements,
+								comments,
+								offset(opening),
+								offset(token.end),
+								opening[0] + lineno - 1,
+								token.start[0] + lineno - 1,
+								)
+				elif string == ',' and depth == 1:
+					if current is None:
+						return None
+					elements.append(_make_element(current, offset, lineno))
+					current = None
+					continue
+				elif string in "([{":
+					depth += 1
+
+			current = (token.start, token.end) if current is None else (current[0], token.end)
+
+	except (tokenize.TokenError, SyntaxError):  # pragma: no cover
+		pass
+
+	return None  # pragma: no cover
+
+
+def _make_element(
+		span: Tuple[Tuple[int, int], Tuple[int, int]],
+		offset: Callable[[Tuple[int, int]], int],
+		lineno: int,
+		) -> _Element:
+	start, end = span
+	return _Element(offset(start), offset(end), start[0] + lineno - 1, end[0] + lineno - 1)
+
+
+def _sort_all(source: str, encoding: str, visitor: Visitor, sort: AlphabeticalOptions) -> Optional[_Replacement]:
+	"""
+	Returns the change needed to sort the entries of the module's ``__all__``,
+	or :py:obj:`None` if it is already sorted or can't be sorted.
+
+	Only the entries are moved; the brackets, commas and whitespace between them are left as they are.
+	If each entry is on its own line, comments at the ends of those lines are moved along with the entries.
+	"""
+
+	all_members = visitor.all_members
+	if not isinstance(all_members, (list, tuple)) or not all(isinstance(member, str) for member in all_members):
+		return None
+
+	key = _get_sort_key(sort)
+	order = sorted(range(len(all_members)), key=lambda idx: key(all_members[idx]))
+	if order == list(range(len(all_members))):
+		return None
+
+	literal = _all_literal(source, visitor.all_lineno)
+	if literal is None or len(literal.elements) != len(all_members):
+		return None
+
+	elements, comments, close_lineno = literal.elements, literal.comments, literal.end_lineno
+
+	# Comments can only move with the entries if no two entries share a line,
+	# and the last entry isn't on the same line as the closing bracket.
+	movable = elements[-1].end_lineno < close_lineno and all(
+			element.end_lineno < following.lineno for element, following in zip(elements, elements[1:])
+			)
+
+	trailing: List[Optional[Tuple[int, int]]] = []
+	for element in elements:
+		comment = comments.get(element.end_lineno) if movable else None
+		trailing.append(comment if comment is not None and comment[0] >= element.end else None)
+
+	# When comments move, the span runs to the end of the last entry's line, so a comment moved onto
+	# that entry goes after its trailing comma.
+	span_end = source.find('\n', elements[-1].end) if movable else elements[-1].end
+	text = []
+
+	for idx, (element, comment) in enumerate(zip(elements, trailing)):
+		moved = order[idx]
+		text.append(source[elements[moved].start:elements[moved].end])
+
+		gap = source[element.end:elements[idx + 1].start if idx + 1 < len(elements) else span_end]
+		new_comment = trailing[moved]
+
+		if comment is not None:
+			before = gap[:comment[0] - element.end]
+			after = gap[comment[1] - element.end:]
+			if new_comment is None:
+				gap = before.rstrip(" \t") + after
+			else:
+				gap = before + source[new_comment[0]:new_comment[1]] + after
+		elif new_comment is not None:
+			line_end = gap.find('\n')
+			if line_end == -1:
+				line_end = len(gap)
+			gap = f"{gap[:line_end]}  {source[new_comment[0]:new_comment[1]]}{gap[line_end:]}"
+
+		text.append(gap)
+
+	return _Replacement(
+			source,
+			encoding,
+			elements[0].start,
+			span_end,
+			''.join(text),
+			visitor.all_lineno,
+			f"__all__ is not sorted alphabetically{_sort_qualifiers[sort]}. Would sort it.",
+			"DALL001",
+			)
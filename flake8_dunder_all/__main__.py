@@ -27,8 +27,11 @@ Command-line entry point for flake8-dunder-all.
 #
 
 # stdlib
+import functools
+import itertools
+import os
 import sys
-from typing import Iterable
+from typing import Iterable, Iterator, List, Optional, Sequence
 
 # 3rd party
 import click
@@ -37,36 +40,363 @@ from consolekit.commands import MarkdownHelpCommand
 from consolekit.options import auto_default_option, flag_option
 
 # this package
-from flake8_dunder_all import check_and_add_all
+from flake8_dunder_all import AlphabeticalOptions, Engine, profiling
+from flake8_dunder_all.cache import default_cache_dir
+from flake8_dunder_all.parallel import FileOutcome, check_files, default_jobs
+from flake8_dunder_all.report import TextReporter, reporters
+from flake8_dunder_all.walk import DEFAULT_EXCLUDES, walk
 
 __all__ = ("main", )
 
 
 @click.argument("filenames", type=click.STRING, nargs=-1, metavar="FILENAME")
+@auto_default_option(
+		"--profile",
+		type=click.STRING,
+		metavar="PATH",
+		help="Record how long each phase of checking each file takes, and write the timings to PATH as a Chrome trace.",
+		)
+@flag_option(
+		"--staged",
+		help=(
+				"Check the staged version of the files changed in the git index. "
+				"If filenames are given, only those files are considered."
+				),
+		default=False,
+		)
+@auto_default_option(
+		"--changed-since",
+		type=click.STRING,
+		metavar="REF",
+		help=(
+				"Check the Python files changed since the merge base of REF and HEAD. "
+				"If filenames are given, only those files are considered."
+				),
+		)
+@flag_option("--no-gitignore", help="Don't skip files ignored by .gitignore files in directories.", default=False)
+@click.option(
+		"--exclude",
+		type=click.STRING,
+		multiple=True,
+		metavar="GLOB",
+		help=(
+				"Skip files and directories matching GLOB when searching directories. "
+				f"May be given multiple times. Always skipped: {', '.join(DEFAULT_EXCLUDES)} and virtual environments."
+				),
+		)
+@flag_option(
+		"-0",
+		"--null",
+		help="Filenames read with --files-from are separated by NUL characters rather than newlines.",
+		default=False,
+		)
+@auto_default_option(
+		"--files-from",
+		type=click.STRING,
+		metavar="PATH",
+		help="Read the filenames to check from PATH, or from standard input if PATH is '-'.",
+		)
+@flag_option(
+		"--watch",
+		help="Keep running, checking files again whenever they change. Directories are watched recursively.",
+		default=False,
+		)
+@flag_option(
+		"--daemon",
+		help=(
+				"Run as a daemon which keeps the cache warm and checks files on behalf of later invocations. "
+				"The socket is given by the FLAKE8_DUNDER_ALL_SOCKET environment variable."
+				),
+		default=False,
+		)
+@flag_option(
+		"--prefilter",
+		help=(
+				"Skip parsing files which can be decided from their raw bytes. "
+				"Such files aren't checked for syntax errors."
+				),
+		default=False,
+		)
+@flag_option("--no-cache", help="Disable the cache of results.", default=False)
+@auto_default_option(
+		"--cache-dir",
+		type=click.STRING,
+		help="The directory to cache results in. Defaults to the user's cache directory.",
+		)
+@auto_default_option(
+		"--engine",
+		type=click.Choice([member.value for member in Engine]),
+		help="The engine used to find the members of each module.",
+		show_default=True,
+		)
+@auto_default_option(
+		"-j",
+		"--jobs",
+		type=click.IntRange(min=1),
+		help="The number of worker processes to use. Defaults to the number of CPUs.",
+		)
+@flag_option(
+		"--packages",
+		help=(
+				"Treat each argument as a package, and make the __all__ of each __init__.py in it list the names "
+				"it defines, imports from modules within the package, or star-imports from them."
+				),
+		default=False,
+		)
+@auto_default_option(
+		"--sort",
+		type=click.Choice([option.value for option in AlphabeticalOptions if option is not AlphabeticalOptions.NONE]),
+		help=(
+				"Sort existing __all__ declarations alphabetically, with uppercase or lowercase names first, "
+				"or ignoring case."
+				),
+		)
+@flag_option(
+		"-q",
+		"--quiet",
+		help="Only report files which were changed (or, with --check, would be), or which couldn't be checked.",
+		default=False,
+		)
+@auto_default_option(
+		"--format",
+		"output_format",
+		type=click.Choice(list(reporters)),
+		help="The format to report the outcome of each file in. Summaries are written to stderr unless it is text.",
+		show_default=True,
+		)
+@flag_option(
+		"--check",
+		help="Don't modify any files. Report the __all__ declaration which would be added to each file instead.",
+		default=False,
+		)
 @auto_default_option("--quote-type", type=click.STRING, help="The type of quote to use.", show_default=True)
 @flag_option("--use-tuple", help="Use tuples instead of lists for __all__.", default=False)
 @click_command(cls=MarkdownHelpCommand)
-def main(filenames: Iterable[str], quote_type: str = '"', use_tuple: bool = False) -> None:
+def main(
+		filenames: Iterable[str],
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		jobs: Optional[int] = None,
+		cache_dir: Optional[str] = None,
+		no_cache: bool = False,
+		engine: str = Engine.VISITOR.value,
+		prefilter: bool = False,
+		daemon: bool = False,
+		watch: bool = False,
+		changed_since: Optional[str] = None,
+		staged: bool = False,
+		profile: Optional[str] = None,
+		files_from: Optional[str] = None,
+		null: bool = False,
+		exclude: Sequence[str] = (),
+		no_gitignore: bool = False,
+		check: bool = False,
+		sort: Optional[str] = None,
+		packages: bool = False,
+		output_format: str = TextReporter.name,
+		quiet: bool = False,
+		) -> None:
 	"""
 	Given a list of Python source files, check each file defines ``__all__``.
 
+	Directories are searched recursively for Python source files.
+
 	Exit codes:
 
 	* 0: The file already contains a ``__all__`` declaration or has no function or class definitions.
-	* 1: A ``__all__`` declaration was added to the file.
+	* 1: A ``__all__`` declaration was added to the file, or sorted with ``--sort``
+	  (or, with ``--check``, would have been).
 	* 4: A file could not be parsed due to a syntax error.
 	* 5: Bitwise OR of 1 and 4.
+	* 8: A file was modified by something else while it was being checked, so it was left alone.
+	  This is combined with the other codes using bitwise OR.
 	"""
 
+	if daemon:
+		# this package
+		from flake8_dunder_all.daemon import serve
+
+		serve()
+		sys.exit(0)
+
 	retv = 0
 
-	for filename in filenames:
-		filename = filename.strip()
-		click.echo(f"Checking {filename}")
-		retv |= check_and_add_all(filename=filename, quote_type=quote_type, use_tuple=use_tuple)
+	if jobs is None:
+		jobs = default_jobs()
+
+	if no_cache:
+		cache_dir = None
+	elif cache_dir is None:
+		cache_dir = default_cache_dir()
+
+	filenames = (filename.strip() for filename in filenames)
+
+	if files_from is not None:
+		filenames = itertools.chain(filenames, _read_filenames(files_from, null))
+
+	sort_option = AlphabeticalOptions.NONE if sort is None else AlphabeticalOptions(sort)
+
+	if watch:
+		# this package
+		from flake8_dunder_all.watch import watch_files
+
+		if output_format != TextReporter.name:
+			raise click.UsageError("--watch can only be used with --format text.")
+
+		checked = watch_files(
+				list(filenames),
+				quote_type=quote_type,
+				use_tuple=use_tuple,
+				cache_dir=cache_dir,
+				engine=Engine(engine),
+				prefilter=prefilter,
+				write=not check,
+				sort=sort_option,
+				exclude=(*DEFAULT_EXCLUDES, *exclude),
+				gitignore=not no_gitignore,
+				)
+
+		try:
+			for filename, file_retv in checked:
+				if file_retv or not quiet:
+					click.echo(f"Checking {filename}")
+		except KeyboardInterrupt:
+			pass
+
+		sys.exit(0)
+
+	outcomes: Iterable[FileOutcome]
+
+	if packages:
+		# this package
+		from flake8_dunder_all.package import check_packages
+
+		if staged or changed_since is not None:
+			raise click.UsageError("--packages can't be used with --staged or --changed-since.")
+
+		try:
+			outcomes = check_packages(
+					filenames,
+					quote_type=quote_type,
+					use_tuple=use_tuple,
+					cache_dir=cache_dir,
+					engine=Engine(engine),
+					write=not check,
+					sort=sort_option,
+					exclude=(*DEFAULT_EXCLUDES, *exclude),
+					gitignore=not no_gitignore,
+					)
+		except ValueError as e:
+			raise click.UsageError(str(e))
+
+	else:
+		if staged or changed_since is not None:
+			# this package
+			from flake8_dunder_all.git import GitError, changed_files, check_staged
+
+			try:
+				changes = changed_files(ref=changed_since, staged=staged, pathspecs=list(filenames))
+			except GitError as e:
+				raise click.UsageError(str(e))
+
+			filenames = (change.path for change in changes)
+		else:
+			filenames = walk(filenames, exclude=(*DEFAULT_EXCLUDES, *exclude), gitignore=not no_gitignore)
+
+		if staged:
+			outcomes = check_staged(
+					changes,
+					quote_type=quote_type,
+					use_tuple=use_tuple,
+					cache_dir=cache_dir,
+					engine=Engine(engine),
+					prefilter=prefilter,
+					write=not check,
+					sort=sort_option,
+					)
+		else:
+			outcomes = check_files(
+					filenames,
+					quote_type=quote_type,
+					use_tuple=use_tuple,
+					jobs=jobs,
+					cache_dir=cache_dir,
+					engine=Engine(engine),
+					prefilter=prefilter,
+					profile=profile is not None,
+					write=not check,
+					sort=sort_option,
+					)
+
+	checked = 0
+	prefiltered = 0
+	events: List[profiling.Event] = []
+
+	if profile is not None:
+		profiling.enable()
+
+	# Written to stdout without flushing after each file, which is slow for large numbers of files.
+	reporter = reporters[output_format](sys.stdout, quiet=quiet)
+	reporter.start()
+
+	for outcome in outcomes:
+		reporter.report(outcome)
+		if outcome.stderr:
+			reporter.flush()
+			sys.stderr.write(outcome.stderr)
+			sys.stderr.flush()
+		retv |= outcome.retv
+		checked += 1
+		prefiltered += outcome.prefiltered
+		events.extend(outcome.events)
+
+	reporter.finish()
+
+	# Anything other than text output must stay parseable, so the summaries go to stderr instead.
+	echo = functools.partial(click.echo, err=output_format != TextReporter.name)
+
+	if prefilter and not quiet:
+		echo(f"{prefiltered} of {checked} files decided by the prefilter.")
+
+	if profile is not None:
+		recorder = profiling.disable()
+		if recorder is not None:
+			events.extend(recorder.drain())
+
+		profiling.write_chrome_trace(events, profile)
+
+		echo("Slowest files:")
+		for filename, duration in profiling.slowest_files(events):
+			echo(f"{duration * 1000:10.3f}ms  {filename}")
 
 	sys.exit(retv)
 
 
+def _read_filenames(path: str, null: bool = False) -> Iterator[str]:
+	"""
+	Lazily read a list of filenames, one per line or separated by NUL characters.
+
+	:param path: The file to read from, or ``'-'`` for standard input.
+	:param null: Whether the filenames are separated by NUL characters.
+	"""
+
+	with click.open_file(path, "rb") as fp:
+		if null:
+			remainder = b''
+
+			for block in iter(functools.partial(fp.read, 65536), b''):
+				*complete, remainder = (remainder + block).split(b'\0')
+				yield from (os.fsdecode(filename) for filename in complete if filename)
+
+			if remainder:
+				yield os.fsdecode(remainder)
+
+		else:
+			for line in fp:
+				filename = os.fsdecode(line).strip()
+				if filename:
+					yield filename
+
+
 if __name__ == "__main__":
 	sys.exit(main())
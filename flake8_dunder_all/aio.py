@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+#
+#  aio.py
+"""
+Check many files from within an :mod:`asyncio` event loop.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import asyncio
+import itertools
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Set, Tuple
+
+# this package
+from flake8_dunder_all import AlphabeticalOptions, Engine
+from flake8_dunder_all.parallel import FileOutcome, _check_one, default_jobs
+from flake8_dunder_all.walk import DEFAULT_EXCLUDES, walk
+
+__all__ = ("check_paths_async", )
+
+
+async def check_paths_async(
+		paths: Iterable[str],
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		*,
+		concurrency: Optional[int] = None,
+		executor: Optional[Executor] = None,
+		cache_dir: Optional[str] = None,
+		engine: Engine = Engine.VISITOR,
+		prefilter: bool = False,
+		write: bool = True,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		exclude: Iterable[str] = DEFAULT_EXCLUDES,
+		gitignore: bool = True,
+		) -> AsyncIterator[FileOutcome]:
+	"""
+	Check the given files, and the Python source files in the given directories,
+	with :func:`~flake8_dunder_all.check_and_add_all`.
+
+	The files are checked in ``executor``, with at most ``concurrency`` of them in progress at once,
+	and the outcomes are yielded as each file is finished with, which may not be the order of ``paths``.
+	Directories are searched in the event loop's default executor, so the event loop is never blocked.
+
+	If the iteration stops early, whether because the task is cancelled, an exception is raised,
+	or the generator is closed, the files which haven't started being checked are cancelled.
+
+	.. code-block:: python
+
+		async for outcome in check_paths_async(["src", "tests"], concurrency=4):
+			print(outcome.filename, outcome.retv)
+
+	:param paths: Filenames and directories. See :func:`flake8_dunder_all.walk.walk`.
+	:param quote_type: The type of quote to use for strings.
+	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param concurrency: The maximum number of files being checked at once.
+		Defaults to the number of CPUs.
+	:param executor: The executor to check the files in.
+		If :py:obj:`None` a :class:`~concurrent.futures.ProcessPoolExecutor` with ``concurrency`` workers is used,
+		and shut down once the iteration stops.
+	:param cache_dir: The directory of the :class:`~flake8_dunder_all.cache.ResultCache` to use.
+		If :py:obj:`None` the cache is disabled.
+	:param engine: The engine used to find the members of each module.
+	:param prefilter: Whether to try to decide the result from the raw bytes of each file before parsing it.
+	:param write: If :py:obj:`False`, files are never modified. See :func:`~flake8_dunder_all.check_and_add_all`.
+	:param sort: The order to sort ``__all__`` in, if at all. See :func:`~flake8_dunder_all.check_and_add_all`.
+	:param exclude: Globs of files and directories to skip. See :class:`~flake8_dunder_all.walk.ExcludeMatcher`.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+	"""
+
+	if concurrency is None:
+		concurrency = default_jobs()
+	elif concurrency < 1:
+		raise ValueError("'concurrency' must be at least 1")
+
+	kwargs = {
+			"quote_type": quote_type,
+			"use_tuple": use_tuple,
+			"engine": engine,
+			"prefilter": prefilter,
+			"write": write,
+			"sort": sort,
+			}
+
+	loop = asyncio.get_running_loop()
+	filenames = walk(paths, exclude, gitignore)
+	owned = executor is None
+	if executor is None:
+		executor = ProcessPoolExecutor(max_workers=concurrency)
+
+	pending: Set["asyncio.Future[Tuple[int, FileOutcome]]"] = set()
+	exhausted = False
+
+	try:
+		while True:
+			wanted = concurrency - len(pending)
+			if not exhausted and wanted:
+				batch = await loop.run_in_executor(None, _take, filenames, wanted)
+				exhausted = len(batch) < wanted
+
+				for filename in batch:
+					job = (0, filename, cache_dir, kwargs, False)
+					pending.add(loop.run_in_executor(executor, _check_one, job))
+
+			if not pending:
+				return
+
+			done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+			for future in done:
+				yield future.result()[1]
+
+	finally:
+		for future in pending:
+			future.cancel()
+		if owned:
+			executor.shutdown(wait=False)
+
+
+def _take(iterator: Iterator[str], count: int) -> List[str]:
+	return list(itertools.islice(iterator, count))
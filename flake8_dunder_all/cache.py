@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+#
+#  cache.py
+"""
+On-disk cache of results, shared between the ``ensure-dunder-all`` script and the Flake8 plugin.
+
+Entries are keyed by a hash of the file's content, the version of flake8-dunder-all, and any options
+which affect the result, so an unchanged file never needs to be parsed again.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+# stdlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Optional
+
+__all__ = ("ResultCache", "default_cache_dir", "get_cache", "make_key")
+
+#: The number of writes between checks of the size of the cache.
+_EVICTION_INTERVAL = 256
+
+#: The number of cache hits whose access times are recorded together, in a single transaction.
+_ACCESS_BATCH = 256
+
+
+def default_cache_dir() -> str:
+	"""
+	Returns the default cache directory.
+
+	This is the value of the :envvar:`FLAKE8_DUNDER_ALL_CACHE_DIR` environment variable if set,
+	or ``flake8-dunder-all`` in the user's cache directory (``$XDG_CACHE_HOME`` or ``~/.cache``) otherwise.
+	"""
+
+	if os.environ.get("FLAKE8_DUNDER_ALL_CACHE_DIR"):
+		return os.environ["FLAKE8_DUNDER_ALL_CACHE_DIR"]
+
+	cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser('~'), ".cache")
+	return os.path.join(cache_home, "flake8-dunder-all")
+
+
+def make_key(kind: str, content: bytes, **options: object) -> str:
+	"""
+	Construct the key for a cache entry.
+
+	The key includes the Python implementation and version, as whether a file can be parsed depends on them.
+
+	:param kind: The kind of result being cached, e.g. ``'plugin'`` or ``'fixer'``.
+	:param content: The content of the file.
+	:param options: Any options which affect the result.
+	"""
+
+	# this package
+	from flake8_dunder_all import __version__
+
+	python = f"{sys.implementation.name}-{sys.version_info[0]}.{sys.version_info[1]}"
+
+	hasher = hashlib.sha256()
+	hasher.update(f"{kind}\0{__version__}\0{python}\0".encode("UTF-8"))
+
+	for name, value in sorted(options.items()):
+		hasher.update(f"{name}={value!r}\0".encode("UTF-8"))
+
+	hasher.update(content)
+
+	return hasher.hexdigest()
+
+
+class ResultCache:
+	"""
+	An SQLite-backed cache of results.
+
+	The database uses write-ahead logging so it can be shared between concurrent processes,
+	such as Flake8's worker processes. Once the cache holds more than ``max_entries``
+	entries the least recently used entries are evicted.
+	To avoid a write for every cache hit, the times entries are used are recorded in batches.
+
+	A connection to the database is opened lazily in each process which uses the cache.
+
+	:param cache_dir: The directory to store the cache in.
+	:param max_entries: The maximum number of entries to keep.
+	"""
+
+	def __init__(self, cache_dir: str, max_entries: int = 100_000):
+		self.cache_dir = str(cache_dir)
+		self.max_entries = max_entries
+		self._connection: Optional[sqlite3.Connection] = None
+		self._pid = -1
+		self._writes = 0
+		self._accessed: Dict[str, float] = {}
+
+	def __getstate__(self) -> Dict[str, Any]:
+		return {"cache_dir": self.cache_dir, "max_entries": self.max_entries}
+
+	def __setstate__(self, state: Dict[str, Any]) -> None:
+		self.__init__(**state)  # type: ignore[misc]
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		"""
+		The connection to the database, which is (re)opened when first used in each process.
+		"""
+
+		if self._connection is None or self._pid != os.getpid():
+			# Access times recorded by the parent process are its own to write.
+			self._accessed = {}
+			os.makedirs(self.cache_dir, exist_ok=True)
+			connection = sqlite3.connect(
+					os.path.join(self.cache_dir, "results.sqlite3"),
+					timeout=30,
+					isolation_level=None,
+					)
+			connection.execute("PRAGMA journal_mode=WAL")
+			connection.execute("PRAGMA synchronous=NORMAL")
+			connection.execute(
+					"CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed REAL NOT NULL)"
+					)
+			connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+			self._connection = connection
+			self._pid = os.getpid()
+
+		return self._connection
+
+	def get(self, key: str) -> Optional[Any]:
+		"""
+		Returns the value stored for ``key``, or :py:obj:`None` if there is no such entry.
+
+		:param key:
+		"""
+
+		try:
+			row = self.connection.execute("SELECT value FROM results WHERE key = ?", (key, )).fetchone()
+			if row is None:
+				return None
+
+			self._accessed[key] = time.time()
+			if len(self._accessed) >= _ACCESS_BATCH:
+				self.flush()
+
+			return json.loads(row[0])
+
+		except (sqlite3.Error, OSError, ValueError):
+			return None
+
+	def set(self, key: str, value: Any) -> None:  # noqa: A003  # pylint: disable=redefined-builtin
+		"""
+		Store ``value`` for ``key``.
+
+		:param key:
+		:param value: A JSON-serializable value.
+		"""
+
+		try:
+			self.connection.execute(
+					"INSERT OR REPLACE INTO results (key, value, accessed) VALUES (?, ?, ?)",
+					(key, json.dumps(value), time.time()),
+					)
+
+			self._writes += 1
+			if self._writes % _EVICTION_INTERVAL == 0:
+				self.evict()
+
+		except (sqlite3.Error, OSError, TypeError, ValueError):
+			pass
+
+	def flush(self) -> None:
+		"""
+		Record the times entries were last used, which are otherwise only recorded in batches.
+		"""
+
+		if not self._accessed:
+			return
+
+		accessed = [(accessed, key) for key, accessed in self._accessed.items()]
+		self._accessed = {}
+
+		try:
+			connection = self.connection
+			connection.execute("BEGIN")
+			try:
+				connection.executemany("UPDATE results SET accessed = ? WHERE key = ?", accessed)
+			except BaseException:
+				connection.execute("ROLLBACK")
+				raise
+			connection.execute("COMMIT")
+
+		except (sqlite3.Error, OSError):
+			pass
+
+	def evict(self) -> None:
+		"""
+		Remove the least recently used entries until there are at most ``max_entries`` entries.
+		"""
+
+		self.flush()
+
+		try:
+			(count, ) = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()
+			if count > self.max_entries:
+				self.connection.execute(
+						"DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+						(count - self.max_entries, ),
+						)
+		except (sqlite3.Error, OSError):
+			pass
+
+	def __len__(self) -> int:
+		try:
+			return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+		except (sqlite3.Error, OSError):
+			return 0
+
+	def close(self) -> None:
+		"""
+		Close the connection to the database, evicting old entries first.
+		"""
+
+		if self._connection is not None and self._pid == os.getpid():
+			self.evict()
+			self._connection.close()
+
+		self._connection = None
+
+
+@functools.lru_cache()
+def get_cache(cache_dir: str) -> ResultCache:
+	"""
+	Returns the :class:`~.ResultCache` for ``cache_dir``, which is shared by all callers in the current process.
+
+	:param cache_dir:
+	"""
+
+	return ResultCache(cache_dir)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+#
+#  client.py
+"""
+Thin client for the ``ensure-dunder-all`` daemon.
+
+The client only imports the standard library, and forwards its arguments to a daemon started with
+``ensure-dunder-all --daemon`` over a Unix socket. If no daemon is running, or the daemon is from a
+different version of flake8-dunder-all, the files are checked in-process instead.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import json
+import os
+import socket
+import sys
+from typing import Dict, List, Optional, TextIO
+
+# this package
+from flake8_dunder_all._version import __version__
+
+__all__ = ("default_socket_path", "forward", "main")
+
+#: How long to wait, in seconds, when connecting to the daemon.
+CONNECT_TIMEOUT = 1.0
+
+#: Environment variables which are passed on to the daemon, as they affect how files are checked.
+FORWARDED_ENVIRON = ("FLAKE8_DUNDER_ALL_CACHE_DIR", )
+
+#: Options which depend on more of the client's state than its working directory,
+#: or which never finish, so are always run in-process.
+_LOCAL_OPTIONS = frozenset({"--watch", "--staged", "--changed-since"})
+
+
+def default_socket_path() -> str:
+	"""
+	Returns the default path of the daemon's socket.
+
+	This is the value of the :envvar:`FLAKE8_DUNDER_ALL_SOCKET` environment variable if set,
+	or a file in ``$XDG_RUNTIME_DIR`` (or the temporary directory) otherwise.
+	"""
+
+	if os.environ.get("FLAKE8_DUNDER_ALL_SOCKET"):
+		return os.environ["FLAKE8_DUNDER_ALL_SOCKET"]
+
+	runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"  # nosec: B108
+	uid = os.getuid() if hasattr(os, "getuid") else 0
+	return os.path.join(runtime_dir, f"flake8-dunder-all-{uid}.sock")
+
+
+def _runs_locally(argv: List[str]) -> bool:
+	# Whether the arguments must be handled in-process rather than by the daemon.
+	for idx, arg in enumerate(argv):
+		if arg == "--":
+			break
+
+		option, _, value = arg.partition('=')
+		if option in _LOCAL_OPTIONS:
+			return True
+
+		# Standard input can't be read by the daemon.
+		if option == "--files-from":
+			path = value if '=' in arg else ''.join(argv[idx + 1:idx + 2])
+			if path == '-':
+				return True
+
+	return False
+
+
+def _is_trusted(socket_path: str) -> bool:
+	# The socket may be in a directory other users can write to, such as /tmp,
+	# so it is only used if it belongs to the current user.
+	try:
+		st = os.stat(socket_path)
+	except OSError:
+		return False
+
+	return not hasattr(os, "getuid") or st.st_uid == os.getuid()
+
+
+def _forwarded_environ() -> Dict[str, str]:
+	return {name: os.environ[name] for name in FORWARDED_ENVIRON if name in os.environ}
+
+
+def forward(
+		argv: List[str],
+		socket_path: Optional[str] = None,
+		stdout: Optional[TextIO] = None,
+		stderr: Optional[TextIO] = None,
+		) -> Optional[int]:
+	"""
+	Forward the command-line arguments ``argv`` to a running daemon.
+
+	Output from the daemon is written to ``stdout`` and ``stderr`` as it arrives.
+
+	Arguments which need the client's standard input or git environment (``--files-from -``,
+	``--staged`` and ``--changed-since``), and ``--watch``, which never finishes, are not forwarded.
+	Nor are they if the socket isn't owned by the current user.
+
+	:param argv: The arguments for ``ensure-dunder-all``, excluding the program name.
+	:param socket_path: The path of the daemon's socket. Defaults to :func:`~.default_socket_path`.
+	:param stdout: The stream to write the daemon's standard output to. Defaults to :py:obj:`sys.stdout`.
+	:param stderr: The stream to write the daemon's standard error to. Defaults to :py:obj:`sys.stderr`.
+
+	:returns: The exit code, or :py:obj:`None` if the arguments could not be forwarded,
+		in which case the files must be checked in-process.
+	"""
+
+	if socket_path is None:
+		socket_path = default_socket_path()
+
+	streams = {"stdout": stdout or sys.stdout, "stderr": stderr or sys.stderr}
+
+	if not hasattr(socket, "AF_UNIX") or _runs_locally(argv) or not _is_trusted(socket_path):
+		return None
+
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)  # pylint: disable=no-member
+	received = False
+
+	try:
+		sock.settimeout(CONNECT_TIMEOUT)
+		sock.connect(socket_path)
+		sock.settimeout(None)
+
+		request = {"version": __version__, "cwd": os.getcwd(), "argv": argv, "environ": _forwarded_environ()}
+		sock.sendall(json.dumps(request).encode("UTF-8") + b'\n')
+
+		with sock.makefile("r", encoding="UTF-8") as stream:
+			for line in stream:
+				kind, payload = json.loads(line)
+
+				if kind == "exit":
+					return payload
+				elif kind == "error":
+					break
+				elif kind in streams:
+					streams[kind].write(payload)
+					streams[kind].flush()
+
+				received = True
+
+	except (OSError, ValueError):
+		pass
+
+	finally:
+		sock.close()
+
+	if received:
+		# Files may already have been modified, so checking them again would give the wrong exit code.
+		streams["stderr"].write("Lost connection to the ensure-dunder-all daemon.\n")
+		return 1
+
+	return None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	"""
+	Entry point for the ``ensure-dunder-all`` script.
+
+	:param argv: The command-line arguments, excluding the program name. Defaults to :py:obj:`sys.argv`.
+	"""
+
+	if argv is None:
+		argv = sys.argv[1:]
+
+	if "--daemon" not in argv:
+		retv = forward(argv)
+		if retv is not None:
+			sys.exit(retv)
+
+	# this package
+	from flake8_dunder_all.__main__ import main as cli
+
+	cli(args=argv)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
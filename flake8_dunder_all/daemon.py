@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+#
+#  daemon.py
+"""
+Long-running server for ``ensure-dunder-all --daemon``.
+
+The daemon keeps the interpreter, its imports and the cache of results warm between runs.
+Requests from the :mod:`~flake8_dunder_all.client` are handled one at a time, and the output of each run
+is streamed back to the client as it is produced.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import io
+import json
+import os
+import socket
+import socketserver
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Dict, Mapping, Optional
+
+# this package
+from flake8_dunder_all._version import __version__
+from flake8_dunder_all.client import FORWARDED_ENVIRON, default_socket_path
+
+__all__ = ("DaemonServer", "serve")
+
+#: The defaults of options not given by the client.
+#: Files are checked in the daemon's own process unless ``--jobs`` is given,
+#: as starting a pool of worker processes for each request would throw away the warm process.
+DEFAULT_OPTIONS = {"jobs": 1}
+
+
+class _StreamWriter(io.TextIOBase):
+	"""
+	Text stream which forwards everything written to it to the client.
+	"""
+
+	def __init__(self, handler: "_RequestHandler", kind: str):
+		super().__init__()
+		self.handler = handler
+		self.kind = kind
+
+	def writable(self) -> bool:
+		return True
+
+	def write(self, text: str) -> int:  # type: ignore[override]
+		if not isinstance(text, str):
+			raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+
+		if text:
+			self.handler.send(self.kind, text)
+		return len(text)
+
+	def isatty(self) -> bool:
+		return False
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+	def send(self, kind: str, payload: Any) -> None:
+		self.wfile.write(json.dumps([kind, payload]).encode("UTF-8") + b'\n')
+		self.wfile.flush()
+
+	def handle(self) -> None:
+		try:
+			request = json.loads(self.rfile.readline())
+		except ValueError:
+			return
+
+		if request.get("version") != __version__:
+			self.send("error", f"The daemon is running flake8-dunder-all {__version__}.")
+			return
+		elif "--daemon" in request["argv"]:
+			self.send("error", "The daemon is already running.")
+			return
+
+		self.send("exit", self.run(request["argv"], request["cwd"], request.get("environ", {})))
+
+	def run(self, argv: Any, cwd: str, environ: Dict[str, str]) -> int:
+		"""
+		Run ``ensure-dunder-all`` with the given arguments, from the given directory,
+		with the client's values of the :py:data:`~.FORWARDED_ENVIRON` environment variables.
+
+		Options not given in ``argv`` default to the values in :py:data:`~.DEFAULT_OPTIONS`.
+		"""
+
+		# this package
+		from flake8_dunder_all.__main__ import main
+
+		previous_cwd = os.getcwd()
+		os.chdir(cwd)
+
+		previous_environ = {name: os.environ.get(name) for name in FORWARDED_ENVIRON}
+		_set_environ(environ)
+
+		try:
+			with redirect_stdout(_StreamWriter(self, "stdout")), redirect_stderr(_StreamWriter(self, "stderr")):
+				main.main(args=list(argv), prog_name="ensure-dunder-all", default_map=DEFAULT_OPTIONS)
+		except SystemExit as e:
+			code = e.code
+		else:  # pragma: no cover
+			code = 0
+		finally:
+			os.chdir(previous_cwd)
+			_set_environ(previous_environ)
+
+		if code is None:
+			return 0
+		elif isinstance(code, int):
+			return code
+		else:  # pragma: no cover
+			return 1
+
+
+def _set_environ(environ: Mapping[str, Optional[str]]) -> None:
+	for name in FORWARDED_ENVIRON:
+		value = environ.get(name)
+		if value is None:
+			os.environ.pop(name, None)
+		else:
+			os.environ[name] = value
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+	"""
+	Server which checks files on behalf of the :mod:`~flake8_dunder_all.client`.
+
+	:param socket_path: The path of the socket to listen on.
+
+	A stale socket left behind by a daemon which is no longer running is replaced.
+	"""
+
+	def __init__(self, socket_path: str):
+		self.socket_path = socket_path
+
+		if os.path.exists(socket_path) and not _is_listening(socket_path):
+			os.unlink(socket_path)
+
+		super().__init__(socket_path, _RequestHandler)
+		os.chmod(socket_path, 0o600)
+
+	def server_close(self) -> None:
+		super().server_close()
+
+		try:
+			os.unlink(self.socket_path)
+		except OSError:  # pragma: no cover
+			pass
+
+
+def _is_listening(socket_path: str) -> bool:
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)  # pylint: disable=no-member
+
+	try:
+		sock.connect(socket_path)
+		return True
+	except OSError:
+		return False
+	finally:
+		sock.close()
+
+
+def serve(socket_path: Optional[str] = None) -> None:  # pragma: no cover
+	"""
+	Run the daemon until it is interrupted.
+
+	:param socket_path: The path of the socket to listen on. Defaults to :func:`~.default_socket_path`.
+	"""
+
+	# 3rd party
+	import click
+
+	if socket_path is None:
+		socket_path = default_socket_path()
+
+	with DaemonServer(socket_path) as server:
+		click.echo(f"Listening on {socket_path}")
+
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+#
+#  git.py
+"""
+Find the Python source files changed in a git repository, and check the versions of them in the index.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import io
+import os
+import subprocess  # nosec: B404
+import time
+from typing import IO, TYPE_CHECKING, Iterable, Iterator, List, NamedTuple, Optional, Sequence, cast
+
+# this package
+from flake8_dunder_all import (
+		AlphabeticalOptions,
+		Engine,
+		_check_data,
+		_report_insertion,
+		_write_insertion,
+		profiling
+		)
+from flake8_dunder_all.parallel import FileOutcome, _describe
+
+if TYPE_CHECKING:
+	# this package
+	from flake8_dunder_all.cache import ResultCache
+
+__all__ = ("BlobReader", "ChangedFile", "GitError", "changed_files", "check_staged")
+
+#: The modes of regular files in git's object database. Symlinks and submodules are skipped.
+_FILE_MODES = frozenset({"100644", "100755"})
+
+
+class GitError(Exception):
+	"""
+	Raised when a git command fails.
+	"""
+
+
+def _git(*args: str, cwd: Optional[str] = None) -> bytes:
+	try:
+		process = subprocess.run(  # nosec: B603 B607
+				["git", *args],
+				cwd=cwd,
+				stdout=subprocess.PIPE,
+				stderr=subprocess.PIPE,
+				check=False,
+				)
+	except OSError as e:
+		raise GitError(f"Unable to run git: {e}") from e
+
+	if process.returncode:
+		raise GitError(process.stderr.decode("UTF-8", "replace").strip() or f"git {args[0]} failed.")
+
+	return process.stdout
+
+
+class ChangedFile(NamedTuple):
+	"""
+	A Python source file which has changed.
+	"""
+
+	#: The path of the file, relative to the current directory.
+	path: str
+
+	#: The name of the file's blob in the index, if the change is staged.
+	blob: Optional[str] = None
+
+
+def changed_files(
+		ref: Optional[str] = None,
+		staged: bool = False,
+		pathspecs: Sequence[str] = (),
+		cwd: Optional[str] = None,
+		) -> List[ChangedFile]:
+	"""
+	Returns the Python source files which have been added or modified.
+
+	:param ref: If given, list the files changed since the merge base of ``ref`` and ``HEAD``.
+		Otherwise, list the files changed since ``HEAD``.
+	:param staged: If :py:obj:`True`, compare the index rather than the working tree.
+	:param pathspecs: If given, only consider these paths.
+		Only files ending in ``.py`` are considered, unless they are named explicitly in ``pathspecs``.
+	:param cwd: The directory to run git in. Defaults to the current directory.
+
+	:raises GitError: If git fails, e.g. because ``cwd`` is not in a git repository.
+	"""
+
+	toplevel = os.fsdecode(_git("rev-parse", "--show-toplevel", cwd=cwd).rstrip(b'\n'))
+
+	# The paths in the diff are relative to the top of the repository.
+	prefix = os.path.relpath(os.path.realpath(cwd or os.curdir), os.path.realpath(toplevel))
+	named = {os.path.normpath(os.path.join(prefix, pathspec)).replace(os.sep, '/') for pathspec in pathspecs}
+
+	args = ["diff", "--raw", "-z", "--no-renames", "--diff-filter=ACM"]
+	if staged:
+		args.append("--cached")
+	if ref is not None:
+		args.append(os.fsdecode(_git("merge-base", ref, "HEAD", cwd=cwd).strip()))
+	elif not staged:
+		args.append("HEAD")
+
+	args.append("--")
+	args.extend(pathspecs)
+
+	# Each entry is ":<old mode> <new mode> <old blob> <new blob> <status>" followed by the path.
+	fields = _git(*args, cwd=cwd).split(b'\0')
+	files = []
+
+	for header, path in zip(fields[0::2], fields[1::2]):
+		_, new_mode, _, new_blob, _ = os.fsdecode(header).split(' ')
+		filename = os.fsdecode(path)
+
+		if new_mode not in _FILE_MODES or not (filename.endswith(".py") or filename in named):
+			continue
+
+		filename = os.path.relpath(os.path.join(toplevel, filename), cwd)
+		files.append(ChangedFile(filename, new_blob if staged else None))
+
+	return files
+
+
+class BlobReader:
+	"""
+	Reads the content of blobs using a single long-lived ``git cat-file --batch`` process.
+
+	:param cwd: The directory to run git in. Defaults to the current directory.
+
+	:raises GitError: If git cannot be run.
+	"""
+
+	def __init__(self, cwd: Optional[str] = None):
+		try:
+			self._process = subprocess.Popen(  # nosec: B603 B607
+					["git", "cat-file", "--batch"],
+					cwd=cwd,
+					stdin=subprocess.PIPE,
+					stdout=subprocess.PIPE,
+					)
+		except OSError as e:
+			raise GitError(f"Unable to run git: {e}") from e
+
+		self._stdin = cast(IO[bytes], self._process.stdin)
+		self._stdout = cast(IO[bytes], self._process.stdout)
+
+	def read(self, blob: str) -> bytes:
+		"""
+		Returns the content of ``blob``.
+
+		:param blob: The name of the blob.
+
+		:raises GitError: If the blob does not exist.
+		"""
+
+		self._stdin.write(blob.encode("ascii") + b'\n')
+		self._stdin.flush()
+
+		header = self._stdout.readline()
+		if not header or header.endswith(b" missing\n"):
+			raise GitError(f"No such blob {blob!r}.")
+
+		size = int(header.split()[2])
+		data = self._stdout.read(size)
+		self._stdout.read(1)  # The trailing newline
+
+		return data
+
+	def close(self) -> None:
+		"""
+		Stop the ``git cat-file`` process.
+		"""
+
+		if self._process.poll() is None:
+			self._stdin.close()
+			self._process.wait()
+			self._stdout.close()
+
+	def __enter__(self) -> "BlobReader":
+		return self
+
+	def __exit__(self, *args) -> None:
+		self.close()
+
+
+def _read_file(filename: str) -> Optional[bytes]:
+	try:
+		with open(filename, "rb") as fp:
+			return fp.read()
+	except OSError:
+		return None
+
+
+def check_staged(
+		files: Iterable[ChangedFile],
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		cache_dir: Optional[str] = None,
+		engine: Engine = Engine.VISITOR,
+		prefilter: bool = False,
+		write: bool = True,
+		cwd: Optional[str] = None,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		) -> Iterator[FileOutcome]:
+	"""
+	Check the staged version of each file, i.e. exactly what will be committed.
+
+	If ``__all__`` is missing from the staged version of a file, it is added to the file in the working tree,
+	but only if the working tree and the index agree. Otherwise the file is left alone and the problem reported.
+
+	:param files: The files to check, as returned by :func:`~.changed_files` with ``staged=True``.
+	:param quote_type: The type of quote to use for strings.
+	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param cache_dir: The directory of the :class:`~flake8_dunder_all.cache.ResultCache` to use.
+		If :py:obj:`None` the cache is disabled.
+	:param engine: The engine used to find the members of each module.
+	:param prefilter: Whether to try to decide the result from the raw bytes of each file before parsing it.
+	:param write: If :py:obj:`False`, files are never modified. See :func:`~flake8_dunder_all.check_and_add_all`.
+	:param cwd: The directory to run git in. Defaults to the current directory.
+	:param sort: The order to sort ``__all__`` in, if at all. See :func:`~flake8_dunder_all.check_and_add_all`.
+	"""
+
+	# this package
+	from flake8_dunder_all.cache import get_cache
+
+	cache = None if cache_dir is None else get_cache(cache_dir)
+
+	with BlobReader(cwd=cwd) as reader:
+		for file in files:
+			if file.blob is None:
+				raise ValueError(f"{file.path!r} has no staged blob.")
+
+			with profiling.phase(profiling.FILE_PHASE, file.path):
+				outcome = _check_blob(reader, file, cache, quote_type, use_tuple, engine, prefilter, write, cwd, sort)
+
+			yield outcome
+
+
+def _check_blob(
+		reader: BlobReader,
+		file: ChangedFile,
+		cache: Optional["ResultCache"],
+		quote_type: str,
+		use_tuple: bool,
+		engine: Engine,
+		prefilter: bool,
+		write: bool,
+		cwd: Optional[str],
+		sort: AlphabeticalOptions,
+		) -> FileOutcome:
+	# this package
+	from flake8_dunder_all.prefilter import prefilter as run_prefilter
+
+	start = time.perf_counter()
+
+	with profiling.phase("read", file.path):
+		data = reader.read(file.blob)  # type: ignore[arg-type]
+
+	if prefilter and sort is AlphabeticalOptions.NONE and run_prefilter(data) is not None:
+		return FileOutcome(file.path, 0, '', prefiltered=True, duration=time.perf_counter() - start)
+
+	# Messages are collected without redirecting sys.stderr, as this may run in a thread.
+	buf = io.StringIO()
+	retv, insertion = _check_data(
+			data,
+			file.path,
+			quote_type=quote_type,
+			use_tuple=use_tuple,
+			cache=cache,
+			engine=engine,
+			sort=sort,
+			stderr=buf,
+			)
+
+	if insertion is not None:
+		path = os.path.join(cwd or os.curdir, file.path)
+		if not write:
+			_report_insertion(file.path, insertion, buf)
+		elif _read_file(path) == data:
+			with profiling.phase("write", file.path):
+				retv = _write_insertion(path, insertion, data, stderr=buf)
+		else:
+			buf.write(f"'{file.path}' has unstaged changes, so it was not changed.\n")
+
+	return FileOutcome(
+			file.path,
+			retv,
+			buf.getvalue(),
+			duration=time.perf_counter() - start,
+			**_describe(retv, insertion),
+			)
@@ -0,0 +1,731 @@
+#!/usr/bin/env python3
+#
+#  package.py
+"""
+Make the ``__all__`` of each ``__init__.py`` in a package list the names the package exports.
+
+The ``__all__`` of an ``__init__.py`` should consist of the public functions and classes it defines,
+the public names it imports from modules within the package (``from .x import y``),
+and the exports of each module within the package it star-imports (``from .x import *``).
+The exports of other modules are given by their ``__all__`` if it is a list or tuple of strings,
+and are worked out in the same way otherwise.
+
+What is needed to do this is recorded for each module in a :class:`~.ModuleGraph`,
+which is kept in the :class:`~flake8_dunder_all.cache.ResultCache` between runs.
+Only the modules which have changed since the previous run are parsed again,
+and only the ``__init__.py`` files whose exports those changes could affect are checked again.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import ast
+import io
+import os
+import sys
+import time
+from typing import (
+		TYPE_CHECKING,
+		Any,
+		Dict,
+		FrozenSet,
+		Iterable,
+		Iterator,
+		List,
+		NamedTuple,
+		Optional,
+		Set,
+		TextIO,
+		Tuple
+		)
+
+# this package
+from flake8_dunder_all import (
+		AlphabeticalOptions,
+		Engine,
+		_all_literal,
+		_docstring_end,
+		_insert_all,
+		_mark_end_linenos,
+		_Edit,
+		_Replacement,
+		_report_insertion,
+		_sorted_members,
+		_write_insertion,
+		_write_stderr
+		)
+from flake8_dunder_all.cache import get_cache, make_key
+from flake8_dunder_all.parallel import FileOutcome
+from flake8_dunder_all.utils import decode_source, find_noqa_codes
+from flake8_dunder_all.walk import DEFAULT_EXCLUDES, walk
+
+if TYPE_CHECKING:
+	# this package
+	from flake8_dunder_all.cache import ResultCache
+
+__all__ = ("ModuleGraph", "ModuleInfo", "check_packages", "read_module")
+
+
+class ModuleInfo(NamedTuple):
+	"""
+	What is known about a module in a :class:`~.ModuleGraph`.
+	"""
+
+	#: The filename of the module, relative to the directory of the package.
+	filename: str
+
+	#: Whether the module is the ``__init__.py`` of a package.
+	is_package: bool
+
+	#: The modification time (in nanoseconds) and size of the file when it was read.
+	stat: Tuple[int, int]
+
+	#: Whether the module could be parsed. If not, the other fields are empty.
+	valid: bool = True
+
+	#: Whether the module contains a ``# noqa: DALL000`` comment.
+	noqa: bool = False
+
+	#: Whether the module defines ``__all__``.
+	found_all: bool = False
+
+	#: The value of ``__all__``, if it is a list or tuple of strings.
+	all_members: Optional[Tuple[str, ...]] = None
+
+	#: The public functions and classes defined in the module.
+	members: Tuple[str, ...] = ()
+
+	#: The modules within the package which are star-imported.
+	star_imports: Tuple[str, ...] = ()
+
+	#: The module, name and bound name of each ``from ... import`` from a module within the package.
+	imports: Tuple[Tuple[str, str, str], ...] = ()
+
+	@classmethod
+	def from_json(cls, data: List[Any]) -> "ModuleInfo":
+		"""
+		Construct a :class:`~.ModuleInfo` from its JSON form, which is the list of its fields.
+
+		:param data:
+		"""
+
+		filename, is_package, stat, valid, noqa, found_all, all_members, members, star_imports, imports = data
+
+		return cls(
+				filename,
+				is_package,
+				tuple(stat),  # type: ignore[arg-type]
+				valid,
+				noqa,
+				found_all,
+				None if all_members is None else tuple(all_members),
+				tuple(members),
+				tuple(star_imports),
+				tuple(map(tuple, imports)),  # type: ignore[arg-type]
+				)
+
+
+def _module_name(package: str, relpath: str) -> Tuple[str, bool]:
+	parts = [package, *os.path.splitext(relpath)[0].split(os.sep)]
+
+	if parts[-1] == "__init__":
+		parts.pop()
+		return '.'.join(parts), True
+
+	return '.'.join(parts), False
+
+
+def _resolve(package: str, name: str, is_package: bool, level: int, module: Optional[str]) -> Optional[str]:
+	# Returns the module an import refers to, if it is within the package.
+
+	if level == 0:
+		target = module or ''
+	else:
+		parts = name.split('.')
+		if not is_package:
+			parts.pop()
+		if level > 1:
+			del parts[max(len(parts) - level + 1, 0):]
+		if not parts:
+			return None
+
+		target = '.'.join(parts)
+		if module:
+			target = f"{target}.{module}"
+
+	if target == package or target.startswith(f"{package}."):
+		return target
+
+	return None
+
+
+def read_module(
+		root: str,
+		relpath: str,
+		engine: Engine = Engine.VISITOR,
+		) -> Tuple[str, ModuleInfo]:
+	"""
+	Read and parse a module within a package.
+
+	:param root: The directory of the package.
+	:param relpath: The filename of the module, relative to ``root``.
+	:param engine: The engine used to find the members of the module.
+
+	:returns: The name of the module, and what is known about it.
+	"""
+
+	# The absolute path is used, as ``root`` may be ``.``.
+	package = os.path.basename(os.path.abspath(root))
+	name, is_package = _module_name(package, relpath)
+
+	with open(os.path.join(root, relpath), "rb") as fp:
+		st = os.fstat(fp.fileno())
+		data = fp.read()
+
+	stat = (st.st_mtime_ns, st.st_size)
+
+	try:
+		source, _ = decode_source(data)
+		tree = ast.parse(data)
+		if sys.version_info < (3, 8):  # pragma: no cover (py38+)
+			_mark_end_linenos(tree, source)
+	except (SyntaxError, UnicodeDecodeError):
+		return name, ModuleInfo(relpath, is_package, stat, valid=False)
+
+	visitor = engine.make_visitor(use_endlineno=True)
+	visitor.visit(tree)
+	result = visitor.result()
+
+	all_members = result.all_members
+	if not isinstance(all_members, tuple) or not all(isinstance(member, str) for member in all_members):
+		all_members = None
+
+	star_imports: List[str] = []
+	imports: List[Tuple[str, str, str]] = []
+
+	# Only imports at the top level of the module are considered to be re-exports.
+	for node in tree.body:
+		if not isinstance(node, ast.ImportFrom):
+			continue
+
+		target = _resolve(package, name, is_package, node.level, node.module)
+		if target is None:
+			continue
+
+		for alias in node.names:
+			if alias.name == '*':
+				star_imports.append(target)
+			else:
+				imports.append((target, alias.name, alias.asname or alias.name))
+
+	return name, ModuleInfo(
+			relpath,
+			is_package,
+			stat,
+			noqa="DALL000" in find_noqa_codes(source),
+			found_all=result.found_all,
+			all_members=all_members,  # type: ignore[arg-type]
+			members=result.members,
+			star_imports=tuple(star_imports),
+			imports=tuple(imports),
+			)
+
+
+class ModuleGraph:
+	"""
+	The modules in a package, and the imports between them.
+
+	:param root: The directory of the package, which contains its ``__init__.py``.
+	"""
+
+	#: The directory of the package.
+	root: str
+
+	#: The name of the package.
+	package: str
+
+	#: Mapping of module names to what is known about the module.
+	modules: Dict[str, ModuleInfo]
+
+	#: Mapping of module names to the outcome of checking them: the exit code and anything written to stderr.
+	verdicts: Dict[str, Tuple[int, str]]
+
+	#: The options used when the verdicts were reached.
+	options: str
+
+	def __init__(self, root: str):
+		self.root = root
+		self.package = os.path.basename(os.path.abspath(root))
+		self.modules = {}
+		self.verdicts = {}
+		self.options = ''
+		self._exports: Dict[str, FrozenSet[str]] = {}
+
+	def refresh(
+			self,
+			engine: Engine = Engine.VISITOR,
+			exclude: Iterable[str] = DEFAULT_EXCLUDES,
+			gitignore: bool = True,
+			) -> Set[str]:
+		"""
+		Bring the graph up to date with the files in the package.
+
+		Only files which are new, or whose modification time or size have changed, are read.
+
+		:param engine: The engine used to find the members of each module.
+		:param exclude: Globs of files and directories to skip. See :func:`flake8_dunder_all.walk.walk`.
+		:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+
+		:returns: The names of the modules which were added, changed or removed.
+		"""
+
+		changed: Set[str] = set()
+		seen: Set[str] = set()
+
+		for filename in walk([self.root], exclude=exclude, gitignore=gitignore):
+			relpath = os.path.relpath(filename, self.root)
+			name, _ = _module_name(self.package, relpath)
+
+			try:
+				st = os.stat(filename)
+			except OSError:
+				continue
+
+			seen.add(name)
+			info = self.modules.get(name)
+
+			if info is None or info.filename != relpath or info.stat != (st.st_mtime_ns, st.st_size):
+				try:
+					_, self.modules[name] = read_module(self.root, relpath, engine)
+				except OSError:
+					seen.discard(name)
+					continue
+
+				changed.add(name)
+
+		for name in set(self.modules) - seen:
+			del self.modules[name]
+			changed.add(name)
+
+		for name in set(self.verdicts) - seen:
+			del self.verdicts[name]
+
+		self._exports.clear()
+
+		return changed
+
+	def affected(self, changed: Iterable[str]) -> Set[str]:
+		"""
+		Returns the modules whose exports may be affected by changes to the given modules.
+
+		These are the changed modules themselves, and the modules which star-import them, directly or indirectly.
+		Modules which import a name from a package are also affected by a submodule of that name
+		being added or removed.
+
+		:param changed:
+		"""
+
+		dependents: Dict[str, Set[str]] = {}
+		for name, info in self.modules.items():
+			for target in info.star_imports:
+				dependents.setdefault(target, set()).add(name)
+
+			# Whether ``from . import x`` re-exports a name depends on whether ``x`` is a module.
+			for target, imported, _ in info.imports:
+				dependents.setdefault(f"{target}.{imported}", set()).add(name)
+
+		affected = set(changed)
+		stack = list(affected)
+
+		while stack:
+			for dependent in dependents.get(stack.pop(), ()):
+				if dependent not in affected:
+					affected.add(dependent)
+					stack.append(dependent)
+
+		return affected
+
+	def exports(self, name: str) -> FrozenSet[str]:
+		"""
+		Returns the names exported by the given module.
+
+		For modules with a ``__all__`` which is a list or tuple of strings this is the value of ``__all__``.
+		For packages, or modules without such a ``__all__``, it is the value returned by :meth:`~.expected_all`.
+
+		:param name:
+		"""
+
+		info = self.modules.get(name)
+		if info is None or not info.valid:
+			return frozenset()
+
+		if info.all_members is not None and (info.noqa or not info.is_package):
+			return frozenset(info.all_members)
+
+		return self.expected_all(name)
+
+	def expected_all(self, name: str) -> FrozenSet[str]:
+		"""
+		Returns the names which should be in the ``__all__`` of the given module.
+
+		These are the public functions and classes it defines, the public names it imports from other modules
+		within the package, and the exports of the modules within the package it star-imports.
+
+		:param name:
+		"""
+
+		if name in self._exports:
+			return self._exports[name]
+
+		info = self.modules.get(name)
+		if info is None or not info.valid:
+			return frozenset()
+
+		# Guards against star-imports which form a cycle.
+		self._exports[name] = frozenset()
+
+		names = set(info.members)
+
+		for target, imported, bound in info.imports:
+			# ``from . import submodule`` imports a module, rather than a name to re-export.
+			if not bound.startswith('_') and f"{target}.{imported}" not in self.modules:
+				names.add(bound)
+
+		for target in info.star_imports:
+			names.update(self.exports(target))
+
+		self._exports[name] = expected = frozenset(names)
+		return expected
+
+	def check(
+			self,
+			name: str,
+			quote_type: str = '"',
+			use_tuple: bool = False,
+			engine: Engine = Engine.VISITOR,
+			write: bool = True,
+			sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+			stderr: Optional[TextIO] = None,
+			) -> int:
+		"""
+		Check the ``__all__`` of the given package is as given by :meth:`~.expected_all`, and fix it if not.
+
+		If the package has no ``__all__`` one is added. If it has one which is a list or tuple in brackets,
+		the literal is replaced. Otherwise, as with packages containing a ``# noqa: DALL000`` comment,
+		the package is left alone.
+
+		:param name: The name of the package.
+		:param quote_type: The type of quote to use for strings.
+		:param use_tuple: Whether to use tuples instead of lists for a new ``__all__``.
+		:param engine: The engine used to find the members of the package.
+		:param write: If :py:obj:`False`, the file is never modified. See :func:`~flake8_dunder_all.check_and_add_all`.
+		:param sort: The order to sort ``__all__`` in. Defaults to code point order.
+		:param stderr: The stream to write messages to. Defaults to :py:obj:`sys.stderr`.
+
+		:returns: As :func:`~flake8_dunder_all.check_and_add_all`.
+		"""
+
+		info = self.modules[name]
+		if not info.valid or info.noqa:
+			return 0
+
+		expected = self.expected_all(name)
+
+		if info.found_all:
+			if info.all_members is None or set(info.all_members) == expected:
+				return 0
+		elif not expected:
+			return 0
+
+		filename = os.path.join(self.root, info.filename)
+		before = os.stat(filename) if write else None
+
+		with open(filename, "rb") as fp:
+			data = fp.read()
+
+		source, encoding = decode_source(data)
+		tree = ast.parse(data)
+		if sys.version_info < (3, 8):  # pragma: no cover (py38+)
+			_mark_end_linenos(tree, source)
+
+		visitor = engine.make_visitor(use_endlineno=True)
+		visitor.visit(tree)
+
+		edit: Optional[_Edit]
+		if info.found_all:
+			edit = _replace_all(source, encoding, visitor.all_lineno, info.all_members, expected, quote_type, sort)
+			if edit is None:
+				return 0
+		else:
+			docstring_end = _docstring_end(tree)
+			edit = _insert_all(source, encoding, docstring_end, visitor.last_import, expected, quote_type, use_tuple, sort)
+
+		if write:
+			return _write_insertion(filename, edit, data, before, stderr)
+
+		_report_insertion(filename, edit, stderr)
+		return 1
+
+	def to_json(self) -> Dict[str, Any]:
+		"""
+		Returns the graph in a form which can be stored in a :class:`~flake8_dunder_all.cache.ResultCache`.
+		"""
+
+		return {"options": self.options, "modules": self.modules, "verdicts": self.verdicts}
+
+	@classmethod
+	def from_json(cls, root: str, data: Dict[str, Any]) -> "ModuleGraph":
+		"""
+		Construct a :class:`~.ModuleGraph` from the form returned by :meth:`~.to_json`.
+
+		:param root: The directory of the package.
+		:param data:
+		"""
+
+		graph = cls(root)
+		graph.options = data["options"]
+		graph.modules = {name: ModuleInfo.from_json(info) for name, info in data["modules"].items()}
+		graph.verdicts = {name: (retv, stderr) for name, (retv, stderr) in data["verdicts"].items()}
+		return graph
+
+	@classmethod
+	def load(cls, cache: "ResultCache", root: str) -> "ModuleGraph":
+		"""
+		Load the graph for the package in ``root`` from ``cache``, or return an empty graph if there isn't one.
+
+		:param cache:
+		:param root: The directory of the package.
+		"""
+
+		data = cache.get(_graph_key(root))
+
+		if data is not None:
+			try:
+				return cls.from_json(root, data)
+			except (KeyError, TypeError, ValueError):
+				pass
+
+		return cls(root)
+
+	def save(self, cache: "ResultCache") -> None:
+		"""
+		Store the graph in ``cache``.
+
+		:param cache:
+		"""
+
+		cache.set(_graph_key(self.root), self.to_json())
+
+
+def _graph_key(root: str) -> str:
+	return make_key("package", os.path.abspath(root).encode("UTF-8"))
+
+
+def _replace_all(
+		source: str,
+		encoding: str,
+		lineno: int,
+		current: Iterable[str],
+		expected: Iterable[str],
+		quote_type: str,
+		sort: AlphabeticalOptions,
+		) -> Optional[_Replacement]:
+	"""
+	Returns the change needed to replace the ``__all__`` literal assigned on line ``lineno`` with ``expected``.
+
+	The type of brackets is kept, as is whether the literal spans multiple lines.
+	"""
+
+	literal = _all_literal(source, lineno)
+	if literal is None:
+		return None
+
+	opening, closing = source[literal.start], source[literal.end - 1]
+	quoted = [f"{quote_type}{member}{quote_type}" for member in _sorted_members(expected, sort)]
+
+	if literal.lineno == literal.end_lineno:
+		if opening == '(' and len(quoted) == 1:
+			text = f"({quoted[0]}, )"
+		else:
+			text = f"{opening}{', '.join(quoted)}{closing}"
+	else:
+		# The closing bracket keeps its indentation, or gets that of the statement if it follows an entry.
+		closing_indent = _indentation(source, literal.end - 1)
+		if closing_indent is None:
+			closing_indent = _indentation(source, source.rfind('\n', 0, literal.start) + 1) or ''
+
+		# The entries get the indentation of the existing entries, if they start on their own lines.
+		indent = None
+		if literal.elements and literal.elements[0].lineno != literal.lineno:
+			indent = _indentation(source, literal.elements[0].start)
+		if indent is None:
+			indent = f"{closing_indent}\t"
+
+		text = ''.join([f"{opening}\n", *(f"{indent}{member},\n" for member in quoted), f"{closing_indent}{closing}"])
+
+	details = []
+	missing = set(expected) - set(current)
+	if missing:
+		details.append(f" Missing: {', '.join(map(repr, sorted(missing)))}.")
+	extra = set(current) - set(expected)
+	if extra:
+		details.append(f" Unexpected: {', '.join(map(repr, sorted(extra)))}.")
+
+	return _Replacement(
+			source,
+			encoding,
+			literal.start,
+			literal.end,
+			text,
+			lineno,
+			f"__all__ doesn't match the names exported by the package.{''.join(details)}",
+			"DALL000",
+			)
+
+
+def _indentation(source: str, offset: int) -> Optional[str]:
+	# Returns the whitespace before ``offset`` on its line, or None if there is anything else before it.
+	line_start = source.rfind('\n', 0, offset) + 1
+	prefix = source[line_start:offset]
+	return None if prefix.strip() else prefix
+
+
+def _package_roots(paths: Iterable[str]) -> Iterator[str]:
+	seen = set()
+
+	for path in paths:
+		root = path if os.path.isdir(path) else os.path.dirname(path) or os.curdir
+
+		if not os.path.isfile(os.path.join(root, "__init__.py")):
+			raise ValueError(f"{path!r} is not a package, as it has no __init__.py file.")
+
+		if os.path.abspath(root) not in seen:
+			seen.add(os.path.abspath(root))
+			yield root
+
+
+def check_packages(
+		paths: Iterable[str],
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		cache_dir: Optional[str] = None,
+		engine: Engine = Engine.VISITOR,
+		write: bool = True,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		exclude: Iterable[str] = DEFAULT_EXCLUDES,
+		gitignore: bool = True,
+		) -> Iterator[FileOutcome]:
+	"""
+	Check the ``__all__`` of each ``__init__.py`` in the given packages lists the names the package exports.
+
+	Outcomes are also yielded for modules which could not be parsed.
+
+	:param paths: The directories of the packages, or files within those directories.
+	:param quote_type: The type of quote to use for strings.
+	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param cache_dir: The directory of the :class:`~flake8_dunder_all.cache.ResultCache` to keep the
+		:class:`~.ModuleGraph` of each package in between runs. If :py:obj:`None` every module is parsed.
+	:param engine: The engine used to find the members of each module.
+	:param write: If :py:obj:`False`, files are never modified. See :func:`~flake8_dunder_all.check_and_add_all`.
+	:param sort: The order to sort ``__all__`` in. Defaults to code point order.
+	:param exclude: Globs of files and directories to skip. See :func:`flake8_dunder_all.walk.walk`.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+
+	:raises ValueError: If one of ``paths`` is not within a package.
+		This is raised straight away, rather than once the outcomes are iterated over.
+	"""
+
+	roots = list(_package_roots(paths))
+	options = repr((quote_type, use_tuple, engine.value, write, sort.value))
+
+	return _check_roots(
+			roots,
+			options,
+			quote_type,
+			use_tuple,
+			cache_dir,
+			engine,
+			write,
+			sort,
+			tuple(exclude),
+			gitignore,
+			)
+
+
+def _check_roots(
+		roots: List[str],
+		options: str,
+		quote_type: str,
+		use_tuple: bool,
+		cache_dir: Optional[str],
+		engine: Engine,
+		write: bool,
+		sort: AlphabeticalOptions,
+		exclude: Tuple[str, ...],
+		gitignore: bool,
+		) -> Iterator[FileOutcome]:
+	# 3rd party
+	from consolekit.terminal_colours import Fore
+
+	cache = None if cache_dir is None else get_cache(cache_dir)
+
+	for root in roots:
+		graph = ModuleGraph(root) if cache is None else ModuleGraph.load(cache, root)
+		if graph.options != options:
+			graph.options = options
+			graph.verdicts.clear()
+
+		changed = graph.refresh(engine, exclude=exclude, gitignore=gitignore)
+		affected = graph.affected(changed)
+
+		for name in sorted(graph.modules):
+			info = graph.modules[name]
+			filename = os.path.join(root, info.filename)
+
+			if info.valid and not info.is_package:
+				continue
+
+			duration = 0.0
+
+			if name in affected or name not in graph.verdicts:
+				start = time.perf_counter()
+
+				# Messages are collected without redirecting sys.stderr, as this may run in a thread.
+				buf = io.StringIO()
+				if info.valid:
+					retv = graph.check(name, quote_type, use_tuple, engine, write, sort, stderr=buf)
+				else:
+					_write_stderr(Fore.RED(f"'{filename}' does not appear to be a valid Python source file."), buf)
+					retv = 4
+
+				graph.verdicts[name] = (retv, buf.getvalue())
+				duration = time.perf_counter() - start
+
+			# Packages are only ever changed to fix the names listed in __all__.
+			retv, stderr = graph.verdicts[name]
+			yield FileOutcome(filename, retv, stderr, duration=duration, code="DALL000" if retv & 1 else None)
+
+		if cache is not None:
+			graph.save(cache)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+#
+#  parallel.py
+"""
+Run :func:`~flake8_dunder_all.check_and_add_all` over many files using a pool of worker processes.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+# stdlib
+import collections
+import io
+import itertools
+import multiprocessing
+import os
+import time
+from typing import Any, Deque, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+# this package
+from flake8_dunder_all import AlphabeticalOptions, Engine, _check_file, _Edit, _Insertion, profiling
+from flake8_dunder_all.cache import get_cache
+from flake8_dunder_all.prefilter import stats as prefilter_stats
+
+__all__ = ("FileOutcome", "check_files", "default_jobs")
+
+#: The number of files a worker process checks before it is replaced with a fresh one.
+MAX_TASKS_PER_CHILD = 500
+
+#: The number of filenames read ahead and sorted by size before being given to the worker processes.
+SCHEDULE_WINDOW = 256
+
+
+class FileOutcome(NamedTuple):
+	"""
+	The outcome of checking a single file.
+	"""
+
+	#: The filename, as given.
+	filename: str
+
+	#: The value returned by :func:`~flake8_dunder_all.check_and_add_all`.
+	retv: int
+
+	#: Anything written to stderr while the file was being checked.
+	stderr: str
+
+	#: Whether the outcome was decided by the :mod:`~flake8_dunder_all.prefilter`.
+	prefiltered: bool = False
+
+	#: The timings recorded while the file was being checked, if :mod:`~flake8_dunder_all.profiling` was enabled.
+	events: Tuple[profiling.Event, ...] = ()
+
+	#: The names in the ``__all__`` declaration which was added to the file (or, with ``write=False``, would be).
+	added: Tuple[str, ...] = ()
+
+	#: The line number of the ``__all__`` declaration which was added or sorted.
+	lineno: Optional[int] = None
+
+	#: Describes the change made to the file, if any.
+	message: str = ''
+
+	#: How long checking the file took, in seconds.
+	duration: float = 0.0
+
+	#: The code of the problem which was fixed in the file (or, with ``write=False``, would be),
+	#: e.g. ``"DALL000"`` if ``__all__`` was missing or ``"DALL001"`` if it wasn't sorted.
+	code: Optional[str] = None
+
+
+def _describe(retv: int, edit: Optional[_Edit]) -> Dict[str, Any]:
+	# The fields of a FileOutcome which describe the change made to the file.
+	if edit is None or not retv & 1:
+		return {}
+
+	added = edit.members if isinstance(edit, _Insertion) else ()
+	return {"added": added, "lineno": edit.lineno, "message": edit.message, "code": edit.code}
+
+
+def default_jobs() -> int:
+	"""
+	Returns the default number of worker processes, which is the number of CPUs.
+	"""
+
+	return os.cpu_count() or 1
+
+
+def _file_size(filename: str) -> int:
+	try:
+		return os.stat(filename).st_size
+	except OSError:
+		return 0
+
+
+def _check_one(job: Tuple[int, str, Optional[str], Dict[str, Any], bool]) -> Tuple[int, FileOutcome]:
+	index, filename, cache_dir, kwargs, profile = job
+	cache = None if cache_dir is None else get_cache(cache_dir)
+	recorder = profiling.enable() if profile else None
+
+	decided = prefilter_stats.decided
+
+	start = time.perf_counter()
+
+	# Messages are collected without redirecting sys.stderr, as this may run in a thread.
+	buf = io.StringIO()
+	retv, edit = _check_file(filename=filename, cache=cache, stderr=buf, **kwargs)
+
+	duration = time.perf_counter() - start
+	events = () if recorder is None else tuple(recorder.drain())
+
+	return index, FileOutcome(
+			filename,
+			retv,
+			buf.getvalue(),
+			prefilter_stats.decided != decided,
+			events,
+			duration=duration,
+			**_describe(retv, edit),
+			)
+
+
+def check_files(
+		filenames: Iterable[str],
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		jobs: int = 1,
+		max_tasks_per_child: int = MAX_TASKS_PER_CHILD,
+		cache_dir: Optional[str] = None,
+		engine: Engine = Engine.VISITOR,
+		prefilter: bool = False,
+		profile: bool = False,
+		write: bool = True,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		) -> Iterator[FileOutcome]:
+	"""
+	Check each of the given files with :func:`~flake8_dunder_all.check_and_add_all`.
+
+	``filenames`` is consumed lazily, so it may be a generator, and checking starts before it is exhausted.
+
+	With more than one job the files are distributed between a pool of worker processes,
+	largest first within each group of :py:data:`~.SCHEDULE_WINDOW` files,
+	but the outcomes are always yielded in the same order as ``filenames``.
+	At most two files per job are given to the worker processes ahead of the outcome being yielded,
+	so a very long iterable of filenames is never held in memory all at once.
+
+	:param filenames: The filenames of the Python source files to check.
+	:param quote_type: The type of quote to use for strings.
+	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param jobs: The number of worker processes to use.
+		No more processes are started than there are files in the first :py:data:`~.SCHEDULE_WINDOW`.
+	:param max_tasks_per_child: The number of files each worker process checks before it is replaced.
+	:param cache_dir: The directory of the :class:`~flake8_dunder_all.cache.ResultCache` to use.
+		If :py:obj:`None` the cache is disabled.
+	:param engine: The engine used to find the members of each module.
+	:param prefilter: Whether to try to decide the result from the raw bytes of each file before parsing it.
+	:param profile: Whether to record how long each phase of checking each file takes.
+		The timings are given in :attr:`FileOutcome.events <.FileOutcome.events>`.
+	:param write: If :py:obj:`False`, files are never modified. See :func:`~flake8_dunder_all.check_and_add_all`.
+	:param sort: The order to sort ``__all__`` in, if at all. See :func:`~flake8_dunder_all.check_and_add_all`.
+	"""
+
+	kwargs = {
+			"quote_type": quote_type,
+			"use_tuple": use_tuple,
+			"engine": engine,
+			"prefilter": prefilter,
+			"write": write,
+			"sort": sort,
+			}
+
+	filenames = iter(filenames)
+
+	if jobs > 1:
+		# Don't start more worker processes than there are files in the first window.
+		first = list(itertools.islice(filenames, SCHEDULE_WINDOW))
+		processes = min(jobs, len(first))
+		filenames = itertools.chain(first, filenames)
+	else:
+		processes = 1
+
+	if processes <= 1:
+		for filename in filenames:
+			yield _check_one((0, filename, cache_dir, kwargs, profile))[1]
+		return
+
+	work = _schedule(filenames, cache_dir, kwargs, profile)
+	in_flight: Deque["multiprocessing.pool.AsyncResult[Tuple[int, FileOutcome]]"] = collections.deque()
+
+	# Outcomes which finished before those of earlier files. As files are only reordered within a window,
+	# this never holds more than a window's worth of outcomes.
+	pending: Dict[int, FileOutcome] = {}
+	next_index = 0
+
+	with multiprocessing.Pool(processes=processes, maxtasksperchild=max_tasks_per_child) as pool:
+		# Pool.imap_unordered would read the whole of ``filenames`` ahead of the outcomes,
+		# so the files are submitted one at a time, and only once there is room for them.
+		while True:
+			for job in itertools.islice(work, processes * 2 - len(in_flight)):
+				in_flight.append(pool.apply_async(_check_one, (job, )))
+
+			if not in_flight:
+				break
+
+			index, outcome = in_flight.popleft().get()
+			pending[index] = outcome
+
+			while next_index in pending:
+				yield pending.pop(next_index)
+				next_index += 1
+
+
+def _schedule(
+		filenames: Iterable[str],
+		cache_dir: Optional[str],
+		kwargs: Dict[str, Any],
+		profile: bool,
+		) -> Iterator[Tuple[int, str, Optional[str], Dict[str, Any], bool]]:
+	# The filenames are consumed lazily, a window at a time,
+	# so checking can start before the whole list has been read.
+	# Within each window the largest files are scheduled first,
+	# so a big file picked up last doesn't hold up the whole run.
+	numbered = enumerate(filenames)
+
+	while True:
+		window = list(itertools.islice(numbered, SCHEDULE_WINDOW))
+		if not window:
+			return
+
+		window.sort(key=lambda item: _file_size(item[1]), reverse=True)
+
+		for index, filename in window:
+			yield index, filename, cache_dir, kwargs, profile
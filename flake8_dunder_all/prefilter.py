@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+#
+#  prefilter.py
+"""
+Decide whether a file needs checking by scanning its raw bytes, without parsing it.
+
+Two kinds of file can be decided this way:
+
+* files which contain neither ``def`` nor ``class`` anywhere, which therefore have no members to export;
+* files which assign to ``__all__`` at the start of a line, outside of any string or brackets.
+
+Anything else falls back to the full check.
+As the prefilter doesn't parse the file, files it decides are not checked for syntax errors.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+# stdlib
+import mmap
+import os
+import re
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+	# 3rd party
+	from domdf_python_tools.typing import PathLike
+
+__all__ = ("PrefilterStats", "prefilter", "prefilter_file", "read_and_prefilter", "stats")
+
+#: Files larger than this many bytes are memory-mapped rather than read.
+MMAP_THRESHOLD = 1 << 20
+
+#: ``__all__`` assignments further into the file than this are left to the full check.
+MAX_PREFIX = 1 << 16
+
+_def_or_class = re.compile(rb"\b(?:def|class)\b")
+_dunder_all = re.compile(rb"^__all__[ \t]*(?::|=(?!=))", re.MULTILINE)
+
+# Strings and comments are matched whole, so any brackets inside them are skipped over.
+# Quotes which don't start a complete string are most likely the start of a string which continues past the
+# end of the region being scanned.
+_tokens = re.compile(
+		rb"""
+		(?P<comment>\#[^\r\n]*)
+		|(?P<string>'''(?:\\.|[^\\])*?'''|\"\"\"(?:\\.|[^\\])*?\"\"\")
+		|(?P<unterminated>'''|\"\"\")
+		|(?P<short_string>'(?:\\.|[^'\\\r\n])*'|"(?:\\.|[^"\\\r\n])*")
+		|(?P<open>[(\[{])
+		|(?P<close>[)\]}])
+		|(?P<continuation>\\\r?\n)
+		|(?P<unterminated_short>['"])
+		""",
+		re.VERBOSE | re.DOTALL,
+		)
+
+
+class PrefilterStats:
+	"""
+	Counts the files seen by the prefilter.
+	"""
+
+	#: The number of files the prefilter was asked to decide.
+	checked: int
+
+	#: The number of files the prefilter decided.
+	decided: int
+
+	def __init__(self) -> None:
+		self.checked = 0
+		self.decided = 0
+
+	def __repr__(self) -> str:
+		return f"<{type(self).__name__}(checked={self.checked}, decided={self.decided})>"
+
+
+#: The running totals for the current process.
+stats = PrefilterStats()
+
+
+def _is_top_level(data: Union[bytes, mmap.mmap], position: int) -> bool:
+	"""
+	Returns whether the line starting at ``position`` begins a new top-level statement.
+	"""
+
+	depth = 0
+	last_end = -1
+
+	for match in _tokens.finditer(data, 0, position):  # type: ignore[call-overload]
+		kind = match.lastgroup
+		if kind == "open":
+			depth += 1
+		elif kind == "close":
+			depth -= 1
+		elif kind == "unterminated" or kind == "unterminated_short":
+			return False
+		last_end = match.end()
+
+		if kind == "continuation" and last_end == position:
+			return False
+
+	return depth == 0
+
+
+def prefilter(data: Union[bytes, mmap.mmap]) -> Optional[int]:
+	"""
+	Try to decide the result of :func:`~flake8_dunder_all.check_and_add_all` from the raw source.
+
+	:param data: The content of the file.
+
+	:returns: ``0`` if the file either has no members or already defines ``__all__``,
+		or :py:obj:`None` if the file must be parsed.
+	"""
+
+	stats.checked += 1
+
+	if _def_or_class.search(data) is None:  # type: ignore[call-overload]
+		stats.decided += 1
+		return 0
+
+	for match in _dunder_all.finditer(data, 0, MAX_PREFIX):  # type: ignore[call-overload]
+		if _is_top_level(data, match.start()):
+			stats.decided += 1
+			return 0
+
+	return None
+
+
+def read_and_prefilter(filename: "PathLike") -> Tuple[Optional[int], bytes]:
+	"""
+	Read ``filename``, trying to decide the result of :func:`~flake8_dunder_all.check_and_add_all` along the way.
+
+	Files larger than :py:data:`~.MMAP_THRESHOLD` are memory-mapped rather than being read into memory,
+	and are only copied into memory if the prefilter can't decide them.
+
+	:param filename:
+
+	:returns: A tuple of the result of :func:`~.prefilter` and the content of the file.
+		The content is empty if the prefilter decided the file.
+	"""
+
+	with open(filename, "rb") as fp:
+		if os.fstat(fp.fileno()).st_size > MMAP_THRESHOLD:
+			with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+				verdict = prefilter(mm)
+				return verdict, (b'' if verdict is not None else mm[:])
+		else:
+			data = fp.read()
+			verdict = prefilter(data)
+			return verdict, (b'' if verdict is not None else data)
+
+
+def prefilter_file(filename: "PathLike") -> Optional[int]:
+	"""
+	Try to decide the result of :func:`~flake8_dunder_all.check_and_add_all` for ``filename`` without parsing it.
+
+	Files larger than :py:data:`~.MMAP_THRESHOLD` are memory-mapped rather than being read into memory.
+
+	:param filename:
+
+	:returns: ``0`` if the file either has no members or already defines ``__all__``,
+		or :py:obj:`None` if the file must be parsed.
+	"""
+
+	return read_and_prefilter(filename)[0]
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+#
+#  profiling.py
+"""
+Record how long each phase of checking each file takes.
+
+Recording is disabled by default, in which case :func:`~.phase` returns a shared no-op context manager.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+__all__ = ("Event", "Recorder", "active", "disable", "enable", "phase", "slowest_files", "write_chrome_trace")
+
+#: The name of the phase which spans the whole of :func:`~flake8_dunder_all.check_and_add_all`.
+FILE_PHASE = "check_and_add_all"
+
+_null = nullcontext()
+
+
+class Event(NamedTuple):
+	"""
+	The time taken by one phase of checking a file.
+	"""
+
+	#: The name of the phase.
+	name: str
+
+	#: The file being checked.
+	filename: str
+
+	#: When the phase started, in nanoseconds, from :func:`time.perf_counter_ns`.
+	start: int
+
+	#: The time taken by the phase, in nanoseconds.
+	duration: int
+
+	#: The ID of the process the phase ran in.
+	pid: int
+
+	#: The ID of the thread the phase ran in.
+	tid: int
+
+
+class Recorder:
+	"""
+	Collects :class:`~.Event` objects.
+	"""
+
+	def __init__(self) -> None:
+		self.events: List[Event] = []
+
+	@contextmanager
+	def phase(self, name: str, filename: object) -> Iterator[None]:
+		"""
+		Record the time taken by the body of the :keyword:`with` block.
+
+		:param name: The name of the phase.
+		:param filename: The file being checked.
+		"""
+
+		start = time.perf_counter_ns()
+
+		try:
+			yield
+		finally:
+			duration = time.perf_counter_ns() - start
+			self.events.append(Event(name, str(filename), start, duration, os.getpid(), threading.get_ident()))
+
+	def drain(self) -> List[Event]:
+		"""
+		Returns the events recorded so far, and forgets them.
+		"""
+
+		events, self.events = self.events, []
+		return events
+
+
+_recorder: Optional[Recorder] = None
+
+
+def enable() -> Recorder:
+	"""
+	Start recording, if not already recording.
+
+	:returns: The active :class:`~.Recorder`.
+	"""
+
+	global _recorder
+
+	if _recorder is None:
+		_recorder = Recorder()
+
+	return _recorder
+
+
+def disable() -> Optional[Recorder]:
+	"""
+	Stop recording.
+
+	:returns: The :class:`~.Recorder` which was active, if any.
+	"""
+
+	global _recorder
+
+	recorder, _recorder = _recorder, None
+	return recorder
+
+
+def active() -> Optional[Recorder]:
+	"""
+	Returns the active :class:`~.Recorder`, or :py:obj:`None` if not recording.
+	"""
+
+	return _recorder
+
+
+def phase(name: str, filename: object) -> ContextManager[None]:
+	"""
+	Record the time taken by a phase of checking ``filename``, if recording.
+
+	:param name: The name of the phase.
+	:param filename: The file being checked.
+	"""
+
+	if _recorder is None:
+		return _null
+
+	return _recorder.phase(name, filename)
+
+
+def write_chrome_trace(events: Iterable[Event], filename: str) -> None:
+	"""
+	Write ``events`` to ``filename`` in the Chrome trace event format,
+	which can be viewed with ``chrome://tracing`` or https://ui.perfetto.dev.
+
+	:param events:
+	:param filename:
+	"""
+
+	trace_events = [{
+			"name": event.name,
+			"cat": "phase",
+			"ph": 'X',
+			"ts": event.start / 1000,
+			"dur": event.duration / 1000,
+			"pid": event.pid,
+			"tid": event.tid,
+			"args": {"filename": event.filename},
+			} for event in events]
+
+	with open(filename, 'w', encoding="UTF-8") as fp:
+		json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, fp)
+
+
+def slowest_files(events: Iterable[Event], n: int = 10) -> List[Tuple[str, float]]:
+	"""
+	Returns the ``n`` files which took longest to check, and how long each took in seconds, slowest first.
+
+	:param events:
+	:param n:
+	"""
+
+	totals: Dict[str, int] = {}
+
+	for event in events:
+		if event.name == FILE_PHASE:
+			totals[event.filename] = totals.get(event.filename, 0) + event.duration
+
+	slowest = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:n]
+	return [(filename, duration / 1e9) for filename, duration in slowest]
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+#
+#  report.py
+"""
+Report the outcome of checking each file, in a form people or other tools can read.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import json
+import pathlib
+import urllib.parse
+from typing import Any, Dict, List, TextIO, Type
+
+# 3rd party
+from consolekit.terminal_colours import strip_ansi
+
+# this package
+from flake8_dunder_all import DALL000, DALL001, __version__
+from flake8_dunder_all.parallel import FileOutcome
+
+__all__ = ("JsonLinesReporter", "Reporter", "SarifReporter", "TextReporter", "reporters")
+
+
+class Reporter:
+	"""
+	Base class for writing the outcome of each file to a stream.
+
+	Nothing is flushed until :meth:`~.Reporter.flush` or :meth:`~.Reporter.finish` is called,
+	so the stream's own buffering applies.
+
+	:param stream: The stream to write to.
+	:param quiet: Whether to report only files which were changed (or would be), or couldn't be checked.
+	"""
+
+	#: The name of the format, as given to the ``--format`` option.
+	name: str
+
+	def __init__(self, stream: TextIO, quiet: bool = False):
+		self.stream = stream
+		self.quiet = quiet
+
+	def start(self) -> None:
+		"""
+		Called before any outcomes are reported.
+		"""
+
+	def report(self, outcome: FileOutcome) -> None:
+		"""
+		Report the outcome of checking a single file.
+
+		:param outcome:
+		"""
+
+		if outcome.retv or not self.quiet:
+			self._write(outcome)
+
+	def _write(self, outcome: FileOutcome) -> None:
+		raise NotImplementedError
+
+	def flush(self) -> None:
+		"""
+		Flush anything written so far, such as before writing to another stream.
+		"""
+
+		self.stream.flush()
+
+	def finish(self) -> None:
+		"""
+		Called after every outcome has been reported.
+		"""
+
+		self.flush()
+
+
+def _message(outcome: FileOutcome) -> str:
+	# Describes the change made to the file, or why it couldn't be checked.
+	return outcome.message or strip_ansi(outcome.stderr).strip()
+
+
+class TextReporter(Reporter):
+	"""
+	Writes ``Checking <filename>`` for each file.
+	"""
+
+	name = "text"
+
+	def _write(self, outcome: FileOutcome) -> None:
+		self.stream.write(f"Checking {outcome.filename}\n")
+
+
+class JsonLinesReporter(Reporter):
+	"""
+	Writes a JSON object on its own line for each file.
+
+	.. code-block:: json
+
+		{"path": "foo.py", "status": 1, "added": ["bar"], "lineno": 3, "message": "...", "duration": 0.0012}
+
+	The ``status`` is the value returned by :func:`~flake8_dunder_all.check_and_add_all`,
+	and the ``duration`` is in seconds.
+	"""
+
+	name = "jsonl"
+
+	def _write(self, outcome: FileOutcome) -> None:
+		record = {
+				"path": outcome.filename,
+				"status": outcome.retv,
+				"added": list(outcome.added),
+				"lineno": outcome.lineno,
+				"message": _message(outcome),
+				"prefiltered": outcome.prefiltered,
+				"duration": round(outcome.duration, 6),
+				}
+
+		self.stream.write(json.dumps(record))
+		self.stream.write('\n')
+
+
+#: The description of each rule a SARIF result can be for, by code.
+_rules: Dict[str, str] = {
+		"DALL000": DALL000.split(' ', 1)[1],
+		"DALL001": DALL001.split(' ', 1)[1],
+		}
+
+
+def _uri(filename: str) -> str:
+	path = pathlib.Path(filename)
+	if path.is_absolute():
+		return path.as_uri()
+	return urllib.parse.quote(path.as_posix())
+
+
+class SarifReporter(Reporter):
+	"""
+	Writes a `SARIF 2.1.0 <https://docs.oasis-open.org/sarif/sarif/v2.1.0/sarif-v2.1.0.html>`_ log.
+
+	Each file which was changed (or would be) is a result, and each file which couldn't be checked
+	is a tool execution notification. As the log is a single JSON document,
+	nothing is written until :meth:`~.Reporter.finish` is called.
+	"""
+
+	name = "sarif"
+
+	def __init__(self, stream: TextIO, quiet: bool = False):
+		super().__init__(stream, quiet)
+		self._results: List[Dict[str, Any]] = []
+		self._notifications: List[Dict[str, Any]] = []
+
+	def report(self, outcome: FileOutcome) -> None:
+		location: Dict[str, Any] = {"artifactLocation": {"uri": _uri(outcome.filename)}}
+
+		if outcome.retv & ~1:
+			self._notifications.append({
+					"level": "error",
+					"message": {"text": _message(outcome)},
+					"locations": [{"physicalLocation": location}],
+					})
+
+		if not outcome.retv & 1:
+			return
+
+		if outcome.lineno is not None:
+			location["region"] = {"startLine": outcome.lineno}
+
+		if outcome.code not in _rules:
+			raise ValueError(f"Unknown code {outcome.code!r} for {outcome.filename!r}.")
+
+		result = {
+				"ruleId": outcome.code,
+				"level": "warning",
+				"message": {"text": _message(outcome) or _rules[outcome.code]},
+				"locations": [{"physicalLocation": location}],
+				}
+		if outcome.added:
+			result["properties"] = {"added": list(outcome.added)}
+
+		self._results.append(result)
+
+	def finish(self) -> None:
+		log = {
+				"$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+				"version": "2.1.0",
+				"runs": [{
+						"tool": {
+								"driver": {
+										"name": "flake8-dunder-all",
+										"version": __version__,
+										"informationUri": "https://github.com/python-formate/flake8-dunder-all",
+										"rules": [
+												{"id": rule_id, "shortDescription": {"text": description}}
+												for rule_id, description in _rules.items()
+												],
+										},
+								},
+						"results": self._results,
+						"invocations": [{
+								"executionSuccessful": True,
+								"toolExecutionNotifications": self._notifications,
+								}],
+						}],
+				}
+
+		json.dump(log, self.stream)
+		self.stream.write('\n')
+		super().finish()
+
+
+#: The reporters for each output format, by name.
+reporters: Dict[str, Type[Reporter]] = {
+		reporter.name: reporter
+		for reporter in (TextReporter, JsonLinesReporter, SarifReporter)
+		}
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+#
+#  source.py
+"""
+Check Python source code which is already in memory, rather than in a file.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import collections
+import io
+import itertools
+import multiprocessing
+import tokenize
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# this package
+from flake8_dunder_all import (
+		AlphabeticalOptions,
+		Engine,
+		_all_literal,
+		_check_data,
+		_Edit,
+		_fixed_source,
+		_Insertion
+		)
+from flake8_dunder_all.cache import ResultCache, get_cache
+
+__all__ = ("SourceResult", "check_source", "check_sources")
+
+#: The number of sources given to a worker process at a time by :func:`~.check_sources`.
+BATCH_SIZE = 64
+
+
+class SourceResult(NamedTuple):
+	"""
+	The result of checking some Python source code with :func:`~.check_source`.
+	"""
+
+	#: ``0`` if the source doesn't need changing, ``1`` if ``__all__`` was added or sorted,
+	#: or ``4`` if the source isn't valid Python.
+	retv: int
+
+	#: The source with ``__all__`` added or sorted, or the source as given if it doesn't need changing.
+	#: This is :class:`bytes` if the source was given as :class:`bytes`, or :class:`str` otherwise.
+	source: Union[str, bytes]
+
+	#: The lines of the ``__all__`` declaration which was added or sorted, as they appear in :attr:`~.source`.
+	dunder_all: Optional[str] = None
+
+	#: The line number of the ``__all__`` declaration which was added or sorted.
+	lineno: Optional[int] = None
+
+	#: Describes the change made to the source, or why it couldn't be checked.
+	message: str = ''
+
+
+def _encode(source: str) -> bytes:
+	# The source is encoded using the encoding it declares (PEP 263),
+	# so that the encoding found when it is parsed matches.
+	encoding, _ = tokenize.detect_encoding(io.BytesIO(source.encode("UTF-8")).readline)
+	if encoding == "utf-8-sig":
+		encoding = "UTF-8"
+	return source.encode(encoding)
+
+
+def _declaration(text: str, edit: _Edit) -> str:
+	lines = text.split('\n')
+
+	if isinstance(edit, _Insertion):
+		return lines[edit.lineno - 1]
+
+	literal = _all_literal(text, edit.lineno)
+	end_lineno = edit.lineno if literal is None else literal.end_lineno
+	return '\n'.join(lines[edit.lineno - 1:end_lineno])
+
+
+def check_source(
+		source: Union[str, bytes],
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		cache: Optional[ResultCache] = None,
+		engine: Engine = Engine.VISITOR,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		) -> SourceResult:
+	"""
+	Check the given Python source code for the presence of a ``__all__`` declaration,
+	and return the source with one added if none is found.
+
+	This gives the same result as :func:`~flake8_dunder_all.check_and_add_all`, without reading or writing any files.
+
+	.. code-block:: python
+
+		result = check_source("def foo(): ...\\n")
+		print(result.dunder_all)  # __all__ = ["foo"]
+
+	:param source: The source code. :class:`bytes` are decoded using the encoding they declare (:pep:`263`),
+		defaulting to UTF-8, as for a file.
+	:param quote_type: The type of quote to use for strings.
+	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param cache: A cache of results for sources which did not need changing.
+	:param engine: The engine used to find the members of the module.
+	:param sort: The order to sort ``__all__`` in, if at all. See :func:`~flake8_dunder_all.check_and_add_all`.
+	"""
+
+	# Messages are discarded without redirecting sys.stderr, as this may run in a thread.
+	buf = io.StringIO()
+
+	try:
+		data = source if isinstance(source, bytes) else _encode(source)
+
+		retv, edit = _check_data(
+				data,
+				"<source>",
+				quote_type=quote_type,
+				use_tuple=use_tuple,
+				cache=cache,
+				engine=engine,
+				sort=sort,
+				stderr=buf,
+				)
+
+	except (SyntaxError, UnicodeEncodeError):
+		retv, edit = 4, None
+
+	if retv == 4:
+		return SourceResult(4, source, message="The source does not appear to be valid Python.")
+
+	if edit is None:
+		return SourceResult(retv, source)
+
+	text = _fixed_source(edit)
+	fixed: Union[str, bytes] = text.encode(edit.encoding) if isinstance(source, bytes) else text
+
+	return SourceResult(retv, fixed, _declaration(text, edit), edit.lineno, edit.message)
+
+
+def _check_batch(job: Tuple[List[Union[str, bytes]], Optional[str], Dict[str, Any]]) -> List[SourceResult]:
+	sources, cache_dir, kwargs = job
+	cache = None if cache_dir is None else get_cache(cache_dir)
+	return [check_source(source, cache=cache, **kwargs) for source in sources]
+
+
+def check_sources(
+		sources: Iterable[Union[str, bytes]],
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		jobs: int = 1,
+		batch_size: int = BATCH_SIZE,
+		cache_dir: Optional[str] = None,
+		engine: Engine = Engine.VISITOR,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		) -> Iterator[SourceResult]:
+	"""
+	Check each of the given sources with :func:`~.check_source`.
+
+	``sources`` is consumed lazily, so it may be a generator, and the results are yielded in the same order.
+
+	With more than one job the sources are given to a pool of worker processes in batches of ``batch_size``,
+	so each one doesn't have to be sent to a worker separately.
+	At most two batches per job are read ahead of the result being yielded,
+	so a very long iterable of sources is never held in memory all at once.
+
+	:param sources: The source code to check, as :class:`str` or :class:`bytes`.
+	:param quote_type: The type of quote to use for strings.
+	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param jobs: The number of worker processes to use.
+	:param batch_size: The number of sources given to a worker process at a time.
+	:param cache_dir: The directory of the :class:`~flake8_dunder_all.cache.ResultCache` to use.
+		If :py:obj:`None` the cache is disabled.
+	:param engine: The engine used to find the members of each module.
+	:param sort: The order to sort ``__all__`` in, if at all. See :func:`~flake8_dunder_all.check_and_add_all`.
+	"""
+
+	if batch_size < 1:
+		raise ValueError("'batch_size' must be at least 1")
+
+	kwargs = {
+			"quote_type": quote_type,
+			"use_tuple": use_tuple,
+			"engine": engine,
+			"sort": sort,
+			}
+
+	sources = iter(sources)
+	first = list(itertools.islice(sources, batch_size + 1))
+
+	if jobs <= 1 or len(first) <= batch_size:
+		# Not worth starting the worker processes for a single batch.
+		cache = None if cache_dir is None else get_cache(cache_dir)
+		for source in itertools.chain(first, sources):
+			yield check_source(source, cache=cache, **kwargs)
+		return
+
+	batches = _batches(itertools.chain(first, sources), batch_size)
+	in_flight: Deque["multiprocessing.pool.AsyncResult[List[SourceResult]]"] = collections.deque()
+
+	with multiprocessing.Pool(processes=jobs) as pool:
+		# Pool.imap would read the whole of ``sources`` ahead of the results, so the batches are submitted
+		# one at a time, and only once there is room for them.
+		for batch in batches:
+			in_flight.append(pool.apply_async(_check_batch, ((batch, cache_dir, kwargs), )))
+
+			if len(in_flight) >= jobs * 2:
+				yield from in_flight.popleft().get()
+
+		while in_flight:
+			yield from in_flight.popleft().get()
+
+
+def _batches(sources: Iterator[Union[str, bytes]], batch_size: int) -> Iterator[List[Union[str, bytes]]]:
+	while True:
+		batch = list(itertools.islice(sources, batch_size))
+		if not batch:
+			return
+		yield batch
@@ -40,22 +40,157 @@ General utility functions.
 
 # stdlib
 import ast
-import functools
+import io
+import os
 import re
 import sys
+import tokenize
 from textwrap import dedent
-from typing import Match, Optional, Union
+from typing import TYPE_CHECKING, Iterable, Match, Optional, Set, Tuple, Union
 
-# 3rd party
-from astatine import mark_text_ranges
-from flake8 import defaults  # type: ignore[import-untyped]
+if TYPE_CHECKING:
+	# 3rd party
+	from domdf_python_tools.typing import PathLike
 
-__all__ = ("get_docstring_lineno", "tidy_docstring", "mark_text_ranges")
+__all__ = (
+		"decode_source",
+		"find_noqa_codes",
+		"get_docstring_lineno",
+		"tidy_docstring",
+		"mark_text_ranges",
+		"write_atomic",
+		)
 
 
-@functools.lru_cache(maxsize=512)
-def find_noqa(physical_line: str) -> Optional[Match[str]]:
-	return defaults.NOQA_INLINE_REGEXP.search(physical_line)
+def mark_text_ranges(node: ast.AST, source: str) -> None:
+	"""
+	Set the ``end_lineno`` and ``end_col_offset`` attributes of ``node`` and its children.
+
+	This is a thin wrapper around :func:`astatine.mark_text_ranges`, which is only imported when needed.
+
+	:param node:
+	:param source: The source code ``node`` was parsed from.
+	"""
+
+	# 3rd party
+	import astatine
+
+	astatine.mark_text_ranges(node, source)
+
+
+def _codes_from_matches(matches: Iterable[Match[str]]) -> Set[str]:
+	codes: Set[str] = set()
+
+	for match in matches:
+		if match["codes"]:
+			codes.update(re.split(r"[,\s]+", match["codes"].strip().upper()))
+
+	return codes
+
+
+def find_noqa_codes(source: str) -> Set[str]:
+	"""
+	Returns the set of codes suppressed by ``# noqa: ...`` comments anywhere in ``source``.
+
+	The whole source is searched in a single pass.
+	If there are any matches the source is tokenized so that only genuine comments are considered,
+	and not text inside strings. If the source can't be tokenized all matches are used.
+
+	Bare ``# noqa`` comments, without any codes, are ignored.
+
+	:param source:
+
+	.. versionadded:: 0.6.0
+	"""
+
+	# 3rd party
+	from flake8 import defaults  # type: ignore[import-untyped]
+
+	noqa_regexp = defaults.NOQA_INLINE_REGEXP
+
+	matches = list(noqa_regexp.finditer(source))
+	if not matches:
+		return set()
+
+	try:
+		comments = [
+				token.string
+				for token in tokenize.generate_tokens(io.StringIO(source).readline)
+				if token.type == tokenize.COMMENT
+				]
+	except (tokenize.TokenError, SyntaxError):
+		return _codes_from_matches(matches)
+
+	return _codes_from_matches(filter(None, map(noqa_regexp.search, comments)))
+
+
+def decode_source(data: bytes) -> Tuple[str, str]:
+	"""
+	Decode Python source code, using the encoding declared in the file as described in :pep:`263`.
+
+	Newlines are normalised to ``\\n``, as when reading a file in text mode.
+
+	:param data: The raw content of the file.
+
+	:returns: The decoded source, and the name of its encoding.
+
+	:raises SyntaxError: If the file declares an invalid encoding.
+	:raises UnicodeDecodeError: If the file can't be decoded using its encoding.
+
+	.. versionadded:: 0.6.0
+	"""
+
+	encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+	source = data.decode(encoding)
+
+	if '\r' in source:
+		source = source.replace("\r\n", '\n').replace('\r', '\n')
+
+	return source, encoding
+
+
+def write_atomic(filename: "PathLike", data: bytes) -> None:
+	"""
+	Replace the content of ``filename`` with ``data``.
+
+	The data is written to a temporary file in the same directory, which is then renamed over ``filename``,
+	so the file never contains partially written data. The permissions of the original file are preserved.
+	If ``filename`` is a symbolic link the file it points to is replaced.
+
+	:param filename:
+	:param data:
+
+	.. versionadded:: 0.6.0
+	"""
+
+	# stdlib
+	import stat
+	import tempfile
+
+	target = os.path.realpath(filename)
+	directory, name = os.path.split(target)
+	fd, tmp_filename = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+
+	try:
+		with os.fdopen(fd, "wb") as fp:
+			fp.write(data)
+			fp.flush()
+			os.fsync(fp.fileno())
+
+		try:
+			os.chmod(tmp_filename, stat.S_IMODE(os.stat(target).st_mode))
+		except FileNotFoundError:
+			pass
+
+		os.replace(tmp_filename, target)
+
+	except BaseException:
+		try:
+			os.unlink(tmp_filename)
+		except OSError:
+			pass
+
+		raise
 
 
 def get_docstring_lineno(node: Union[ast.FunctionDef, ast.ClassDef, ast.Module]) -> Optional[int]:
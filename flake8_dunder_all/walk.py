@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+#
+#  walk.py
+"""
+Find the Python source files in directories.
+
+Excluded directories are pruned without being listed, and files reached more than once
+(for example through symbolic links) are only reported the first time.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import os
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Pattern, Sequence, Set, Tuple
+
+__all__ = ("DEFAULT_EXCLUDES", "ExcludeMatcher", "GitIgnore", "walk")
+
+#: Directories and files which are excluded by default.
+#: Virtual environments (directories containing ``pyvenv.cfg``) are always excluded.
+DEFAULT_EXCLUDES: Tuple[str, ...] = (".*", "__pycache__", "build", "dist", "node_modules", "*.egg-info")
+
+
+def _translate(pattern: str) -> str:
+	"""
+	Translate a glob to a regular expression, where ``*`` and ``?`` don't match ``/`` and ``**`` matches any path.
+	"""
+
+	parts = []
+	idx = 0
+
+	while idx < len(pattern):
+		char = pattern[idx]
+
+		if pattern.startswith("**/", idx):
+			parts.append("(?:.*/)?")
+			idx += 3
+			continue
+		elif pattern.startswith("**", idx):
+			parts.append(".*")
+			idx += 2
+			continue
+		elif char == '*':
+			parts.append("[^/]*")
+		elif char == '?':
+			parts.append("[^/]")
+		elif char == '[':
+			end = pattern.find(']', idx + 2)
+			if end == -1:
+				parts.append(re.escape(char))
+			else:
+				body = pattern[idx + 1:end]
+				if body.startswith('!'):
+					body = '^' + body[1:]
+				parts.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+				idx = end
+		elif char == '\\' and idx + 1 < len(pattern):
+			idx += 1
+			parts.append(re.escape(pattern[idx]))
+		else:
+			parts.append(re.escape(char))
+
+		idx += 1
+
+	return ''.join(parts)
+
+
+class ExcludeMatcher:
+	"""
+	Matches paths against a list of globs, which are compiled into a single regular expression.
+
+	Globs containing a ``/`` are matched against the whole path relative to the directory being walked.
+	Other globs are matched against the name of the file or directory.
+
+	:param patterns:
+	"""
+
+	def __init__(self, patterns: Iterable[str]):
+		name_patterns = []
+		path_patterns = []
+
+		for pattern in patterns:
+			if '/' in pattern.rstrip('/'):
+				path_patterns.append(_translate(pattern.strip('/')))
+			else:
+				name_patterns.append(_translate(pattern.rstrip('/')))
+
+		self._names = re.compile('|'.join(name_patterns)) if name_patterns else None
+		self._paths = re.compile('|'.join(path_patterns)) if path_patterns else None
+
+	def __call__(self, relpath: str, name: str) -> bool:
+		"""
+		Returns whether the file or directory should be excluded.
+
+		:param relpath: The path relative to the directory being walked, using ``/`` as the separator.
+		:param name: The name of the file or directory.
+		"""
+
+		return bool(
+				(self._names is not None and self._names.fullmatch(name))
+				or (self._paths is not None and self._paths.fullmatch(relpath))
+				)
+
+
+class _Rule(NamedTuple):
+	regex: str
+	negate: bool
+	directory_only: bool
+
+
+class GitIgnore:
+	"""
+	The patterns from a ``.gitignore`` file.
+
+	All the patterns are compiled into one regular expression, in reverse order,
+	so the first alternative to match is the last matching pattern, which is the one that takes effect.
+
+	:param lines: The lines of the file.
+	"""
+
+	def __init__(self, lines: Iterable[str]):
+		rules: List[_Rule] = []
+
+		for line in lines:
+			line = line.rstrip("\r\n")
+			if not line.endswith("\\ "):
+				line = line.rstrip(' ')
+			if not line or line.startswith('#'):
+				continue
+
+			negate = line.startswith('!')
+			if negate:
+				line = line[1:]
+			elif line.startswith("\\!") or line.startswith("\\#"):
+				line = line[1:]
+
+			directory_only = line.endswith('/')
+			line = line.rstrip('/')
+			if not line:
+				continue
+
+			if '/' in line:
+				regex = _translate(line.lstrip('/'))
+			else:
+				regex = "(?:.*/)?" + _translate(line)
+
+			rules.append(_Rule(regex, negate, directory_only))
+
+		self._rules = rules[::-1]
+		self._directories = self._compile(rules[::-1])
+		self._files = self._compile([rule for rule in rules[::-1] if not rule.directory_only])
+
+	@staticmethod
+	def _compile(rules: Sequence[_Rule]) -> Optional[Pattern[str]]:
+		if not rules:
+			return None
+
+		return re.compile('|'.join(f"({rule.regex})" for rule in rules))
+
+	@classmethod
+	def load(cls, filename: str) -> Optional["GitIgnore"]:
+		"""
+		Read ``filename``, returning :py:obj:`None` if it can't be read.
+
+		:param filename:
+		"""
+
+		try:
+			with open(filename, encoding="UTF-8", errors="replace") as fp:
+				return cls(fp)
+		except OSError:
+			return None
+
+	def match(self, relpath: str, is_dir: bool) -> Optional[bool]:
+		"""
+		Returns whether ``relpath`` is ignored.
+
+		:param relpath: The path relative to the directory containing the ``.gitignore`` file,
+			using ``/`` as the separator.
+		:param is_dir: Whether the path is a directory.
+
+		:returns: :py:obj:`True` if it is ignored, :py:obj:`False` if it is explicitly not ignored,
+			or :py:obj:`None` if no pattern matches.
+		"""
+
+		regex = self._directories if is_dir else self._files
+		if regex is None:
+			return None
+
+		match = regex.fullmatch(relpath)
+		if match is None:
+			return None
+
+		rules = self._rules if is_dir else [rule for rule in self._rules if not rule.directory_only]
+		return not rules[match.lastindex - 1].negate  # type: ignore[operator]
+
+
+class _ActiveIgnore(NamedTuple):
+	# How to turn a path relative to the walk's root into one relative to the .gitignore file's directory.
+	ignore: GitIgnore
+	strip: int
+	prepend: str
+
+
+def _is_ignored(ignores: Sequence[_ActiveIgnore], relpath: str, is_dir: bool) -> bool:
+	# The deepest .gitignore file with a matching pattern takes precedence.
+	for active in reversed(ignores):
+		result = active.ignore.match(active.prepend + relpath[active.strip:], is_dir)
+		if result is not None:
+			return result
+
+	return False
+
+
+def _parent_ignores(root: str) -> List[_ActiveIgnore]:
+	"""
+	Returns the ``.gitignore`` files which apply to ``root``, from the top of its git repository downwards.
+	"""
+
+	directory = os.path.abspath(root)
+	relative: List[str] = []
+	parents = []
+
+	while True:
+		parents.append((directory, '/'.join(reversed(relative))))
+
+		if os.path.exists(os.path.join(directory, ".git")):
+			break
+
+		parent, name = os.path.split(directory)
+		if parent == directory:
+			# Not in a git repository
+			return []
+
+		relative.append(name)
+		directory = parent
+
+	ignores = []
+	top = parents[-1][0]
+
+	for path in (os.path.join(top, ".git", "info", "exclude"), ):
+		ignore = GitIgnore.load(path)
+		if ignore is not None:
+			ignores.append(_ActiveIgnore(ignore, 0, parents[-1][1] + '/' if parents[-1][1] else ''))
+
+	for directory, offset in reversed(parents[1:]):
+		ignore = GitIgnore.load(os.path.join(directory, ".gitignore"))
+		if ignore is not None:
+			ignores.append(_ActiveIgnore(ignore, 0, offset + '/'))
+
+	return ignores
+
+
+def walk(
+		paths: Iterable[str],
+		exclude: Iterable[str] = DEFAULT_EXCLUDES,
+		gitignore: bool = True,
+		) -> Iterator[str]:
+	"""
+	Returns an iterator over the given files, and the Python source files in the given directories.
+
+	Directories are searched recursively, in sorted order, and each directory's files are returned
+	before its subdirectories are searched.
+
+	:param paths: Filenames and directories. Filenames are returned as they are, whatever their extension.
+	:param exclude: Globs of files and directories to skip. See :class:`~.ExcludeMatcher`.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+	"""
+
+	excluded = ExcludeMatcher(exclude)
+	seen_directories: Set[Tuple[int, int]] = set()
+	seen_files: Set[Tuple[int, int]] = set()
+
+	for path in paths:
+		if os.path.isdir(path):
+			yield from _walk_directory(path, excluded, gitignore, seen_directories, seen_files)
+		else:
+			yield path
+
+
+def _walk_directory(
+		root: str,
+		excluded: ExcludeMatcher,
+		gitignore: bool,
+		seen_directories: Set[Tuple[int, int]],
+		seen_files: Set[Tuple[int, int]],
+		) -> Iterator[str]:
+
+	try:
+		st = os.stat(root)
+	except OSError:
+		return
+
+	if (st.st_dev, st.st_ino) in seen_directories:
+		return
+	seen_directories.add((st.st_dev, st.st_ino))
+
+	ignores = _parent_ignores(root) if gitignore else []
+	stack = [(root, '', st.st_dev, ignores)]
+
+	while stack:
+		dirpath, relpath, device, ignores = stack.pop()
+
+		try:
+			with os.scandir(dirpath) as it:
+				entries = sorted(it, key=lambda entry: entry.name)
+		except OSError:
+			continue
+
+		if relpath and any(entry.name == "pyvenv.cfg" for entry in entries):
+			continue
+
+		if gitignore and any(entry.name == ".gitignore" for entry in entries):
+			ignore = GitIgnore.load(os.path.join(dirpath, ".gitignore"))
+			if ignore is not None:
+				ignores = [*ignores, _ActiveIgnore(ignore, len(relpath) + 1 if relpath else 0, '')]
+
+		subdirectories = []
+
+		for entry in entries:
+			name = entry.name
+			child = f"{relpath}/{name}" if relpath else name
+
+			try:
+				is_dir = entry.is_dir()
+				is_symlink = entry.is_symlink()
+			except OSError:
+				continue
+
+			if is_dir:
+				if excluded(child, name) or (ignores and _is_ignored(ignores, child, True)):
+					continue
+
+				try:
+					key = _identity(entry, device, is_symlink)
+				except OSError:
+					continue
+
+				if key not in seen_directories:
+					seen_directories.add(key)
+					subdirectories.append((entry.path, child, key[0], ignores))
+
+			elif name.endswith(".py"):
+				if excluded(child, name) or (ignores and _is_ignored(ignores, child, False)):
+					continue
+
+				try:
+					if not entry.is_file():
+						continue
+					key = _identity(entry, device, is_symlink)
+				except OSError:
+					continue
+
+				if key not in seen_files:
+					seen_files.add(key)
+					yield entry.path
+
+		stack.extend(reversed(subdirectories))
+
+
+def _is_walked(root: str, relpath: str, is_dir: bool, excluded: ExcludeMatcher, gitignore: bool) -> bool:
+	"""
+	Returns whether :func:`~.walk` would include ``relpath`` when searching ``root``,
+	without searching the rest of ``root``.
+
+	:param root: The directory being searched.
+	:param relpath: The path of a file or directory within ``root``, relative to it.
+	:param is_dir: Whether ``relpath`` is a directory.
+	:param excluded:
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+	"""
+
+	parts = [part for part in relpath.replace(os.sep, '/').split('/') if part not in {'', os.curdir}]
+	ignores = _parent_ignores(root) if gitignore else []
+	dirpath, child = root, ''
+
+	for idx, name in enumerate(parts):
+		if child and os.path.isfile(os.path.join(dirpath, "pyvenv.cfg")):
+			return False
+
+		if gitignore:
+			ignore = GitIgnore.load(os.path.join(dirpath, ".gitignore"))
+			if ignore is not None:
+				ignores = [*ignores, _ActiveIgnore(ignore, len(child) + 1 if child else 0, '')]
+
+		child = f"{child}/{name}" if child else name
+		child_is_dir = is_dir or idx < len(parts) - 1
+
+		if excluded(child, name) or (ignores and _is_ignored(ignores, child, child_is_dir)):
+			return False
+
+		dirpath = os.path.join(dirpath, name)
+
+	return True
+
+
+def _identity(entry: os.DirEntry, device: int, is_symlink: bool) -> Tuple[int, int]:
+	# The inode number is available from the directory listing without another system call,
+	# but the target of a symbolic link has to be looked up.
+	if is_symlink:
+		st = os.stat(entry.path)
+		return st.st_dev, st.st_ino
+
+	return device, entry.inode()
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+#
+#  watch.py
+"""
+Watch files and directories, checking Python source files again whenever they change.
+
+On Linux changes are detected using inotify, and on other platforms by polling.
+Bursts of changes, such as those produced by an editor saving several files, are gathered together
+before any files are checked, and files whose content hasn't changed since they were last checked are skipped.
+
+.. versionadded:: 0.6.0
+"""
+#
+#  Copyright (c) 2020-2022 Dominic Davis-Foster <dominic@davis-foster.co.uk>
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in
+#  all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#  AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#  THE SOFTWARE.
+#
+
+
+# stdlib
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+# this package
+from flake8_dunder_all import AlphabeticalOptions, Engine, check_and_add_all
+from flake8_dunder_all.cache import get_cache
+from flake8_dunder_all.walk import DEFAULT_EXCLUDES, ExcludeMatcher, _is_walked, walk
+
+__all__ = (
+		"IncrementalChecker",
+		"InotifyWatcher",
+		"PollingWatcher",
+		"Watcher",
+		"make_watcher",
+		"walk_python_files",
+		"watch_files",
+		)
+
+# From <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def walk_python_files(
+		paths: Iterable[str],
+		exclude: Iterable[str] = DEFAULT_EXCLUDES,
+		gitignore: bool = True,
+		) -> Iterator[str]:
+	"""
+	Returns an iterator over the Python source files in ``paths``.
+
+	Directories are searched recursively with :func:`flake8_dunder_all.walk.walk`.
+	Files are always included, whatever their extension.
+
+	:param paths: Filenames and directories.
+	:param exclude: Globs of files and directories to skip. See :func:`flake8_dunder_all.walk.walk`.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+	"""
+
+	return walk(paths, exclude=exclude, gitignore=gitignore)
+
+
+class _FileState(NamedTuple):
+	stat: Tuple[int, int]
+	digest: bytes
+	retv: int
+
+
+def _stat_key(filename: str) -> Optional[Tuple[int, int]]:
+	try:
+		st = os.stat(filename)
+	except OSError:
+		return None
+
+	return st.st_mtime_ns, st.st_size
+
+
+def _digest(filename: str) -> Optional[bytes]:
+	try:
+		with open(filename, "rb") as fp:
+			return hashlib.blake2b(fp.read(), digest_size=16).digest()
+	except OSError:
+		return None
+
+
+class IncrementalChecker:
+	"""
+	Checks files with :func:`~flake8_dunder_all.check_and_add_all`, remembering the result for each file.
+
+	A file is only checked again if its modification time or size has changed *and* its content differs
+	from when it was last checked.
+
+	:param kwargs: Keyword arguments for :func:`~flake8_dunder_all.check_and_add_all`.
+	"""
+
+	def __init__(self, **kwargs):
+		self.kwargs = kwargs
+		self._states: Dict[str, _FileState] = {}
+
+	def check(self, filename: str) -> Optional[int]:
+		"""
+		Check ``filename`` if it has changed since it was last checked.
+
+		:param filename:
+
+		:returns: The value returned by :func:`~flake8_dunder_all.check_and_add_all`,
+			or :py:obj:`None` if the file is unchanged or no longer exists.
+		"""
+
+		stat = _stat_key(filename)
+		if stat is None:
+			self._states.pop(filename, None)
+			return None
+
+		state = self._states.get(filename)
+		if state is not None and state.stat == stat:
+			return None
+
+		digest = _digest(filename)
+		if state is not None and state.digest == digest:
+			self._states[filename] = state._replace(stat=stat)
+			return None
+
+		retv = check_and_add_all(filename=filename, **self.kwargs)
+
+		if retv & 1:
+			# Don't check the file again just because __all__ was added to it.
+			stat, digest = _stat_key(filename), _digest(filename)
+
+		if stat is not None and digest is not None:
+			self._states[filename] = _FileState(stat, digest, retv)
+
+		return retv
+
+	def result(self, filename: str) -> Optional[int]:
+		"""
+		Returns the result from when ``filename`` was last checked, or :py:obj:`None` if it hasn't been checked.
+
+		:param filename:
+		"""
+
+		state = self._states.get(filename)
+		return None if state is None else state.retv
+
+
+class Watcher:
+	"""
+	Base class for objects which detect changes to Python source files.
+
+	:param paths: The filenames and directories to watch. Directories are watched recursively.
+	:param exclude: Globs of files and directories to skip. See :func:`flake8_dunder_all.walk.walk`.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+	"""
+
+	def __init__(
+			self,
+			paths: Iterable[str],
+			exclude: Iterable[str] = DEFAULT_EXCLUDES,
+			gitignore: bool = True,
+			):
+		self.files: Set[str] = set()
+		self.directories: List[str] = []
+		self.exclude = tuple(exclude)
+		self.gitignore = gitignore
+		self._excluded = ExcludeMatcher(self.exclude)
+
+		for path in paths:
+			if os.path.isdir(path):
+				self.directories.append(os.path.normpath(path))
+			else:
+				self.files.add(os.path.normpath(path))
+
+	def is_watched(self, filename: str) -> bool:
+		"""
+		Returns whether changes to ``filename`` should be reported.
+
+		:param filename:
+		"""
+
+		if filename in self.files:
+			return True
+
+		return filename.endswith(".py") and self._in_directories(filename, is_dir=False)
+
+	def _locate(self, path: str) -> Optional[Tuple[str, str]]:
+		# Returns the watched directory containing ``path``, and the path relative to it.
+		for directory in self.directories:
+			if os.path.commonpath([directory, path]) == directory:
+				return directory, os.path.relpath(path, directory)
+
+		return None
+
+	def _in_directories(self, path: str, is_dir: bool) -> bool:
+		# Whether ``path`` is within a watched directory, and not excluded or ignored.
+		located = self._locate(path)
+		if located is None:
+			return False
+
+		return _is_walked(*located, is_dir, self._excluded, self.gitignore)
+
+	def _walk(self) -> Iterator[str]:
+		return walk_python_files([*sorted(self.files), *self.directories], self.exclude, self.gitignore)
+
+	def wait(self, timeout: Optional[float] = None) -> Set[str]:
+		"""
+		Wait for files to change.
+
+		:param timeout: The maximum time to wait, in seconds. If :py:obj:`None`, wait until a file changes.
+
+		:returns: The files which changed, which may be empty if the timeout expired.
+		"""
+
+		raise NotImplementedError
+
+	def close(self) -> None:
+		"""
+		Stop watching for changes.
+		"""
+
+	def __enter__(self) -> "Watcher":
+		return self
+
+	def __exit__(self, *args) -> None:
+		self.close()
+
+
+class PollingWatcher(Watcher):
+	"""
+	Detects changes by periodically comparing the modification time and size of each file.
+
+	:param paths: The filenames and directories to watch. Directories are watched recursively.
+	:param interval: The time between scans, in seconds.
+	:param exclude: Globs of files and directories to skip. See :func:`flake8_dunder_all.walk.walk`.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+	"""
+
+	def __init__(
+			self,
+			paths: Iterable[str],
+			interval: float = 1.0,
+			exclude: Iterable[str] = DEFAULT_EXCLUDES,
+			gitignore: bool = True,
+			):
+		super().__init__(paths, exclude, gitignore)
+		self.interval = interval
+		self._snapshot = self._scan()
+
+	def _scan(self) -> Dict[str, Optional[Tuple[int, int]]]:
+		return {filename: _stat_key(filename) for filename in self._walk()}
+
+	def wait(self, timeout: Optional[float] = None) -> Set[str]:  # noqa: D102
+		deadline = None if timeout is None else time.monotonic() + timeout
+
+		while True:
+			delay = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+			if delay > 0:
+				time.sleep(delay)
+
+			snapshot = self._scan()
+			changed = {
+					filename
+					for filename, stat in snapshot.items()
+					if stat is not None and self._snapshot.get(filename) != stat
+					}
+			self._snapshot = snapshot
+
+			if changed or (deadline is not None and time.monotonic() >= deadline):
+				return changed
+
+
+class InotifyWatcher(Watcher):
+	"""
+	Detects changes using Linux's inotify API.
+
+	New subdirectories of the watched directories are watched as they are created.
+
+	:param paths: The filenames and directories to watch. Directories are watched recursively.
+	:param exclude: Globs of files and directories to skip. See :func:`flake8_dunder_all.walk.walk`.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+
+	:raises OSError: If inotify is unavailable.
+	"""
+
+	def __init__(
+			self,
+			paths: Iterable[str],
+			exclude: Iterable[str] = DEFAULT_EXCLUDES,
+			gitignore: bool = True,
+			):
+		super().__init__(paths, exclude, gitignore)
+
+		if not sys.platform.startswith("linux"):
+			raise OSError("inotify is only available on Linux.")
+
+		self._libc = ctypes.CDLL(ctypes.util.find_library('c') or "libc.so.6", use_errno=True)
+		self._fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+		if self._fd < 0:
+			errno = ctypes.get_errno()
+			raise OSError(errno, os.strerror(errno))
+
+		self._watches: Dict[int, str] = {}
+
+		for filename in self.files:
+			self._add_watch(os.path.dirname(filename) or os.curdir)
+		for directory in self.directories:
+			self._add_tree(directory)
+
+	def _add_watch(self, directory: str) -> None:
+		mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_ONLYDIR
+		wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+		if wd < 0:
+			errno = ctypes.get_errno()
+			raise OSError(errno, os.strerror(errno), directory)
+
+		self._watches[wd] = directory
+
+	def _add_tree(self, directory: str) -> Set[str]:
+		# Returns any Python files already in the new directories, which were created before the watch was added.
+		found = set()
+
+		for dirpath, dirnames, filenames in os.walk(directory):
+			# Only the exclude globs are used to prune the tree, as they are cheap to check.
+			# Files within ignored directories are still filtered out by is_watched.
+			dirnames[:] = [d for d in dirnames if not self._is_excluded(os.path.join(dirpath, d))]
+			self._add_watch(dirpath)
+			found.update(os.path.join(dirpath, f) for f in filenames if f.endswith(".py"))
+
+		return {filename for filename in found if self.is_watched(filename)}
+
+	def _is_excluded(self, path: str) -> bool:
+		located = self._locate(path)
+		if located is None:
+			return False
+
+		relpath = located[1].replace(os.sep, '/')
+		return self._excluded(relpath, os.path.basename(path))
+
+	def _read_events(self) -> Set[str]:
+		changed: Set[str] = set()
+
+		while True:
+			try:
+				data = os.read(self._fd, 65536)
+			except BlockingIOError:
+				return changed
+
+			offset = 0
+			while offset < len(data):
+				wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+				offset += _EVENT_HEADER.size
+				name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+				offset += length
+
+				if mask & _IN_Q_OVERFLOW:
+					# Events were lost, so report everything and let the checker skip unchanged files.
+					changed.update(self._walk())
+					continue
+				elif mask & _IN_IGNORED:
+					self._watches.pop(wd, None)
+					continue
+				elif wd not in self._watches:
+					continue
+
+				path = os.path.join(self._watches[wd], name)
+
+				if mask & _IN_ISDIR:
+					if self._in_directories(path, is_dir=True):
+						changed.update(self._add_tree(path))
+				elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO) and self.is_watched(path):
+					changed.add(path)
+
+	def wait(self, timeout: Optional[float] = None) -> Set[str]:  # noqa: D102
+		deadline = None if timeout is None else time.monotonic() + timeout
+
+		while True:
+			remaining = None if deadline is None else max(0, deadline - time.monotonic())
+			readable, _, _ = select.select([self._fd], [], [], remaining)
+
+			changed = self._read_events() if readable else set()
+			if changed or (deadline is not None and time.monotonic() >= deadline):
+				return changed
+
+	def close(self) -> None:  # noqa: D102
+		if self._fd >= 0:
+			os.close(self._fd)
+			self._fd = -1
+
+
+def make_watcher(
+		paths: Iterable[str],
+		poll_interval: float = 1.0,
+		exclude: Iterable[str] = DEFAULT_EXCLUDES,
+		gitignore: bool = True,
+		) -> Watcher:
+	"""
+	Returns an :class:`~.InotifyWatcher` if inotify is available, or a :class:`~.PollingWatcher` otherwise.
+
+	:param paths: The filenames and directories to watch. Directories are watched recursively.
+	:param poll_interval: The time between scans, in seconds, if polling.
+	:param exclude: Globs of files and directories to skip. See :func:`flake8_dunder_all.walk.walk`.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+	"""
+
+	paths = list(paths)
+
+	try:
+		return InotifyWatcher(paths, exclude, gitignore)
+	except (OSError, AttributeError):
+		return PollingWatcher(paths, interval=poll_interval, exclude=exclude, gitignore=gitignore)
+
+
+def watch_files(
+		paths: Iterable[str],
+		quote_type: str = '"',
+		use_tuple: bool = False,
+		cache_dir: Optional[str] = None,
+		engine: Engine = Engine.VISITOR,
+		prefilter: bool = False,
+		debounce: float = 0.2,
+		watcher: Optional[Watcher] = None,
+		write: bool = True,
+		sort: AlphabeticalOptions = AlphabeticalOptions.NONE,
+		exclude: Iterable[str] = DEFAULT_EXCLUDES,
+		gitignore: bool = True,
+		) -> Iterator[Tuple[str, int]]:
+	"""
+	Check the Python source files in ``paths``, and then check them again whenever they change.
+
+	This generator never finishes on its own.
+
+	:param paths: The filenames and directories to watch. Directories are watched recursively.
+	:param quote_type: The type of quote to use for strings.
+	:param use_tuple: Whether to use tuples instead of lists for ``__all__``.
+	:param cache_dir: The directory of the :class:`~flake8_dunder_all.cache.ResultCache` to use.
+		If :py:obj:`None` the cache is disabled.
+	:param engine: The engine used to find the members of each module.
+	:param prefilter: Whether to try to decide the result from the raw bytes of each file before parsing it.
+	:param debounce: Changes are gathered together until there have been none for this many seconds.
+	:param watcher: The :class:`~.Watcher` to use. Defaults to the one returned by :func:`~.make_watcher`.
+	:param write: If :py:obj:`False`, files are never modified. See :func:`~flake8_dunder_all.check_and_add_all`.
+	:param sort: The order to sort ``__all__`` in, if at all. See :func:`~flake8_dunder_all.check_and_add_all`.
+	:param exclude: Globs of files and directories to skip. See :func:`flake8_dunder_all.walk.walk`.
+		Ignored if ``watcher`` is given.
+	:param gitignore: Whether to skip files and directories ignored by ``.gitignore`` files.
+		Ignored if ``watcher`` is given.
+
+	:returns: An iterator of filenames and the value returned by :func:`~flake8_dunder_all.check_and_add_all`
+		for each file which was checked.
+	"""
+
+	paths = [os.path.normpath(path) for path in paths]
+	checker = IncrementalChecker(
+			quote_type=quote_type,
+			use_tuple=use_tuple,
+			cache=None if cache_dir is None else get_cache(cache_dir),
+			engine=engine,
+			prefilter=prefilter,
+			write=write,
+			sort=sort,
+			)
+
+	if watcher is None:
+		watcher = make_watcher(paths, exclude=exclude, gitignore=gitignore)
+
+	with watcher:
+		for filename in walk_python_files(paths, watcher.exclude, watcher.gitignore):
+			retv = checker.check(filename)
+			if retv is not None:
+				yield filename, retv
+
+		while True:
+			changed = watcher.wait()
+
+			while True:
+				more = watcher.wait(debounce)
+				if not more:
+					break
+				changed |= more
+
+			for filename in sorted(changed):
+				retv = checker.check(filename)
+				if retv is not None:
+					yield filename, retv
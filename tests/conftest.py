@@ -1 +1,21 @@
+# 3rd party
+import pytest
+from domdf_python_tools.paths import PathPlus
+
 pytest_plugins = ("coincidence", )
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch) -> PathPlus:
+	# Keep the cache of results out of the user's home directory.
+	cache_dir = PathPlus(tmp_path_factory.mktemp("cache"))
+	monkeypatch.setenv("FLAKE8_DUNDER_ALL_CACHE_DIR", str(cache_dir))
+	return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def socket_path(tmp_path_factory, monkeypatch) -> str:
+	# Don't forward anything to a daemon the user may be running.
+	socket_path = str(tmp_path_factory.mktemp("daemon") / "daemon.sock")
+	monkeypatch.setenv("FLAKE8_DUNDER_ALL_SOCKET", socket_path)
+	return socket_path
@@ -0,0 +1,158 @@
+# stdlib
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+
+# 3rd party
+import pytest
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all import aio
+from flake8_dunder_all.aio import check_paths_async
+from flake8_dunder_all.parallel import FileOutcome, check_files
+from tests.common import mangled_source, testing_source_a, testing_source_b, testing_source_e
+
+
+@pytest.fixture()
+def source_dir(tmp_pathplus: PathPlus) -> PathPlus:
+	source_dir = tmp_pathplus / "src"
+	source_dir.mkdir()
+
+	for idx, source in enumerate([testing_source_a, testing_source_b, testing_source_e, testing_source_b * 50]):
+		(source_dir / f"source_{idx}.py").write_text(source)
+
+	return source_dir
+
+
+async def _collect(*args, **kwargs) -> List[FileOutcome]:
+	return [outcome async for outcome in check_paths_async(*args, **kwargs)]
+
+
+def _untimed(outcomes: Iterable[FileOutcome]) -> List[FileOutcome]:
+	return [outcome._replace(duration=0.0) for outcome in outcomes]
+
+
+@pytest.mark.parametrize("threads", [pytest.param(False, id="processes"), pytest.param(True, id="threads")])
+def test_check_paths_async(source_dir: PathPlus, threads: bool):
+	expected = _untimed(check_files(sorted(map(str, source_dir.iterdir())), write=False))
+
+	if threads:
+		with ThreadPoolExecutor(max_workers=2) as executor:
+			outcomes = asyncio.run(_collect([str(source_dir)], write=False, executor=executor, concurrency=2))
+	else:
+		outcomes = asyncio.run(_collect([str(source_dir)], write=False, concurrency=2))
+
+	assert sorted(_untimed(outcomes)) == expected
+	assert [outcome.retv for outcome in expected] == [0, 1, 0, 1]
+
+	outcomes = asyncio.run(_collect([str(source_dir)], concurrency=2))
+	assert sorted(outcome.retv for outcome in outcomes) == [0, 0, 1, 1]
+	assert "__all__ = [\"a_function\"]" in (source_dir / "source_1.py").read_text()
+
+
+def test_check_paths_async_threads_stderr(tmp_pathplus: PathPlus):
+	for idx in range(40):
+		(tmp_pathplus / f"valid_{idx}.py").write_text(testing_source_b)
+		(tmp_pathplus / f"mangled_{idx}.py").write_text(mangled_source)
+
+	stderr = sys.stderr
+
+	with ThreadPoolExecutor(max_workers=8) as executor:
+		outcomes = asyncio.run(_collect([str(tmp_pathplus)], write=False, executor=executor, concurrency=8))
+
+	# Each thread's messages end up with its own file, and sys.stderr is never replaced
+	assert sys.stderr is stderr
+	assert len(outcomes) == 80
+
+	for outcome in outcomes:
+		if "mangled" in outcome.filename:
+			assert outcome.retv == 4
+			assert outcome.stderr.count("does not appear to be a valid Python source file.") == 1
+			assert PathPlus(outcome.filename).name in outcome.stderr
+		else:
+			assert outcome.retv == 1
+			assert outcome.stderr.count("Would add") == 1
+			assert PathPlus(outcome.filename).name in outcome.stderr
+
+
+def test_check_paths_async_concurrency(source_dir: PathPlus, monkeypatch):
+	lock = threading.Lock()
+	running = 0
+	most = 0
+	check_one = aio._check_one
+
+	def slow_check_one(job):
+		nonlocal running, most
+
+		with lock:
+			running += 1
+			most = max(most, running)
+
+		time.sleep(0.05)
+
+		with lock:
+			running -= 1
+
+		return check_one(job)
+
+	monkeypatch.setattr(aio, "_check_one", slow_check_one)
+
+	with ThreadPoolExecutor(max_workers=4) as executor:
+		outcomes = asyncio.run(_collect([str(source_dir)], write=False, executor=executor, concurrency=2))
+
+	assert len(outcomes) == 4
+	assert most == 2
+
+
+def test_check_paths_async_cancel(source_dir: PathPlus, monkeypatch):
+	started: List[str] = []
+	release = threading.Event()
+	check_one = aio._check_one
+
+	def blocking_check_one(job):
+		started.append(job[1])
+		release.wait(5)
+		return check_one(job)
+
+	monkeypatch.setattr(aio, "_check_one", blocking_check_one)
+
+	async def run() -> None:
+		task = asyncio.ensure_future(_collect([str(source_dir)], executor=executor, concurrency=1))
+
+		while not started:
+			await asyncio.sleep(0.01)
+
+		task.cancel()
+		with pytest.raises(asyncio.CancelledError):
+			await task
+
+	with ThreadPoolExecutor(max_workers=1) as executor:
+		asyncio.run(run())
+		release.set()
+
+	assert started == [str(source_dir / "source_0.py")]
+	assert (source_dir / "source_1.py").read_text() == testing_source_b
+
+
+def test_check_paths_async_close(source_dir: PathPlus):
+
+	async def run() -> FileOutcome:
+		outcomes = check_paths_async([str(source_dir)], executor=executor, concurrency=1)
+		outcome = await outcomes.__anext__()
+		await outcomes.aclose()  # type: ignore[attr-defined]
+		return outcome
+
+	with ThreadPoolExecutor(max_workers=1) as executor:
+		outcome = asyncio.run(run())
+
+	assert outcome.filename == str(source_dir / "source_0.py")
+	assert (source_dir / "source_1.py").read_text() == testing_source_b
+
+
+def test_check_paths_async_concurrency_invalid():
+	with pytest.raises(ValueError, match="'concurrency' must be at least 1"):
+		asyncio.run(_collect(["foo.py"], concurrency=0))
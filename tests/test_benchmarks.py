@@ -0,0 +1,60 @@
+# stdlib
+import importlib.util
+import json
+import os
+import sys
+
+# 3rd party
+import pytest
+from domdf_python_tools.paths import PathPlus
+
+benchmarks_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+
+@pytest.fixture(scope="module")
+def suite():
+	spec = importlib.util.spec_from_file_location("suite", os.path.join(benchmarks_dir, "suite.py"))
+	module = importlib.util.module_from_spec(spec)  # type: ignore[arg-type]
+	spec.loader.exec_module(module)  # type: ignore[union-attr]
+	yield module
+	sys.path.remove(benchmarks_dir)
+
+
+def test_measure(suite):
+	calls = []
+	benchmark = suite.Benchmark("test", lambda: calls.append("run"), lambda: calls.append("setup"))
+	stats = suite.measure(benchmark, min_rounds=3, max_time=0)
+
+	assert stats["rounds"] == 3
+	assert calls == ["setup", "run"] * 3
+	assert stats["min"] <= stats["median"]
+
+
+def test_compare(suite):
+	baseline = {"a": {"min": 1.0}, "b": {"min": 1.0}}
+	results = {"a": {"min": 1.05}, "b": {"min": 1.5}, "c": {"min": 0.5}}
+
+	report, regressions = suite.compare(results, baseline, threshold=0.1)
+	assert regressions == ["b"]
+	assert len(report) == 3
+	assert report[1].endswith("REGRESSION")
+	assert report[2].endswith("(new)")
+
+
+def test_main(suite, tmp_pathplus: PathPlus, capsys):
+	output = tmp_pathplus / "results.json"
+	args = ["-k", "deep_imports", "--max-time", '0', "--min-rounds", '1']
+
+	assert suite.main([*args, "--output", str(output)]) == 0
+	results = json.loads(output.read_text())["benchmarks"]
+	assert set(results) == {
+			"visit[visitor-deep_imports]",
+			"visit[scanner-deep_imports]",
+			"scan[tokenize-deep_imports]",
+			"check_and_add_all[insert-deep_imports]",
+			"check_and_add_all[noop-deep_imports]",
+			}
+
+	# Nothing is slower than itself
+	assert suite.main([*args, "--baseline", str(output), "--threshold", "1000"]) == 0
+	assert "baseline" in capsys.readouterr().out
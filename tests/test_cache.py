@@ -0,0 +1,179 @@
+# stdlib
+import ast
+import itertools
+import pickle
+from typing import List
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+import flake8_dunder_all
+from flake8_dunder_all import AlphabeticalOptions, Engine, Plugin, cache, check_and_add_all
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.cache import ResultCache, default_cache_dir, make_key
+from tests.common import mangled_source, testing_source_b, testing_source_e
+
+
+@pytest.fixture()
+def result_cache(tmp_pathplus: PathPlus):
+	cache = ResultCache(str(tmp_pathplus / "cache"))
+	yield cache
+	cache.close()
+
+
+def test_default_cache_dir(monkeypatch):
+	monkeypatch.setenv("FLAKE8_DUNDER_ALL_CACHE_DIR", "/path/to/cache")
+	assert default_cache_dir() == "/path/to/cache"
+
+	monkeypatch.delenv("FLAKE8_DUNDER_ALL_CACHE_DIR")
+	monkeypatch.setenv("XDG_CACHE_HOME", "/path/to/xdg")
+	assert default_cache_dir() == "/path/to/xdg/flake8-dunder-all"
+
+
+def test_make_key():
+	key = make_key("fixer", b"def foo(): ...", quote_type='"', use_tuple=False)
+	assert key == make_key("fixer", b"def foo(): ...", use_tuple=False, quote_type='"')
+	assert key != make_key("fixer", b"def foo(): ...", quote_type="'", use_tuple=False)
+	assert key != make_key("fixer", b"def bar(): ...", quote_type='"', use_tuple=False)
+	assert key != make_key("plugin", b"def foo(): ...", quote_type='"', use_tuple=False)
+
+
+def test_make_key_interpreter(monkeypatch):
+	key = make_key("fixer", b"type X = int")
+
+	monkeypatch.setattr(cache.sys, "version_info", (3, 99, 0, "final", 0))
+	assert make_key("fixer", b"type X = int") != key
+
+
+def test_result_cache_access_batched(tmp_pathplus: PathPlus, monkeypatch):
+	monkeypatch.setattr(cache, "_ACCESS_BATCH", 3)
+	monkeypatch.setattr(cache.time, "time", itertools.count(1).__next__)
+
+	result_cache = ResultCache(str(tmp_pathplus / "cache"))
+	for key in "abcd":
+		result_cache.set(key, key)
+
+	def accessed() -> List[float]:
+		return [row[0] for row in result_cache.connection.execute("SELECT accessed FROM results ORDER BY key")]
+
+	# Cache hits don't write to the database until a batch of them has built up
+	assert result_cache.get('a') == 'a'
+	assert result_cache.get('b') == 'b'
+	assert result_cache.get('a') == 'a'
+	assert accessed() == [1, 2, 3, 4]
+
+	assert result_cache.get('c') == 'c'
+	assert accessed() == [7, 6, 8, 4]
+
+	# Any outstanding access times are recorded when the cache is closed
+	assert result_cache.get('d') == 'd'
+	result_cache.close()
+	assert accessed() == [7, 6, 8, 9]
+	result_cache.close()
+
+
+def test_result_cache(tmp_pathplus: PathPlus):
+	cache = ResultCache(str(tmp_pathplus / "cache"))
+	assert cache.get("abc") is None
+
+	cache.set("abc", {"retv": 0})
+	assert cache.get("abc") == {"retv": 0}
+	assert len(cache) == 1
+
+	# Values which can't be stored are silently ignored
+	cache.set("def", object())
+	assert cache.get("def") is None
+
+	unpickled = pickle.loads(pickle.dumps(cache))  # nosec: B301
+	assert unpickled.get("abc") == {"retv": 0}
+
+	cache.close()
+	unpickled.close()
+
+
+def test_result_cache_eviction(tmp_pathplus: PathPlus):
+	cache = ResultCache(str(tmp_pathplus / "cache"), max_entries=10)
+
+	for idx in range(25):
+		cache.set(str(idx), idx)
+
+	cache.evict()
+	assert len(cache) == 10
+	assert cache.get("24") == 24
+	assert cache.get("0") is None
+
+	cache.close()
+
+
+def test_check_and_add_all_cache(tmp_pathplus: PathPlus, result_cache: ResultCache, monkeypatch):
+	cache = result_cache
+
+	unchanged = tmp_pathplus / "unchanged.py"
+	unchanged.write_text(testing_source_e)
+	changed = tmp_pathplus / "changed.py"
+	changed.write_text(testing_source_b)
+
+	assert check_and_add_all(unchanged, cache=cache) == 0
+	assert check_and_add_all(changed, cache=cache) == 1
+	assert len(cache) == 1
+
+	def no_parse(*args, **kwargs):
+		raise AssertionError("Source should not be parsed")
+
+	monkeypatch.setattr(ast, "parse", no_parse)
+	assert check_and_add_all(unchanged, cache=cache) == 0
+
+
+def test_check_and_add_all_cache_mangled(tmp_pathplus: PathPlus, result_cache: ResultCache, capsys):
+	cache = result_cache
+
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(mangled_source)
+
+	assert check_and_add_all(tmpfile, cache=cache) == 4
+	assert check_and_add_all(tmpfile, cache=cache) == 4
+	assert capsys.readouterr().err.count("does not appear to be a valid Python source file") == 2
+
+
+def test_check_and_add_all_cache_engine(tmp_pathplus: PathPlus, result_cache: ResultCache, capsys):
+	# TokenScanner doesn't parse function bodies, so doesn't see the syntax error.
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("__all__ = [\"foo\"]\n\n\ndef foo():\n\tx = = 1\n")
+
+	assert check_and_add_all(tmpfile, cache=result_cache, engine=Engine.TOKENIZE) == 0
+	assert check_and_add_all(tmpfile, cache=result_cache) == 4
+	assert check_and_add_all(tmpfile, cache=result_cache, engine=Engine.TOKENIZE) == 0
+	assert capsys.readouterr().err.count("does not appear to be a valid Python source file") == 1
+
+
+def test_plugin_cache(result_cache: ResultCache, monkeypatch):
+	source = "__all__ = ['foo', 'bar', 'Baz']"
+	lines = [source]
+
+	monkeypatch.setattr(Plugin, "cache", result_cache)
+	monkeypatch.setattr(Plugin, "dunder_all_alphabetical", AlphabeticalOptions.IGNORE)
+
+	expected = [(1, 18, "DALL001 __all__ not sorted alphabetically: 'bar' should come before 'foo'.", Plugin)]
+	assert list(Plugin(ast.parse(source), lines).run()) == expected
+
+	monkeypatch.setattr(flake8_dunder_all, "Visitor", None)
+	assert list(Plugin(ast.parse(source), lines).run()) == expected
+
+
+@pytest.mark.parametrize("no_cache", [True, False])
+def test_main_cache(tmp_pathplus: PathPlus, no_cache: bool):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(testing_source_e)
+
+	args = ["--cache-dir", str(tmp_pathplus / "cache"), str(tmpfile)]
+	if no_cache:
+		args.insert(0, "--no-cache")
+
+	runner = CliRunner()
+	result: Result = runner.invoke(main, catch_exceptions=False, args=args)
+	assert result.exit_code == 0
+
+	assert (tmp_pathplus / "cache").is_dir() is not no_cache
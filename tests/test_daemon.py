@@ -0,0 +1,174 @@
+# stdlib
+import io
+import os
+import socket
+import threading
+from typing import List
+
+# 3rd party
+import pytest
+from domdf_python_tools.paths import PathPlus, in_directory
+
+# this package
+from flake8_dunder_all import client
+from flake8_dunder_all.client import default_socket_path, forward
+from tests.common import mangled_source, testing_source_b, testing_source_e
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets are not available.")
+
+
+@pytest.fixture()
+def daemon(socket_path: str):
+	# this package
+	from flake8_dunder_all.daemon import DaemonServer
+
+	server = DaemonServer(socket_path)
+	thread = threading.Thread(target=server.serve_forever)
+	thread.start()
+
+	yield server
+
+	server.shutdown()
+	thread.join()
+	server.server_close()
+
+
+def test_default_socket_path(monkeypatch, socket_path: str):
+	assert default_socket_path() == socket_path
+
+	monkeypatch.delenv("FLAKE8_DUNDER_ALL_SOCKET")
+	monkeypatch.setenv("XDG_RUNTIME_DIR", "/run/user/1000")
+	assert default_socket_path().startswith("/run/user/1000/flake8-dunder-all-")
+
+
+def test_forward_no_daemon():
+	assert forward(["--help"]) is None
+
+
+def test_forward(daemon, tmp_pathplus: PathPlus):
+	(tmp_pathplus / "changed.py").write_text(testing_source_b)
+	(tmp_pathplus / "unchanged.py").write_text(testing_source_e)
+	(tmp_pathplus / "mangled.py").write_text(mangled_source)
+
+	# The daemon shares this process's sys.stdout and sys.stderr, so the output must go elsewhere.
+	stdout, stderr = io.StringIO(), io.StringIO()
+	argv = ["--jobs", '1', "changed.py", "unchanged.py", "mangled.py"]
+
+	with in_directory(tmp_pathplus):
+		assert forward(argv, stdout=stdout, stderr=stderr) == 5
+
+	assert stdout.getvalue() == "Checking changed.py\nChecking unchanged.py\nChecking mangled.py\n"
+	assert "'mangled.py' does not appear to be a valid Python source file." in stderr.getvalue()
+	assert "__all__ = [\"a_function\"]" in (tmp_pathplus / "changed.py").read_text()
+
+
+def test_forward_in_process(daemon, tmp_pathplus: PathPlus, monkeypatch):
+	# this package
+	from flake8_dunder_all import __main__, parallel
+
+	def no_pool(*args, **kwargs):
+		raise AssertionError("The daemon shouldn't start worker processes")
+
+	monkeypatch.setattr(__main__, "default_jobs", lambda: 4)
+	monkeypatch.setattr(parallel.multiprocessing, "Pool", no_pool)
+
+	(tmp_pathplus / "changed.py").write_text(testing_source_b)
+	(tmp_pathplus / "unchanged.py").write_text(testing_source_e)
+
+	with in_directory(tmp_pathplus):
+		assert forward(["changed.py", "unchanged.py"], stdout=io.StringIO(), stderr=io.StringIO()) == 1
+
+
+def test_forward_version_mismatch(daemon, monkeypatch):
+	monkeypatch.setattr(client, "__version__", "0.0.0")
+	stdout = io.StringIO()
+	assert forward(["--help"], stdout=stdout) is None
+	assert stdout.getvalue() == ''
+
+
+def test_stale_socket(socket_path: str):
+	# this package
+	from flake8_dunder_all.daemon import DaemonServer
+
+	PathPlus(socket_path).touch()
+	assert forward(["--help"]) is None
+
+	with DaemonServer(socket_path):
+		pass
+
+	assert not PathPlus(socket_path).exists()
+
+
+def test_main_fallback(tmp_pathplus: PathPlus, capsys):
+	(tmp_pathplus / "changed.py").write_text(testing_source_b)
+
+	with in_directory(tmp_pathplus), pytest.raises(SystemExit) as e:
+		client.main(["changed.py"])
+
+	assert e.value.code == 1
+	assert capsys.readouterr().out == "Checking changed.py\n"
+
+
+def test_main_forwarded(daemon, tmp_pathplus: PathPlus, monkeypatch):
+	(tmp_pathplus / "changed.py").write_text(testing_source_b)
+
+	stdout = io.StringIO()
+	monkeypatch.setattr(client, "forward", lambda argv: forward(argv, stdout=stdout, stderr=stdout))
+
+	with in_directory(tmp_pathplus), pytest.raises(SystemExit) as e:
+		client.main(["changed.py"])
+
+	assert e.value.code == 1
+	assert stdout.getvalue() == "Checking changed.py\n"
+	assert "__all__ = [\"a_function\"]" in (tmp_pathplus / "changed.py").read_text()
+
+
+@pytest.mark.parametrize(
+		"argv",
+		[
+				pytest.param(["--files-from", '-'], id="files_from_stdin"),
+				pytest.param(["--files-from=-"], id="files_from_stdin_equals"),
+				pytest.param(["--watch", '.'], id="watch"),
+				pytest.param(["--staged"], id="staged"),
+				pytest.param(["--changed-since=main"], id="changed_since"),
+				]
+		)
+def test_forward_local_options(daemon, argv: List[str]):
+	stdout = io.StringIO()
+	assert forward(argv, stdout=stdout, stderr=stdout) is None
+	assert stdout.getvalue() == ''
+
+
+def test_forward_files_from(daemon, tmp_pathplus: PathPlus):
+	(tmp_pathplus / "changed.py").write_text(testing_source_b)
+	(tmp_pathplus / "files.txt").write_text("changed.py\n")
+
+	stdout = io.StringIO()
+
+	with in_directory(tmp_pathplus):
+		assert forward(["--files-from", "files.txt"], stdout=stdout, stderr=stdout) == 1
+
+	assert stdout.getvalue() == "Checking changed.py\n"
+
+
+def test_forward_environ(daemon, tmp_pathplus: PathPlus, monkeypatch):
+	(tmp_pathplus / "changed.py").write_text(testing_source_b)
+	cache_dir = tmp_pathplus / "cache"
+
+	monkeypatch.delenv("FLAKE8_DUNDER_ALL_CACHE_DIR", raising=False)
+	monkeypatch.setattr(client, "_forwarded_environ", lambda: {"FLAKE8_DUNDER_ALL_CACHE_DIR": str(cache_dir)})
+
+	with in_directory(tmp_pathplus):
+		assert forward(["changed.py"], stdout=io.StringIO(), stderr=io.StringIO()) == 1
+
+	assert cache_dir.is_dir()
+	assert "FLAKE8_DUNDER_ALL_CACHE_DIR" not in os.environ
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="File ownership is not available.")
+def test_forward_untrusted_socket(daemon, monkeypatch):
+	monkeypatch.setattr(client.os, "getuid", lambda: os.stat(daemon.socket_path).st_uid + 1)
+
+	stdout = io.StringIO()
+	assert forward(["--help"], stdout=stdout, stderr=stdout) is None
+	assert stdout.getvalue() == ''
@@ -0,0 +1,164 @@
+# stdlib
+import ast
+import inspect
+import sys
+from typing import Iterator, List
+
+# 3rd party
+import pytest
+from domdf_python_tools.paths import PathPlus
+
+# this package
+import flake8_dunder_all
+from flake8_dunder_all import (
+		_BLOCK_FIELDS,
+		_END_LINENO_TYPES,
+		Visitor,
+		_end_lineno,
+		_last_lineno,
+		_mark_end_linenos
+		)
+from tests import common
+
+tricky_source = """\
+import os; import sys
+from typing import (
+		List,
+		Tuple,
+		)
+import foo, \\
+	bar
+
+if TYPE_CHECKING:
+	if sys.version_info > (3, 8):
+		import a
+	else:
+		from b import (
+				c,
+				)
+elif False: import d; x = (1,
+	2)
+
+try:
+	import e
+except ImportError:  # comment
+	e = None
+else:
+	import f  # noqa: F401
+finally:
+	x = '''
+	a long
+	string
+	'''
+
+with open(__file__) as fp:
+	import g
+
+for _ in range(1):
+	try:
+		import h
+	except:
+		pass
+
+def foo():
+	import i
+"""
+
+
+def _descend_node(node: ast.AST, attr: str = "body") -> Iterator[int]:
+	# The recursive implementation _last_lineno replaced.
+	for child in getattr(node, attr, []):
+		yield child.lineno
+		yield from _descend_node(child)
+
+
+def _sources() -> Iterator[str]:
+	yield tricky_source
+
+	for name, value in vars(common).items():
+		if isinstance(value, str) and not name.startswith('_'):
+			yield value
+
+	for module in (flake8_dunder_all, ast, inspect, pytest):
+		yield PathPlus(inspect.getfile(module)).read_text()
+
+
+def _statements(tree: ast.Module) -> List[ast.AST]:
+	# The statements visited by Visitor, i.e. those outside of functions and classes.
+	statements = []
+	stack: List[ast.AST] = list(tree.body)
+
+	while stack:
+		node = stack.pop()
+		statements.append(node)
+		for field in _BLOCK_FIELDS.get(type(node), ()):
+			stack.extend(getattr(node, field))
+
+	return statements
+
+
+def _parse(source: str) -> ast.Module:
+	try:
+		return ast.parse(source)
+	except SyntaxError:
+		pytest.skip("Not valid Python")
+
+
+sources = pytest.mark.parametrize(
+		"source",
+		[pytest.param(source, id=str(idx)) for idx, source in enumerate(_sources())],
+		)
+
+
+@sources
+def test_last_lineno(source: str):
+	for node in ast.walk(_parse(source)):
+		if isinstance(node, ast.If):
+			assert _last_lineno(node) == max(_descend_node(node))
+		elif isinstance(node, ast.Try):
+			expected = max(
+					*_descend_node(node),
+					*_descend_node(node, "handlers"),
+					*_descend_node(node, "orelse"),
+					*_descend_node(node, "finalbody"),
+					)
+			assert _last_lineno(node, ("body", "handlers", "orelse", "finalbody")) == expected
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="Output differs on Python 3.7")
+@pytest.mark.skipif(sys.implementation.name == "pypy", reason="Output differs on PyPy")
+@sources
+def test_end_lineno(source: str):
+	tree = _parse(source)
+	lines = source.split('\n')
+
+	for node in _statements(tree):
+		assert _end_lineno(node, lines) == node.end_lineno, ast.dump(node)  # type: ignore[attr-defined]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="Output differs on Python 3.7")
+@pytest.mark.skipif(sys.implementation.name == "pypy", reason="Output differs on PyPy")
+@sources
+def test_mark_end_linenos(source: str):
+	tree = _parse(source)
+	statements = _statements(tree)
+	expected = {id(node): node.end_lineno for node in statements}  # type: ignore[attr-defined]
+
+	for node in ast.walk(tree):
+		if hasattr(node, "end_lineno"):
+			del node.end_lineno  # type: ignore[attr-defined]
+
+	_mark_end_linenos(tree, source)
+
+	for node in statements:
+		if isinstance(node, _END_LINENO_TYPES):
+			assert node.end_lineno == expected[id(node)]  # type: ignore[attr-defined]
+		else:
+			assert getattr(node, "end_lineno", None) is None
+
+	reference = Visitor(use_endlineno=True)
+	reference.visit(ast.parse(source))
+
+	visitor = Visitor(use_endlineno=True)
+	visitor.visit(tree)
+	assert visitor.last_import == reference.last_import
@@ -1,8 +1,12 @@
 # stdlib
 import ast
+import json
+import marshal
+import os
+import pickle
 import re
 import sys
-from typing import List, Set
+from typing import List, Set, Type
 
 # 3rd party
 import pytest
@@ -11,8 +15,17 @@ from consolekit.terminal_colours import Fore
 from domdf_python_tools.paths import PathPlus
 
 # this package
-from flake8_dunder_all import AlphabeticalOptions, Plugin, Visitor, check_and_add_all
-from flake8_dunder_all.utils import mark_text_ranges
+import flake8_dunder_all
+from flake8_dunder_all import (
+		AlphabeticalOptions,
+		Engine,
+		Plugin,
+		Scanner,
+		Visitor,
+		VisitorResult,
+		check_and_add_all
+		)
+from flake8_dunder_all.utils import mark_text_ranges, write_atomic
 from tests.common import (
 		if_type_checking_else_source,
 		if_type_checking_source,
@@ -93,7 +106,7 @@ def test_plugin(source: str, expects: Set[str]):
 				pytest.param(
 						"__all__ = ['foo', 'bar', 'Baz']",
 						AlphabeticalOptions.IGNORE,
-						{"1:0: DALL001 __all__ not sorted alphabetically."},
+						{"1:18: DALL001 __all__ not sorted alphabetically: 'bar' should come before 'foo'."},
 						id="IGNORE_wrong_order",
 						),
 				pytest.param(
@@ -105,7 +118,7 @@ def test_plugin(source: str, expects: Set[str]):
 				pytest.param(
 						"__all__ = ['Baz', 'bar', 'foo']",
 						AlphabeticalOptions.LOWER,
-						{"1:0: DALL001 __all__ not sorted alphabetically (lowercase first)."},
+						{"1:18: DALL001 __all__ not sorted alphabetically (lowercase first): 'bar' should come before 'Baz'."},
 						id="LOWER_wrong_order",
 						),
 				pytest.param(
@@ -117,7 +130,7 @@ def test_plugin(source: str, expects: Set[str]):
 				pytest.param(
 						"__all__ = ['bar', 'Baz', 'foo']",
 						AlphabeticalOptions.UPPER,
-						{"1:0: DALL001 __all__ not sorted alphabetically (uppercase first)."},
+						{"1:18: DALL001 __all__ not sorted alphabetically (uppercase first): 'Baz' should come before 'bar'."},
 						id="UPPER_wrong_order",
 						),
 				pytest.param(
@@ -164,7 +177,7 @@ def test_plugin_alphabetical(source: str, expects: Set[str], dunder_all_alphabet
 				pytest.param(
 						"__all__: List[str] = ['foo', 'bar', 'Baz']",
 						AlphabeticalOptions.IGNORE,
-						{"1:0: DALL001 __all__ not sorted alphabetically."},
+						{"1:29: DALL001 __all__ not sorted alphabetically: 'bar' should come before 'foo'."},
 						id="IGNORE_wrong_order",
 						),
 				pytest.param(
@@ -176,7 +189,7 @@ def test_plugin_alphabetical(source: str, expects: Set[str], dunder_all_alphabet
 				pytest.param(
 						"__all__: List[str] = ['Baz', 'bar', 'foo']",
 						AlphabeticalOptions.LOWER,
-						{"1:0: DALL001 __all__ not sorted alphabetically (lowercase first)."},
+						{"1:29: DALL001 __all__ not sorted alphabetically (lowercase first): 'bar' should come before 'Baz'."},
 						id="LOWER_wrong_order",
 						),
 				pytest.param(
@@ -188,7 +201,7 @@ def test_plugin_alphabetical(source: str, expects: Set[str], dunder_all_alphabet
 				pytest.param(
 						"__all__: List[str] = ['bar', 'Baz', 'foo']",
 						AlphabeticalOptions.UPPER,
-						{"1:0: DALL001 __all__ not sorted alphabetically (uppercase first)."},
+						{"1:29: DALL001 __all__ not sorted alphabetically (uppercase first): 'Baz' should come before 'bar'."},
 						id="UPPER_wrong_order",
 						),
 				pytest.param(
@@ -235,6 +248,19 @@ def test_plugin_alphabetical_not_list(source: str, dunder_all_alphabetical: Alph
 	assert {"{}:{}: {}".format(*r) for r in plugin.run()} == {msg}
 
 
+def test_plugin_alphabetical_multiline():
+	plugin = Plugin(ast.parse("__all__ = [\n\t'bar',\n\t'foo',\n\t'baz',\n\t'abc',\n\t]"))
+	plugin.dunder_all_alphabetical = AlphabeticalOptions.IGNORE
+	msg = "4:1: DALL001 __all__ not sorted alphabetically: 'baz' should come before 'foo'."
+	assert {"{}:{}: {}".format(*r) for r in plugin.run()} == {msg}
+
+
+def test_plugin_alphabetical_not_literal():
+	plugin = Plugin(ast.parse("__all__ = list(('b', 'a'))"))
+	plugin.dunder_all_alphabetical = AlphabeticalOptions.IGNORE
+	assert {"{}:{}: {}".format(*r) for r in plugin.run()} == {"1:0: DALL002 __all__ not a list or tuple of strings."}
+
+
 def test_plugin_alphabetical_tuple():
 	plugin = Plugin(ast.parse("__all__ = ('bar',\n'foo')"))
 	plugin.dunder_all_alphabetical = AlphabeticalOptions.IGNORE
@@ -485,4 +511,245 @@ def test_check_and_add_all_mangled(tmp_pathplus: PathPlus, capsys, source: str,
 	assert stderr.endswith(f"{Fore.RESET}\n")
 
 
+def test_check_and_add_all_encoding(tmp_pathplus: PathPlus, monkeypatch):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_bytes(b"# -*- coding: latin-1 -*-\r\nimport foo\r\n\r\ndef caf\xe9(): ...\r\n")
+
+	def no_read_text(*args, **kwargs):
+		raise AssertionError("The file should only be read once, as bytes")
+
+	monkeypatch.setattr(PathPlus, "read_text", no_read_text)
+
+	assert check_and_add_all(tmpfile) == 1
+	assert tmpfile.read_bytes().startswith(b"# -*- coding: latin-1 -*-\nimport foo\n\n__all__ = [\"caf\xe9\"]\n")
+
+
+def test_check_and_add_all_undecodable(tmp_pathplus: PathPlus, capsys):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_bytes(b"def caf\xe9(): ...\n")
+
+	assert check_and_add_all(tmpfile) == 4
+	assert "does not appear to be a valid Python source file" in capsys.readouterr().err
+
+
 # TODO: Test the number of lines in the output
+
+
+scanner_sources = [
+		pytest.param("import foo", id="just an import"),
+		pytest.param('"""a docstring"""', id="just a docstring"),
+		pytest.param(testing_source_a, id="import and docstring"),
+		pytest.param(testing_source_d, id="function and class no __all__"),
+		pytest.param(testing_source_e, id="function and class with __all__"),
+		pytest.param(testing_source_f, id="function and class with __all__ and extra variable"),
+		pytest.param(testing_source_g, id="async function no __all__"),
+		pytest.param(testing_source_j, id="multiline import"),
+		pytest.param(testing_source_k, id="overload"),
+		pytest.param(testing_source_l, id="typing.overload"),
+		pytest.param(testing_source_m, id="if False"),
+		pytest.param(testing_source_n, id="if TYPE_CHECKING"),
+		pytest.param(if_type_checking_else_source, id="if TYPE_CHECKING else"),
+		pytest.param(if_type_checking_try_source, id="if TYPE_CHECKING try"),
+		pytest.param(if_type_checking_try_finally_source, id="if TYPE_CHECKING try finally"),
+		pytest.param(not_type_checking_if_source, id="not TYPE_CHECKING if"),
+		pytest.param(
+				"__all__ = ['a']\nif x:\n\t__all__ = ['b']\nelse:\n\t__all__: List[str] = ['c']\n",
+				id="multiple __all__",
+				),
+		pytest.param(
+				"with foo:\n\tdef a(): ...\nfor x in y:\n\tclass B: ...\nelse:\n\timport c\n"
+				"while True:\n\tasync def d(): ...\n",
+				id="with for while",
+				),
+		pytest.param(
+				"try:\n\timport a\nexcept ImportError:\n\tdef b(): ...\nelse:\n\tdef c(): ...\n"
+				"finally:\n\tdef _d(): ...\n",
+				id="try except else finally",
+				),
+		pytest.param(
+				"class A:\n\tdef b(self): ...\n\t__all__ = ['x']\ndef c():\n\timport d\n",
+				id="nested in class and def",
+				),
+		pytest.param(
+				"@a.b.overload\ndef a(): ...\n@overload()\ndef b(): ...\n@functools.wraps(x)\ndef c(): ...\n",
+				id="decorators",
+				),
+		]
+
+
+@pytest.mark.parametrize("source", scanner_sources)
+@pytest.mark.parametrize("use_endlineno", [True, False])
+def test_scanner(source: str, use_endlineno: bool):
+	tree = ast.parse(source)
+
+	visitor = Visitor(use_endlineno)
+	visitor.visit(tree)
+	scanner = Scanner(use_endlineno)
+	scanner.visit(tree)
+
+	assert scanner.members == visitor.members
+	assert scanner.found_all is visitor.found_all
+	assert scanner.last_import == visitor.last_import
+	assert scanner.all_members == visitor.all_members
+	assert scanner.all_lineno == visitor.all_lineno
+
+
+@pytest.mark.skipif(sys.version_info < (3, 10), reason="Requires the match statement")
+def test_scanner_match():
+	source = "match x:\n\tcase 1:\n\t\tdef a(): ...\n\tcase _:\n\t\tfrom b import c\n"
+	tree = ast.parse(source)
+
+	scanner = Scanner(True)
+	scanner.visit(tree)
+
+	assert scanner.members == {'a'}
+	assert scanner.last_import == 5
+
+
+@pytest.mark.parametrize("engine", [Engine.VISITOR, Engine.SCANNER, Engine.TOKENIZE, Engine.AUTO])
+def test_engine(tmp_pathplus: PathPlus, engine: Engine):
+	expected_type = {Engine.VISITOR: Visitor, Engine.SCANNER: Scanner, Engine.TOKENIZE: Scanner, Engine.AUTO: Visitor}
+	assert type(engine.make_visitor()) is expected_type[engine]
+
+	plugin = Plugin(ast.parse(testing_source_d))
+	plugin.dunder_all_engine = engine
+	assert {"{}:{}: {}".format(*r) for r in plugin.run()} == {"1:0: DALL000 Module lacks __all__."}
+
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(testing_source_d)
+	assert check_and_add_all(tmpfile, engine=engine) == 1
+	assert "__all__ = [\"Foo\", \"a_function\"]" in tmpfile.read_text()
+
+
+@pytest.mark.parametrize(
+		"source, ret, message",
+		[
+				pytest.param(testing_source_a, 0, '', id="import and docstring"),
+				pytest.param(
+						testing_source_b,
+						1,
+						"source.py:5: __all__ is missing. Would add: __all__ = [\"a_function\"]\n",
+						id="function no __all__",
+						),
+				pytest.param(
+						testing_source_d,
+						1,
+						"source.py:5: __all__ is missing. Would add: __all__ = [\"Foo\", \"a_function\"]\n",
+						id="function and class no __all__",
+						),
+				]
+		)
+def test_check_and_add_all_no_write(tmp_pathplus: PathPlus, source: str, ret: int, message: str, capsys):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(source)
+	tmpfile.chmod(0o444)
+	mtime = tmpfile.stat().st_mtime_ns
+
+	try:
+		assert check_and_add_all(tmpfile, write=False) == ret
+		assert tmpfile.read_text() == source
+		assert tmpfile.stat().st_mtime_ns == mtime
+		assert capsys.readouterr().err.replace(str(tmp_pathplus) + os.sep, '') == message
+	finally:
+		tmpfile.chmod(0o644)
+
+
+def test_check_and_add_all_atomic(tmp_pathplus: PathPlus):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(testing_source_b)
+	tmpfile.chmod(0o640)
+	link = tmp_pathplus / "link.py"
+	link.symlink_to(tmpfile)
+
+	assert check_and_add_all(link) == 1
+	assert "__all__ = [\"a_function\"]" in tmpfile.read_text()
+	assert link.is_symlink()
+	assert tmpfile.stat().st_mode & 0o777 == 0o640
+	assert sorted(p.name for p in tmp_pathplus.iterdir()) == ["link.py", "source.py"]
+
+
+@pytest.mark.parametrize(
+		"modification",
+		[
+				pytest.param("# edited\n", id="appended"),
+				pytest.param('', id="same_size"),
+				]
+		)
+def test_check_and_add_all_concurrent_modification(
+		tmp_pathplus: PathPlus,
+		monkeypatch,
+		capsys,
+		modification: str,
+		):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(testing_source_b)
+	edited = testing_source_b.replace("a_function", "b_function") + modification
+
+	check_data = flake8_dunder_all._check_data
+
+	def edit_while_checking(*args, **kwargs):
+		result = check_data(*args, **kwargs)
+		tmpfile.write_text(edited)
+		return result
+
+	monkeypatch.setattr(flake8_dunder_all, "_check_data", edit_while_checking)
+
+	assert check_and_add_all(tmpfile) == 8
+	assert tmpfile.read_text() == edited
+	assert "source.py' was modified while it was being checked" in capsys.readouterr().err
+	assert [p.name for p in tmp_pathplus.iterdir()] == ["source.py"]
+
+
+def test_write_atomic_failure(tmp_pathplus: PathPlus, monkeypatch):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("original")
+
+	def replace(*args):
+		raise OSError("Interrupted")
+
+	monkeypatch.setattr(os, "replace", replace)
+
+	with pytest.raises(OSError, match="Interrupted"):
+		write_atomic(tmpfile, b"new content")
+
+	assert tmpfile.read_text() == "original"
+	assert [p.name for p in tmp_pathplus.iterdir()] == ["source.py"]
+
+
+@pytest.mark.parametrize(
+		"source",
+		[
+				pytest.param(testing_source_b, id="no __all__"),
+				pytest.param(testing_source_e, id="__all__"),
+				pytest.param(testing_source_e_tuple, id="tuple"),
+				pytest.param("__all__ = 'foo'", id="string"),
+				pytest.param("__all__ = ['foo', 'bar', 1]", id="not strings"),
+				pytest.param("__all__ = foo()", id="not literal"),
+				]
+		)
+@pytest.mark.parametrize("engine", [Visitor, Scanner])
+def test_visitor_result(source: str, engine: Type[Visitor]):
+	visitor = engine(use_endlineno=True)
+	visitor.visit(ast.parse(source))
+	result = visitor.result()
+
+	assert result.found_all is visitor.found_all
+	assert result.members == tuple(sorted(visitor.members))
+	assert result.last_import == visitor.last_import
+	assert result.all_lineno == visitor.all_lineno
+
+	if isinstance(visitor.all_members, list):
+		assert result.all_members == tuple(visitor.all_members)
+	else:
+		assert result.all_members == visitor.all_members
+
+	assert VisitorResult.from_bytes(result.to_bytes()) == result
+	assert VisitorResult.from_json(json.loads(json.dumps(result))) == result
+	assert pickle.loads(pickle.dumps(result)) == result  # nosec: B301
+	assert len(result.to_bytes()) < len(pickle.dumps(visitor))
+
+
+@pytest.mark.parametrize("data", [b'', b"not marshal data", marshal.dumps((1, 2, 3))])
+def test_visitor_result_invalid(data: bytes):
+	with pytest.raises(ValueError, match="Invalid VisitorResult data"):
+		VisitorResult.from_bytes(data)
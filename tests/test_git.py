@@ -0,0 +1,176 @@
+# stdlib
+import shutil
+import subprocess
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus, in_directory
+
+# this package
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.git import BlobReader, ChangedFile, GitError, changed_files, check_staged
+from tests.common import testing_source_b, testing_source_e
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed.")
+
+
+def git(repo: PathPlus, *args: str) -> str:
+	return subprocess.run(
+			["git", "-c", "user.name=Tester", "-c", "user.email=tester@example.com", *args],
+			cwd=repo,
+			check=True,
+			capture_output=True,
+			).stdout.decode()
+
+
+@pytest.fixture()
+def repo(tmp_pathplus: PathPlus) -> PathPlus:
+	repo = tmp_pathplus / "repo"
+	repo.mkdir()
+	git(repo, "init", "-q", "-b", "main")
+
+	(repo / "base.py").write_text(testing_source_b)
+	(repo / "README.rst").write_text("Hello world")
+	git(repo, "add", "-A")
+	git(repo, "commit", "-q", "-m", "Initial commit")
+
+	git(repo, "checkout", "-q", "-b", "feature")
+	(repo / "pkg").mkdir()
+	(repo / "pkg" / "committed.py").write_text(testing_source_b)
+	(repo / "pkg" / "notes.txt").write_text(testing_source_b)
+	(repo / "pkg" / "README.md").write_text("# Hello world\n\nNot Python.")
+	git(repo, "add", "-A")
+	git(repo, "commit", "-q", "-m", "Feature")
+
+	(repo / "staged.py").write_text(testing_source_b)
+	git(repo, "add", "staged.py")
+	(repo / "unstaged.py").write_text(testing_source_e)
+	git(repo, "add", "unstaged.py")
+	(repo / "unstaged.py").write_text(testing_source_b)
+
+	return repo
+
+
+def test_changed_files(repo: PathPlus):
+	assert changed_files(cwd=str(repo)) == [
+			ChangedFile("staged.py"),
+			ChangedFile("unstaged.py"),
+			]
+
+	assert changed_files(ref="main", cwd=str(repo)) == [
+			ChangedFile("pkg/committed.py"),
+			ChangedFile("staged.py"),
+			ChangedFile("unstaged.py"),
+			]
+
+	assert changed_files(ref="main", pathspecs=["pkg"], cwd=str(repo)) == [
+			ChangedFile("pkg/committed.py"),
+			]
+
+	assert changed_files(ref="main", pathspecs=["pkg", "pkg/notes.txt"], cwd=str(repo)) == [
+			ChangedFile("pkg/committed.py"),
+			ChangedFile("pkg/notes.txt"),
+			]
+
+	assert changed_files(ref="main", pathspecs=["notes.txt", '.'], cwd=str(repo / "pkg")) == [
+			ChangedFile("committed.py"),
+			ChangedFile("notes.txt"),
+			]
+
+	assert changed_files(ref="main", cwd=str(repo / "pkg")) == [
+			ChangedFile("committed.py"),
+			ChangedFile("../staged.py"),
+			ChangedFile("../unstaged.py"),
+			]
+
+	staged = changed_files(staged=True, cwd=str(repo))
+	assert [file.path for file in staged] == ["staged.py", "unstaged.py"]
+	assert all(file.blob for file in staged)
+
+
+def test_changed_files_not_a_repo(tmp_pathplus: PathPlus):
+	with pytest.raises(GitError, match="not a git repository"):
+		changed_files(cwd=str(tmp_pathplus))
+
+	with pytest.raises(GitError):
+		changed_files(ref="no-such-ref", cwd=str(tmp_pathplus))
+
+
+def test_blob_reader(repo: PathPlus):
+	staged = changed_files(staged=True, cwd=str(repo))
+
+	with BlobReader(cwd=str(repo)) as reader:
+		assert reader.read(staged[0].blob) == testing_source_b.encode()  # type: ignore[arg-type]
+		assert reader.read(staged[1].blob) == testing_source_e.encode()  # type: ignore[arg-type]
+
+		with pytest.raises(GitError, match="No such blob"):
+			reader.read("0" * 40)
+
+
+def test_check_staged(repo: PathPlus):
+	staged = changed_files(staged=True, cwd=str(repo))
+	outcomes = list(check_staged(staged, cwd=str(repo)))
+
+	assert [outcome.retv for outcome in outcomes] == [1, 0]
+	assert outcomes[1].stderr == ''
+	assert "__all__ = [\"a_function\"]" in (repo / "staged.py").read_text()
+	assert "__all__" not in (repo / "unstaged.py").read_text()
+
+
+def test_check_staged_unstaged_changes(repo: PathPlus):
+	git(repo, "add", "unstaged.py")
+	(repo / "unstaged.py").write_text(testing_source_e)
+
+	staged = changed_files(staged=True, pathspecs=["unstaged.py"], cwd=str(repo))
+	outcomes = list(check_staged(staged, cwd=str(repo)))
+
+	assert [outcome.retv for outcome in outcomes] == [1]
+	assert outcomes[0].stderr == "'unstaged.py' has unstaged changes, so it was not changed.\n"
+	assert (repo / "unstaged.py").read_text() == testing_source_e
+
+
+@pytest.mark.parametrize(
+		"args, expected",
+		[
+				pytest.param(["--staged"], ["staged.py", "unstaged.py"], id="staged"),
+				pytest.param(
+						["--changed-since", "main"],
+						["pkg/committed.py", "staged.py", "unstaged.py"],
+						id="changed_since",
+						),
+				pytest.param(["--changed-since", "main", "pkg"], ["pkg/committed.py"], id="pathspec"),
+				pytest.param(
+						["--changed-since", "main", "pkg", "pkg/notes.txt"],
+						["pkg/committed.py", "pkg/notes.txt"],
+						id="pathspec_file",
+						),
+				]
+		)
+def test_main_git(repo: PathPlus, args, expected):
+	runner = CliRunner()
+
+	with in_directory(repo):
+		result: Result = runner.invoke(main, catch_exceptions=False, args=["--jobs", '1', *args])
+
+	assert result.exit_code == 1
+	assert result.stdout == ''.join(f"Checking {filename}\n" for filename in expected)
+
+
+def test_main_git_not_a_repo(tmp_pathplus: PathPlus):
+	runner = CliRunner()
+
+	with in_directory(tmp_pathplus):
+		result: Result = runner.invoke(main, catch_exceptions=False, args=["--staged"])
+
+	assert result.exit_code == 2
+	assert "not a git repository" in result.stdout
+
+
+def test_check_staged_no_write(repo: PathPlus):
+	staged = changed_files(staged=True, cwd=str(repo))
+	outcomes = list(check_staged(staged, write=False, cwd=str(repo)))
+
+	assert [outcome.retv for outcome in outcomes] == [1, 0]
+	assert outcomes[0].stderr.startswith("staged.py:5: __all__ is missing.")
+	assert (repo / "staged.py").read_text() == testing_source_b
@@ -0,0 +1,82 @@
+# stdlib
+import json
+import re
+import subprocess
+import sys
+from typing import Tuple
+
+# 3rd party
+import pytest
+
+#: Third-party packages which shouldn't be imported unless they're needed.
+deferred = ("natsort", "consolekit", "domdf_python_tools", "flake8", "astatine", "click")
+
+#: Standard library modules imported by ``flake8_dunder_all``, used as the baseline for its import time.
+baseline = ("ast", "json", "textwrap", "threading", "tokenize")
+
+#: The maximum cumulative time for ``import flake8_dunder_all``,
+#: as a multiple of the time to import :py:data:`baseline`. This is about 3.5 at the time of writing.
+budget = 5
+
+script = f"""
+import ast
+import json
+import sys
+
+import flake8_dunder_all
+
+imported = {{}}
+imported["import"] = sorted(m for m in sys.modules if m.split('.')[0] in {deferred!r})
+
+list(flake8_dunder_all.Plugin(ast.parse("__all__ = ['b', 'a']\\ndef a(): ...")).run())
+imported["run"] = sorted(m for m in sys.modules if m.split('.')[0] in {deferred!r})
+
+import flake8_dunder_all.client
+imported["client"] = sorted(m for m in sys.modules if m.split('.')[0] in {deferred!r})
+
+print(json.dumps(imported))
+"""
+
+
+@pytest.fixture()
+def clean_env(monkeypatch):
+	monkeypatch.delenv("COV_CORE_SOURCE", raising=False)
+	monkeypatch.delenv("COV_CORE_CONFIG", raising=False)
+	monkeypatch.delenv("COV_CORE_DATAFILE", raising=False)
+	monkeypatch.setenv("PYTHONWARNINGS", "ignore")
+
+
+@pytest.mark.usefixtures("clean_env")
+def test_deferred_imports():
+	result = subprocess.run([sys.executable, "-c", script], capture_output=True, check=True)
+	imported = json.loads(result.stdout)
+
+	assert imported["import"] == []
+	assert imported["run"] == []
+	assert imported["client"] == []
+
+
+def _import_time(modules: Tuple[str, ...]) -> int:
+	# Returns the cumulative time, in microseconds, to import the given top-level modules in a new interpreter.
+	result = subprocess.run(
+			[sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+			capture_output=True,
+			check=True,
+			)
+
+	timings = re.findall(r"^import time:\s+\d+ \|\s+(\d+) \| (\S+)$", result.stderr.decode(), re.MULTILINE)
+	found = {name: int(timing) for timing, name in timings if name in modules}
+	assert found.keys() == set(modules)
+	return sum(found.values())
+
+
+@pytest.mark.usefixtures("clean_env")
+def test_import_time():
+	# The imports are timed alternately, and the fastest of each kept, to even out noise from other processes.
+	package_times, baseline_times = [], []
+
+	for _ in range(7):
+		package_times.append(_import_time(("flake8_dunder_all", )))
+		baseline_times.append(_import_time(baseline))
+
+	assert min(package_times) < min(baseline_times) * budget
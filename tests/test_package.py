@@ -0,0 +1,302 @@
+# stdlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all import package
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.package import ModuleGraph, _resolve, check_packages
+from flake8_dunder_all.parallel import FileOutcome
+from flake8_dunder_all.report import TextReporter
+
+init_source = '''\
+"""The package."""
+
+from .core import *
+from .helpers import helper as public_helper, _private
+from . import sub
+from .sub import *
+
+__all__ = [
+	"old_name",
+	]
+'''
+
+core_source = '''\
+__all__ = ["Core", "make_core"]
+
+
+class Core: ...
+
+
+def make_core(): ...
+
+
+def not_exported(): ...
+'''
+
+sub_init_source = '''\
+from .impl import *
+from ..core import Core as SubCore
+'''
+
+impl_source = '''\
+def impl_func(): ...
+
+
+class _Hidden: ...
+'''
+
+
+@pytest.fixture()
+def pkg(tmp_pathplus: PathPlus) -> PathPlus:
+	root = tmp_pathplus / "mypkg"
+	(root / "sub").mkdir(parents=True)
+	(root / "other").mkdir()
+
+	(root / "__init__.py").write_text(init_source)
+	(root / "core.py").write_text(core_source)
+	(root / "helpers.py").write_text("def helper(): ...\n\n\ndef _private(): ...\n")
+	(root / "sub" / "__init__.py").write_text(sub_init_source)
+	(root / "sub" / "impl.py").write_text(impl_source)
+	(root / "other" / "__init__.py").write_text("def other_func(): ...\n\n\n__all__ = [\"other_func\"]\n")
+
+	return root
+
+
+@pytest.mark.parametrize(
+		"name, is_package, level, module, expected",
+		[
+				pytest.param("pkg.mod", False, 1, "x", "pkg.x", id="sibling"),
+				pytest.param("pkg", True, 1, "x", "pkg.x", id="package"),
+				pytest.param("pkg.sub", True, 2, "x", "pkg.x", id="parent_of_package"),
+				pytest.param("pkg.sub.mod", False, 2, None, "pkg", id="parent_no_module"),
+				pytest.param("pkg.mod", False, 0, "pkg.x", "pkg.x", id="absolute"),
+				pytest.param("pkg.mod", False, 0, "os.path", None, id="external"),
+				pytest.param("pkg.mod", False, 2, "x", None, id="outside_package"),
+				pytest.param("pkg.mod", False, 0, "pkgx", None, id="similar_name"),
+				]
+		)
+def test_resolve(name: str, is_package: bool, level: int, module: Optional[str], expected: Optional[str]):
+	assert _resolve("pkg", name, is_package, level, module) == expected
+
+
+def test_module_graph(pkg: PathPlus):
+	graph = ModuleGraph(str(pkg))
+	assert graph.refresh() == {"mypkg", "mypkg.core", "mypkg.helpers", "mypkg.sub", "mypkg.sub.impl", "mypkg.other"}
+	assert graph.refresh() == set()
+
+	assert graph.expected_all("mypkg") == {"Core", "SubCore", "impl_func", "make_core", "public_helper"}
+	assert graph.expected_all("mypkg.sub") == {"SubCore", "impl_func"}
+	assert graph.exports("mypkg.core") == {"Core", "make_core"}
+
+	assert graph.affected({"mypkg.sub.impl"}) == {"mypkg.sub.impl", "mypkg.sub", "mypkg"}
+	assert graph.affected({"mypkg.other"}) == {"mypkg.other"}
+
+	# ``from . import sub`` re-exports a name only if there is no module of that name
+	assert graph.affected({"mypkg.sub"}) == {"mypkg.sub", "mypkg"}
+	assert graph.affected({"mypkg.helpers.helper"}) == {"mypkg.helpers.helper", "mypkg"}
+
+	(pkg / "helpers.py").unlink()
+	assert graph.refresh() == {"mypkg.helpers"}
+	assert "mypkg.helpers" not in graph.modules
+
+
+def test_check_packages_check(pkg: PathPlus):
+	outcomes = list(check_packages([str(pkg)], write=False))
+
+	assert [(outcome.filename, outcome.retv) for outcome in outcomes] == [
+			(str(pkg / "__init__.py"), 1),
+			(str(pkg / "other" / "__init__.py"), 0),
+			(str(pkg / "sub" / "__init__.py"), 1),
+			]
+	assert outcomes[0].stderr == (
+			f"{pkg / '__init__.py'}:8: __all__ doesn't match the names exported by the package. "
+			"Missing: 'Core', 'SubCore', 'impl_func', 'make_core', 'public_helper'. Unexpected: 'old_name'.\n"
+			)
+	assert outcomes[2].stderr == (
+			f"{pkg / 'sub' / '__init__.py'}:4: __all__ is missing. Would add: __all__ = [\"SubCore\", \"impl_func\"]\n"
+			)
+	assert (pkg / "__init__.py").read_text() == init_source
+
+
+def test_check_packages(pkg: PathPlus):
+	outcomes = list(check_packages([str(pkg)]))
+	assert [outcome.retv for outcome in outcomes] == [1, 0, 1]
+
+	assert (pkg / "__init__.py").read_text() == init_source.replace(
+			"\t\"old_name\",\n",
+			"\t\"Core\",\n\t\"SubCore\",\n\t\"impl_func\",\n\t\"make_core\",\n\t\"public_helper\",\n",
+			)
+	assert (pkg / "sub" / "__init__.py").read_text() == (
+			f"{sub_init_source}\n__all__ = [\"SubCore\", \"impl_func\"]\n"
+			)
+
+	assert [outcome.retv for outcome in check_packages([str(pkg)])] == [0, 0, 0]
+
+
+def test_check_packages_incremental(pkg: PathPlus, tmp_pathplus: PathPlus, monkeypatch):
+	cache_dir = str(tmp_pathplus / "cache")
+	assert [outcome.retv for outcome in check_packages([str(pkg)], cache_dir=cache_dir)] == [1, 0, 1]
+	assert [outcome.retv for outcome in check_packages([str(pkg)], cache_dir=cache_dir)] == [0, 0, 0]
+
+	read: List[str] = []
+	checked: List[str] = []
+	read_module = package.read_module
+	check = ModuleGraph.check
+
+	def record_read(root: str, relpath: str, *args, **kwargs):
+		read.append(relpath)
+		return read_module(root, relpath, *args, **kwargs)
+
+	def record_check(self: ModuleGraph, name: str, *args, **kwargs):
+		checked.append(name)
+		return check(self, name, *args, **kwargs)
+
+	monkeypatch.setattr(package, "read_module", record_read)
+	monkeypatch.setattr(ModuleGraph, "check", record_check)
+
+	# Nothing has changed, so nothing is read or checked
+	assert [outcome.retv for outcome in check_packages([str(pkg)], cache_dir=cache_dir)] == [0, 0, 0]
+	assert read == checked == []
+
+	# Only the changed module is read, and only the packages which star-import it are checked
+	(pkg / "sub" / "impl.py").write_text(f"{impl_source}\n\ndef another_func(): ...\n")
+	assert [outcome.retv for outcome in check_packages([str(pkg)], cache_dir=cache_dir)] == [1, 0, 1]
+	assert read == [str(PathPlus("sub") / "impl.py")]
+	assert checked == ["mypkg", "mypkg.sub"]
+	assert "\"another_func\"" in (pkg / "__init__.py").read_text()
+
+	# The files written above are read again, and every package is checked again as the options have changed
+	read.clear()
+	checked.clear()
+	outcomes = check_packages([str(pkg)], cache_dir=cache_dir, write=False)
+	assert [outcome.retv for outcome in outcomes] == [0, 0, 0]
+	assert sorted(read) == ["__init__.py", str(PathPlus("sub") / "__init__.py")]
+	assert checked == ["mypkg", "mypkg.other", "mypkg.sub"]
+
+
+def test_check_packages_noqa_and_invalid(pkg: PathPlus):
+	(pkg / "__init__.py").write_text(f"# noqa: DALL000\n{init_source}")
+	(pkg / "broken.py").write_text("def foo(:\n")
+
+	outcomes = list(check_packages([str(pkg)]))
+	assert [(PathPlus(outcome.filename).relative_to(pkg).as_posix(), outcome.retv) for outcome in outcomes] == [
+			("__init__.py", 0),
+			("broken.py", 4),
+			("other/__init__.py", 0),
+			("sub/__init__.py", 1),
+			]
+	assert "broken.py' does not appear to be a valid Python source file." in outcomes[1].stderr
+	assert "old_name" in (pkg / "__init__.py").read_text()
+
+
+def test_main_packages(pkg: PathPlus):
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--packages", "--check", str(pkg)])
+
+	assert result.exit_code == 1
+	assert result.stdout.count("Checking") == 3
+	assert "Would add: __all__ = [\"SubCore\", \"impl_func\"]" in result.stderr
+
+	result = runner.invoke(main, catch_exceptions=False, args=["--packages", str(pkg.parent)])
+	assert result.exit_code == 2
+	assert "is not a package, as it has no __init__.py file." in result.stderr
+
+
+def test_main_packages_sarif(pkg: PathPlus):
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(
+			main,
+			catch_exceptions=False,
+			args=["--packages", "--check", "--format", "sarif", str(pkg)],
+			)
+
+	assert result.exit_code == 1
+	results = json.loads(result.stdout)["runs"][0]["results"]
+	assert [item["ruleId"] for item in results] == ["DALL000", "DALL000"]
+	assert "__all__ doesn't match the names exported by the package." in results[0]["message"]["text"]
+
+
+def test_check_packages_submodule_added(pkg: PathPlus, tmp_pathplus: PathPlus):
+	cache_dir = str(tmp_pathplus / "cache")
+	(pkg / "__init__.py").write_text("from . import extra\n\n__all__ = [\"extra\"]\n")
+	(pkg / "extra.py").write_text("def extra(): ...\n")
+
+	outcomes = check_packages([str(pkg)], cache_dir=cache_dir, write=False)
+	assert [outcome.retv for outcome in outcomes][0] == 1
+
+	# Once the submodule is gone, ``extra`` is a name imported from the package, so __all__ is right.
+	(pkg / "extra.py").unlink()
+	outcomes = check_packages([str(pkg)], cache_dir=cache_dir, write=False)
+	assert [outcome.retv for outcome in outcomes][0] == 0
+
+
+def test_check_packages_not_a_package(pkg: PathPlus):
+	# Raised before any of the packages are checked.
+	with pytest.raises(ValueError, match="is not a package"):
+		check_packages([str(pkg), str(pkg.parent)])
+
+
+def test_check_packages_threads_stderr(pkg: PathPlus):
+	(pkg / "broken.py").write_text("def foo(:\n")
+	stderr = sys.stderr
+
+	def check(idx: int) -> List[FileOutcome]:
+		return list(check_packages([str(pkg)], write=False))
+
+	with ThreadPoolExecutor(max_workers=4) as executor:
+		results = list(executor.map(check, range(16)))
+
+	assert sys.stderr is stderr
+
+	for outcomes in results:
+		assert [outcome.retv for outcome in outcomes] == [1, 4, 0, 1]
+		assert outcomes[0].stderr.count("Missing:") == 1
+		assert outcomes[1].stderr.count("does not appear to be a valid Python source file.") == 1
+		assert outcomes[3].stderr.count("Would add:") == 1
+
+
+def test_main_packages_streamed(pkg: PathPlus, monkeypatch):
+	events = []
+
+	def check_packages(paths, **kwargs):
+		for name in ("__init__.py", "sub/__init__.py"):
+			events.append(f"checked {name}")
+			yield FileOutcome(str(pkg / name), 0, '')
+
+	def write(self, outcome: FileOutcome) -> None:
+		events.append(f"reported {PathPlus(outcome.filename).relative_to(pkg).as_posix()}")
+
+	monkeypatch.setattr(package, "check_packages", check_packages)
+	monkeypatch.setattr(TextReporter, "_write", write)
+
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--packages", str(pkg)])
+
+	assert result.exit_code == 0
+	assert events == [
+			"checked __init__.py",
+			"reported __init__.py",
+			"checked sub/__init__.py",
+			"reported sub/__init__.py",
+			]
+
+
+@pytest.mark.parametrize("path", [".", "__init__.py"])
+def test_main_packages_cwd(pkg: PathPlus, monkeypatch, path: str):
+	monkeypatch.chdir(pkg)
+
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--packages", "--check", "--no-cache", path])
+
+	assert result.exit_code == 1
+	assert "Missing: 'Core', 'SubCore', 'impl_func', 'make_core', 'public_helper'." in result.stderr
+	assert "Would add: __all__ = [\"SubCore\", \"impl_func\"]" in result.stderr
@@ -0,0 +1,154 @@
+# stdlib
+import io
+import itertools
+import time
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all import parallel
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.parallel import check_files
+from tests.common import mangled_source, testing_source_a, testing_source_b, testing_source_e
+
+
+@pytest.fixture()
+def source_files(tmp_pathplus: PathPlus):
+	filenames = []
+
+	for idx, source in enumerate([testing_source_a, testing_source_b, testing_source_e, testing_source_b * 50]):
+		tmpfile = tmp_pathplus / f"source_{idx}.py"
+		tmpfile.write_text(source)
+		filenames.append(str(tmpfile))
+
+	return filenames
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 4])
+def test_check_files(source_files, jobs: int):
+	outcomes = list(check_files(source_files, jobs=jobs, max_tasks_per_child=1))
+
+	assert [outcome.filename for outcome in outcomes] == source_files
+	assert [outcome.retv for outcome in outcomes] == [0, 1, 0, 1]
+	assert [outcome.stderr for outcome in outcomes] == ['', '', '', '']
+
+	assert "__all__ = [\"a_function\"]" in PathPlus(source_files[1]).read_text()
+
+
+def test_check_files_backpressure(source_files, monkeypatch):
+	monkeypatch.setattr(parallel, "SCHEDULE_WINDOW", 8)
+	consumed = []
+
+	def filenames():
+		for filename in itertools.islice(itertools.cycle(source_files[2:3]), 1000):
+			consumed.append(filename)
+			yield filename
+
+	outcomes = check_files(filenames(), jobs=2, write=False)
+	assert next(outcomes).filename == source_files[2]
+
+	# At most two windows have been read: the one being checked, and the one being submitted.
+	time.sleep(0.2)
+	assert len(consumed) <= 16
+
+	assert sum(1 for _ in outcomes) == 999
+	assert len(consumed) == 1000
+
+
+@pytest.mark.parametrize("jobs, window, processes", [(8, 256, 4), (3, 256, 3), (8, 2, 2), (8, 1, None)])
+def test_check_files_pool_size(source_files, jobs: int, window: int, processes, monkeypatch):
+	monkeypatch.setattr(parallel, "SCHEDULE_WINDOW", window)
+	pool_sizes = []
+	pool = parallel.multiprocessing.Pool
+
+	def record_pool(processes, **kwargs):
+		pool_sizes.append(processes)
+		return pool(processes, **kwargs)
+
+	monkeypatch.setattr(parallel.multiprocessing, "Pool", record_pool)
+
+	outcomes = list(check_files(source_files, jobs=jobs))
+	assert [outcome.filename for outcome in outcomes] == source_files
+	assert pool_sizes == ([] if processes is None else [processes])
+
+
+def test_main_jobs(tmp_pathplus: PathPlus, source_files):
+	mangled = tmp_pathplus / "mangled.py"
+	mangled.write_text(mangled_source)
+	filenames = [str(mangled), *source_files]
+
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--jobs", '2', *filenames])
+
+	assert result.exit_code == 5
+	assert result.stdout == ''.join(f"Checking {filename}\n" for filename in filenames)
+	assert "mangled.py' does not appear to be a valid Python source file." in result.stderr
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_check_files_lazy(source_files, jobs: int, monkeypatch):
+	monkeypatch.setattr(parallel, "SCHEDULE_WINDOW", 2)
+	consumed = []
+
+	def filenames():
+		for filename in source_files:
+			consumed.append(filename)
+			yield filename
+
+	outcomes = check_files(filenames(), jobs=jobs)
+	assert next(outcomes).filename == source_files[0]
+	if jobs == 1:
+		assert consumed == source_files[:1]
+
+	assert [outcome.filename for outcome in outcomes] == source_files[1:]
+
+
+@pytest.mark.parametrize(
+		"args, separator",
+		[
+				pytest.param([], '\n', id="newline"),
+				pytest.param(["-0"], '\0', id="null"),
+				pytest.param(["--null"], '\0', id="null_long"),
+				]
+		)
+def test_main_files_from(tmp_pathplus: PathPlus, source_files, args, separator: str):
+	file_list = tmp_pathplus / "files.txt"
+	file_list.write_text(separator.join(source_files[1:]) + separator)
+
+	runner = CliRunner()
+	result: Result = runner.invoke(
+			main,
+			catch_exceptions=False,
+			args=["--jobs", '2', *args, "--files-from", str(file_list), source_files[0]],
+			)
+
+	assert result.exit_code == 1
+	assert result.stdout == ''.join(f"Checking {filename}\n" for filename in source_files)
+
+
+def test_main_files_from_stdin(source_files):
+	runner = CliRunner()
+	result: Result = runner.invoke(
+			main,
+			catch_exceptions=False,
+			args=["--files-from", '-', "-0"],
+			input=io.BytesIO(b"\0".join(filename.encode() for filename in source_files)),
+			)
+
+	assert result.exit_code == 1
+	assert result.stdout == ''.join(f"Checking {filename}\n" for filename in source_files)
+
+
+@pytest.mark.parametrize("jobs", ['1', '2'])
+def test_main_check(source_files, jobs: str):
+	before = [PathPlus(filename).read_text() for filename in source_files]
+
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--check", "--jobs", jobs, *source_files])
+
+	assert result.exit_code == 1
+	assert [PathPlus(filename).read_text() for filename in source_files] == before
+	assert result.stderr.count("__all__ is missing. Would add: __all__ = [\"a_function\"]") == 2
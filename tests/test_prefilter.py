@@ -0,0 +1,91 @@
+# stdlib
+from typing import Optional
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all import check_and_add_all, prefilter
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.prefilter import prefilter_file
+from tests.common import (
+		if_type_checking_source,
+		testing_source_a,
+		testing_source_b,
+		testing_source_e,
+		testing_source_f,
+		testing_source_h
+		)
+
+
+@pytest.mark.parametrize(
+		"source, expected",
+		[
+				pytest.param(b"import foo", 0, id="just an import"),
+				pytest.param(testing_source_a.encode(), 0, id="import and docstring"),
+				pytest.param(testing_source_h.encode(), 0, id="from import"),
+				pytest.param(testing_source_b.encode(), None, id="function no __all__"),
+				pytest.param(if_type_checking_source.encode(), None, id="if TYPE_CHECKING"),
+				pytest.param(testing_source_e.encode(), 0, id="function and class with __all__"),
+				pytest.param(testing_source_f.encode(), 0, id="function and class with __all__ and extra variable"),
+				pytest.param(b"__all__: List[str] = []\ndef f(): ...", 0, id="annotated"),
+				pytest.param(b"__all__ = ()\r\ndef f(): ...", 0, id="crlf"),
+				pytest.param(b"x = '''it's\n__all__ = 1\n'''\ndef f(): ...", None, id="in triple quoted string"),
+				pytest.param(b'x = """\n__all__ = 1\n"""\ndef f(): ...', None, id="in triple double quoted string"),
+				pytest.param(b"foo(\n__all__=1)\ndef f(): ...", None, id="keyword argument"),
+				pytest.param(b"x = '('  # (\n__all__ = 1\ndef f(): ...", 0, id="brackets in string and comment"),
+				pytest.param(b"x = 1 \\\n__all__ = 1\ndef f(): ...", None, id="line continuation"),
+				pytest.param(b"x = 'abc\\\n__all__ = 1'\ndef f(): ...", None, id="string continuation"),
+				pytest.param(b"__all__ += []\ndef f(): ...", None, id="augmented assignment"),
+				pytest.param(b"__all__ == []\ndef f(): ...", None, id="comparison"),
+				pytest.param(b"def f(): ...\n\t__all__ = []", None, id="indented"),
+				pytest.param(b"x = 'define a classic'", 0, id="keywords in words"),
+				pytest.param(b"x = 'def or class'", None, id="keywords in string"),
+				],
+		)
+def test_prefilter(source: bytes, expected: Optional[int]):
+	assert prefilter.prefilter(source) == expected
+
+
+@pytest.mark.parametrize("mmap_threshold", [0, 1 << 20])
+def test_prefilter_file(tmp_pathplus: PathPlus, monkeypatch, mmap_threshold: int):
+	monkeypatch.setattr(prefilter, "MMAP_THRESHOLD", mmap_threshold)
+
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(testing_source_e)
+	assert prefilter_file(tmpfile) == 0
+
+	tmpfile.write_text(testing_source_b)
+	assert prefilter_file(tmpfile) is None
+
+
+def test_check_and_add_all_prefilter(tmp_pathplus: PathPlus, monkeypatch):
+	monkeypatch.setattr(prefilter, "stats", prefilter.PrefilterStats())
+
+	decided = tmp_pathplus / "decided.py"
+	decided.write_text(testing_source_e)
+	parsed = tmp_pathplus / "parsed.py"
+	parsed.write_text(testing_source_b)
+
+	assert check_and_add_all(decided, prefilter=True) == 0
+	assert check_and_add_all(parsed, prefilter=True) == 1
+	assert "__all__ = [\"a_function\"]" in parsed.read_text()
+
+	assert prefilter.stats.checked == 2
+	assert prefilter.stats.decided == 1
+
+
+def test_main_prefilter(tmp_pathplus: PathPlus):
+	filenames = []
+	for idx, source in enumerate([testing_source_a, testing_source_b, testing_source_e]):
+		tmpfile = tmp_pathplus / f"source_{idx}.py"
+		tmpfile.write_text(source)
+		filenames.append(str(tmpfile))
+
+	runner = CliRunner()
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--prefilter", "--jobs", '1', *filenames])
+
+	assert result.exit_code == 1
+	assert result.stdout.endswith("\n2 of 3 files decided by the prefilter.\n")
@@ -0,0 +1,112 @@
+# stdlib
+import json
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all import check_and_add_all, profiling
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.profiling import Event, slowest_files, write_chrome_trace
+from tests.common import testing_source_b, testing_source_e
+
+
+@pytest.fixture()
+def recorder():
+	yield profiling.enable()
+	profiling.disable()
+
+
+def test_disabled():
+	assert profiling.active() is None
+	assert profiling.phase("parse", "foo.py") is profiling.phase("visit", "bar.py")
+	assert profiling.disable() is None
+
+
+def test_check_and_add_all(recorder, tmp_pathplus: PathPlus):
+	(tmp_pathplus / "changed.py").write_text(testing_source_b)
+	(tmp_pathplus / "unchanged.py").write_text(testing_source_e)
+
+	check_and_add_all(tmp_pathplus / "changed.py")
+	check_and_add_all(tmp_pathplus / "unchanged.py")
+
+	events = recorder.drain()
+	assert recorder.events == []
+
+	phases = [(event.name, PathPlus(event.filename).name) for event in events]
+	assert phases == [
+			("read", "changed.py"),
+			("decode", "changed.py"),
+			("noqa", "changed.py"),
+			("parse", "changed.py"),
+			("visit", "changed.py"),
+			("write", "changed.py"),
+			("check_and_add_all", "changed.py"),
+			("read", "unchanged.py"),
+			("decode", "unchanged.py"),
+			("noqa", "unchanged.py"),
+			("parse", "unchanged.py"),
+			("visit", "unchanged.py"),
+			("check_and_add_all", "unchanged.py"),
+			]
+
+	for event in events:
+		assert event.duration >= 0
+
+
+def test_write_chrome_trace(tmp_pathplus: PathPlus):
+	events = [Event("parse", "foo.py", 2_000, 1_500, 123, 456)]
+	write_chrome_trace(events, str(tmp_pathplus / "trace.json"))
+
+	assert json.loads((tmp_pathplus / "trace.json").read_text()) == {
+			"traceEvents": [{
+					"name": "parse",
+					"cat": "phase",
+					"ph": 'X',
+					"ts": 2.0,
+					"dur": 1.5,
+					"pid": 123,
+					"tid": 456,
+					"args": {"filename": "foo.py"},
+					}],
+			"displayTimeUnit": "ms",
+			}
+
+
+def test_slowest_files():
+	events = [
+			Event("check_and_add_all", "a.py", 0, 1_000_000, 1, 1),
+			Event("parse", "b.py", 0, 5_000_000, 1, 1),
+			Event("check_and_add_all", "b.py", 0, 6_000_000, 1, 1),
+			Event("check_and_add_all", "c.py", 0, 3_000_000, 1, 1),
+			]
+
+	assert slowest_files(events, n=2) == [("b.py", 0.006), ("c.py", 0.003)]
+
+
+@pytest.mark.parametrize("jobs", ['1', '2'])
+def test_main_profile(tmp_pathplus: PathPlus, jobs: str):
+	filenames = []
+	for idx, source in enumerate([testing_source_b, testing_source_e, testing_source_b]):
+		filenames.append(str(tmp_pathplus / f"source_{idx}.py"))
+		PathPlus(filenames[-1]).write_text(source)
+
+	trace = tmp_pathplus / "trace.json"
+
+	runner = CliRunner()
+	result: Result = runner.invoke(
+			main,
+			catch_exceptions=False,
+			args=["--no-cache", "--jobs", jobs, "--profile", str(trace), *filenames],
+			)
+	assert result.exit_code == 1
+	assert profiling.active() is None
+
+	summary = result.stdout.split("Slowest files:\n")[1].splitlines()
+	assert sorted(line.split()[1] for line in summary) == filenames
+
+	events = json.loads(trace.read_text())["traceEvents"]
+	checked = sorted(event["args"]["filename"] for event in events if event["name"] == "check_and_add_all")
+	assert checked == filenames
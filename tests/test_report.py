@@ -0,0 +1,243 @@
+# stdlib
+import io
+import json
+from typing import List
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.parallel import FileOutcome, check_files
+from flake8_dunder_all.report import JsonLinesReporter, SarifReporter, TextReporter, reporters
+from tests.common import mangled_source, testing_source_a, testing_source_b
+
+outcomes = [
+		FileOutcome("unchanged.py", 0, ''),
+		FileOutcome(
+				"missing.py",
+				1,
+				'',
+				added=("Bar", "foo"),
+				lineno=3,
+				message="__all__ is missing. Would add: __all__ = [\"Bar\", \"foo\"]",
+				duration=0.25,
+				code="DALL000",
+				),
+		FileOutcome(
+				"unsorted.py",
+				1,
+				'',
+				lineno=1,
+				message="__all__ is not sorted alphabetically. Would sort it.",
+				code="DALL001",
+				),
+		FileOutcome("mangled.py", 4, "\x1b[31m'mangled.py' does not appear to be a valid Python source file.\x1b[39m\n"),
+		]
+
+
+def _report(name: str, quiet: bool = False) -> str:
+	stream = io.StringIO()
+	reporter = reporters[name](stream, quiet=quiet)
+
+	reporter.start()
+	for outcome in outcomes:
+		reporter.report(outcome)
+	reporter.finish()
+
+	return stream.getvalue()
+
+
+@pytest.mark.parametrize("quiet", [False, True])
+def test_text(quiet: bool):
+	expected = [outcome.filename for outcome in outcomes if outcome.retv or not quiet]
+	assert _report(TextReporter.name, quiet) == ''.join(f"Checking {filename}\n" for filename in expected)
+
+
+@pytest.mark.parametrize("quiet", [False, True])
+def test_jsonl(quiet: bool):
+	records = [json.loads(line) for line in _report(JsonLinesReporter.name, quiet).splitlines()]
+
+	assert [record["path"] for record in records] == [outcome.filename for outcome in outcomes[quiet:]]
+	assert records[-3] == {
+			"path": "missing.py",
+			"status": 1,
+			"added": ["Bar", "foo"],
+			"lineno": 3,
+			"message": "__all__ is missing. Would add: __all__ = [\"Bar\", \"foo\"]",
+			"prefiltered": False,
+			"duration": 0.25,
+			}
+	assert records[-1]["status"] == 4
+	assert records[-1]["message"] == "'mangled.py' does not appear to be a valid Python source file."
+
+
+def test_sarif():
+	log = json.loads(_report(SarifReporter.name))
+	assert log["version"] == "2.1.0"
+
+	run = log["runs"][0]
+	assert [rule["id"] for rule in run["tool"]["driver"]["rules"]] == ["DALL000", "DALL001"]
+
+	assert run["results"] == [
+			{
+					"ruleId": "DALL000",
+					"level": "warning",
+					"message": {"text": "__all__ is missing. Would add: __all__ = [\"Bar\", \"foo\"]"},
+					"locations": [{
+							"physicalLocation": {
+									"artifactLocation": {"uri": "missing.py"},
+									"region": {"startLine": 3},
+									},
+							}],
+					"properties": {"added": ["Bar", "foo"]},
+					},
+			{
+					"ruleId": "DALL001",
+					"level": "warning",
+					"message": {"text": "__all__ is not sorted alphabetically. Would sort it."},
+					"locations": [{
+							"physicalLocation": {
+									"artifactLocation": {"uri": "unsorted.py"},
+									"region": {"startLine": 1},
+									},
+							}],
+					},
+			]
+
+	notifications = run["invocations"][0]["toolExecutionNotifications"]
+	assert notifications == [{
+			"level": "error",
+			"message": {"text": "'mangled.py' does not appear to be a valid Python source file."},
+			"locations": [{"physicalLocation": {"artifactLocation": {"uri": "mangled.py"}}}],
+			}]
+
+
+def test_sarif_written_on_finish():
+	stream = io.StringIO()
+	reporter = SarifReporter(stream)
+	reporter.start()
+
+	for outcome in outcomes[:3]:
+		reporter.report(outcome)
+
+	assert stream.getvalue() == ''
+
+	reporter.finish()
+	assert len(json.loads(stream.getvalue())["runs"][0]["results"]) == 2
+
+	stream = io.StringIO()
+	reporter = SarifReporter(stream)
+	reporter.start()
+	reporter.finish()
+	assert json.loads(stream.getvalue())["runs"][0]["results"] == []
+
+
+def test_sarif_rule():
+	stream = io.StringIO()
+	reporter = SarifReporter(stream)
+
+	# The rule is given by the outcome's code, whatever the message
+	reporter.report(FileOutcome("natural.py", 1, '', message="Would sort __all__ naturally.", code="DALL001"))
+	reporter.report(FileOutcome("package.py", 1, "package.py:1: __all__ doesn't match.\n", code="DALL000"))
+	reporter.finish()
+
+	results = json.loads(stream.getvalue())["runs"][0]["results"]
+	assert [result["ruleId"] for result in results] == ["DALL001", "DALL000"]
+	assert results[1]["message"]["text"] == "package.py:1: __all__ doesn't match."
+
+	with pytest.raises(ValueError, match="Unknown code None for 'missing.py'."):
+		reporter.report(FileOutcome("missing.py", 1, ''))
+
+
+@pytest.fixture()
+def source_files(tmp_pathplus: PathPlus) -> List[str]:
+	filenames = []
+
+	for name, source in [("a", testing_source_a), ("b", testing_source_b), ("mangled", mangled_source)]:
+		tmpfile = tmp_pathplus / f"{name}.py"
+		tmpfile.write_text(source)
+		filenames.append(str(tmpfile))
+
+	return filenames
+
+
+@pytest.mark.parametrize("write", [True, False])
+def test_check_files_outcome(source_files: List[str], write: bool):
+	unchanged, missing, mangled = check_files(source_files, write=write)
+
+	assert unchanged.added == () and unchanged.lineno is None and unchanged.message == ''
+	assert missing.added == ("a_function", )
+	assert missing.lineno is not None
+	assert missing.message == "__all__ is missing. Would add: __all__ = [\"a_function\"]"
+	assert mangled.added == () and mangled.message == ''
+	assert all(outcome.duration > 0 for outcome in (unchanged, missing, mangled))
+
+
+@pytest.mark.parametrize("jobs", ['1', '2'])
+def test_main_jsonl(source_files: List[str], jobs: str):
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(
+			main,
+			catch_exceptions=False,
+			args=["--format", "jsonl", "--check", "--prefilter", "--jobs", jobs, *source_files],
+			)
+
+	assert result.exit_code == 5
+	records = [json.loads(line) for line in result.stdout.splitlines()]
+	assert [(record["path"], record["status"], record["added"]) for record in records] == [
+			(source_files[0], 0, []),
+			(source_files[1], 1, ["a_function"]),
+			(source_files[2], 4, []),
+			]
+
+	# The summary goes to stderr, so stdout stays parseable
+	assert "files decided by the prefilter." in result.stderr
+	assert "mangled.py' does not appear to be a valid Python source file." in result.stderr
+
+
+def test_main_sarif(source_files: List[str]):
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--format", "sarif", *source_files])
+
+	assert result.exit_code == 5
+	run = json.loads(result.stdout)["runs"][0]
+	assert [item["ruleId"] for item in run["results"]] == ["DALL000"]
+	assert run["results"][0]["properties"] == {"added": ["a_function"]}
+	assert len(run["invocations"][0]["toolExecutionNotifications"]) == 1
+	assert "__all__ = [\"a_function\"]" in PathPlus(source_files[1]).read_text()
+
+
+def test_main_sarif_sort(tmp_pathplus: PathPlus):
+	unsorted = tmp_pathplus / "unsorted.py"
+	unsorted.write_text("__all__ = [\"b\", \"a\"]\n\n\ndef a(): ...\n\n\ndef b(): ...\n")
+
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(
+			main,
+			catch_exceptions=False,
+			args=["--format", "sarif", "--check", "--sort", "upper", str(unsorted)],
+			)
+
+	assert result.exit_code == 1
+	results = json.loads(result.stdout)["runs"][0]["results"]
+	assert [item["ruleId"] for item in results] == ["DALL001"]
+	assert results[0]["locations"][0]["physicalLocation"]["region"] == {"startLine": 1}
+
+
+def test_main_quiet(source_files: List[str]):
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--quiet", "--prefilter", *source_files])
+
+	assert result.exit_code == 5
+	assert result.stdout == f"Checking {source_files[1]}\nChecking {source_files[2]}\n"
+
+
+def test_main_watch_format():
+	runner = CliRunner(mix_stderr=False)
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--watch", "--format", "jsonl", '.'])
+
+	assert result.exit_code == 2
+	assert "--watch can only be used with --format text." in result.stderr
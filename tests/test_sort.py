@@ -0,0 +1,198 @@
+# stdlib
+import ast
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all import AlphabeticalOptions, Plugin, check_and_add_all
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.cache import ResultCache
+
+functions = "\n\ndef a_function():\n\tpass\n"
+
+
+@pytest.mark.parametrize(
+		"source, expected",
+		[
+				pytest.param(
+						"__all__ = ['b', \"a\", 'C']\n",
+						"__all__ = ['C', \"a\", 'b']\n",
+						id="list",
+						),
+				pytest.param(
+						"__all__ = (\"b\", \"a\", )\n",
+						"__all__ = (\"a\", \"b\", )\n",
+						id="tuple",
+						),
+				pytest.param(
+						"__all__ = [\n\t\"b\",\n\t\"a\",\n\t]\n",
+						"__all__ = [\n\t\"a\",\n\t\"b\",\n\t]\n",
+						id="multiline_trailing_comma",
+						),
+				pytest.param(
+						"__all__ = [\n\t\"b\",\n\t\"a\"\n\t]\n",
+						"__all__ = [\n\t\"a\",\n\t\"b\"\n\t]\n",
+						id="multiline_no_trailing_comma",
+						),
+				pytest.param(
+						"__all__ = [\n\t\"c\",  # the c\n\t\"b\",\n\t\"a\",  # the a\n\t]\n",
+						"__all__ = [\n\t\"a\",  # the a\n\t\"b\",\n\t\"c\",  # the c\n\t]\n",
+						id="multiline_comments",
+						),
+				pytest.param(
+						"__all__ = (\n\t\"b\", \"a\",\n\t\"c\")  # comment\n",
+						"__all__ = (\n\t\"a\", \"b\",\n\t\"c\")  # comment\n",
+						id="shared_lines",
+						),
+				pytest.param(
+						"__all__: List[str] = [\"b\", \"a\"]\n",
+						"__all__: List[str] = [\"a\", \"b\"]\n",
+						id="annotated",
+						),
+				pytest.param(
+						"x = 1; __all__ = [(\"b\"), \"a\"]\n",
+						"x = 1; __all__ = [\"a\", (\"b\")]\n",
+						id="semicolon_and_parentheses",
+						),
+				pytest.param(
+						"__all__ = [\"func10\", \"func9\", \"func1\"]\n",
+						"__all__ = [\"func1\", \"func9\", \"func10\"]\n",
+						id="natural",
+						),
+				]
+		)
+def test_sort(tmp_pathplus: PathPlus, source: str, expected: str):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(source + functions)
+
+	assert check_and_add_all(tmpfile, sort=AlphabeticalOptions.UPPER) == 1
+	assert tmpfile.read_text() == expected + functions
+
+	assert check_and_add_all(tmpfile, sort=AlphabeticalOptions.UPPER) == 0
+	assert tmpfile.read_text() == expected + functions
+
+	# The result satisfies the flake8 plugin
+	plugin = Plugin(ast.parse(tmpfile.read_text()))
+	plugin.dunder_all_alphabetical = AlphabeticalOptions.UPPER
+	assert list(plugin.run()) == []
+
+
+@pytest.mark.parametrize(
+		"option, expected",
+		[
+				pytest.param(AlphabeticalOptions.UPPER, "__all__ = [\"Bar\", \"Foo\", \"baz\"]", id="upper"),
+				pytest.param(AlphabeticalOptions.LOWER, "__all__ = [\"baz\", \"Bar\", \"Foo\"]", id="lower"),
+				pytest.param(AlphabeticalOptions.IGNORE, "__all__ = [\"Bar\", \"baz\", \"Foo\"]", id="ignore"),
+				]
+		)
+def test_sort_options(tmp_pathplus: PathPlus, option: AlphabeticalOptions, expected: str):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("__all__ = [\"Foo\", \"baz\", \"Bar\"]\n")
+
+	assert check_and_add_all(tmpfile, sort=option) == 1
+	assert tmpfile.read_text() == f"{expected}\n"
+
+
+@pytest.mark.parametrize(
+		"option, expected",
+		[
+				pytest.param(AlphabeticalOptions.NONE, "__all__ = [\"Bar\", \"Foo\", \"baz\"]", id="none"),
+				pytest.param(AlphabeticalOptions.LOWER, "__all__ = [\"baz\", \"Bar\", \"Foo\"]", id="lower"),
+				]
+		)
+def test_sort_insertion(tmp_pathplus: PathPlus, option: AlphabeticalOptions, expected: str):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("class Foo: ...\n\n\nclass Bar: ...\n\n\ndef baz(): ...\n")
+
+	assert check_and_add_all(tmpfile, sort=option) == 1
+	assert expected in tmpfile.read_text()
+
+
+@pytest.mark.parametrize(
+		"source",
+		[
+				pytest.param("__all__ = ['a', 'b']\n", id="sorted"),
+				pytest.param("__all__ = 'b'\n", id="string"),
+				pytest.param("__all__ = 'b', 'a'\n", id="no_brackets"),
+				pytest.param("__all__ = ['b', 'a', 1]\n", id="not_strings"),
+				pytest.param("__all__ = ['b', 'a'] + other\n", id="not_literal"),
+				pytest.param("__all__ = ['b', 'a']  # noqa: DALL001\n", id="noqa"),
+				]
+		)
+def test_sort_unchanged(tmp_pathplus: PathPlus, source: str):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(source + functions)
+
+	assert check_and_add_all(tmpfile, sort=AlphabeticalOptions.UPPER) == 0
+	assert tmpfile.read_text() == source + functions
+
+
+def test_sort_noqa_dall000(tmp_pathplus: PathPlus):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("# noqa: DALL000\n__all__ = ['b', 'a']\n" + functions)
+
+	assert check_and_add_all(tmpfile, sort=AlphabeticalOptions.UPPER) == 1
+	assert "__all__ = ['a', 'b']" in tmpfile.read_text()
+
+
+def test_sort_not_requested(tmp_pathplus: PathPlus):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("__all__ = ['b', 'a']\n" + functions)
+
+	assert check_and_add_all(tmpfile) == 0
+	assert "__all__ = ['b', 'a']" in tmpfile.read_text()
+
+
+def test_sort_prefilter(tmp_pathplus: PathPlus):
+	# The prefilter would decide this file without looking at the order of __all__
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("__all__ = ['b', 'a']\n")
+
+	assert check_and_add_all(tmpfile, prefilter=True, sort=AlphabeticalOptions.UPPER) == 1
+	assert tmpfile.read_text() == "__all__ = ['a', 'b']\n"
+
+
+def test_sort_cache(tmp_pathplus: PathPlus):
+	cache = ResultCache(str(tmp_pathplus / "cache"))
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("__all__ = ['b', 'a']\n")
+
+	try:
+		assert check_and_add_all(tmpfile, cache=cache) == 0
+		assert check_and_add_all(tmpfile, cache=cache, sort=AlphabeticalOptions.UPPER) == 1
+		assert tmpfile.read_text() == "__all__ = ['a', 'b']\n"
+	finally:
+		cache.close()
+
+
+def test_sort_no_write(tmp_pathplus: PathPlus, capsys):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text("\n__all__ = ['b', 'a']\n")
+
+	assert check_and_add_all(tmpfile, write=False, sort=AlphabeticalOptions.LOWER) == 1
+	assert tmpfile.read_text() == "\n__all__ = ['b', 'a']\n"
+	assert capsys.readouterr().err == (
+			f"{tmpfile}:2: __all__ is not sorted alphabetically (lowercase first). Would sort it.\n"
+			)
+
+
+@pytest.mark.parametrize("jobs", ['1', '2'])
+def test_main_sort(tmp_pathplus: PathPlus, jobs: str):
+	unsorted = tmp_pathplus / "unsorted.py"
+	unsorted.write_text("__all__ = ['b', 'a']\n")
+	missing = tmp_pathplus / "missing.py"
+	missing.write_text("def foo(): ...\n\n\ndef Bar(): ...\n")
+
+	runner = CliRunner()
+	result: Result = runner.invoke(
+			main,
+			catch_exceptions=False,
+			args=["--sort", "lower", "--jobs", jobs, str(unsorted), str(missing)],
+			)
+
+	assert result.exit_code == 1
+	assert unsorted.read_text() == "__all__ = ['a', 'b']\n"
+	assert "__all__ = [\"foo\", \"Bar\"]" in missing.read_text()
@@ -0,0 +1,170 @@
+# stdlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Union
+
+# 3rd party
+import pytest
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all import AlphabeticalOptions, Engine, check_and_add_all
+from flake8_dunder_all.source import SourceResult, check_source, check_sources
+from tests.common import mangled_source, testing_source_a, testing_source_b, testing_source_e
+
+
+@pytest.mark.parametrize("engine", [Engine.VISITOR, Engine.SCANNER, Engine.TOKENIZE])
+@pytest.mark.parametrize(
+		"source",
+		[
+				pytest.param(testing_source_a, id="a"),
+				pytest.param(testing_source_b, id="b"),
+				pytest.param(testing_source_e, id="e"),
+				pytest.param(mangled_source, id="mangled"),
+				pytest.param("__all__ = ['b', 'a']\n\n\ndef a(): ...\n", id="unsorted"),
+				]
+		)
+def test_check_source_matches_file(tmp_pathplus: PathPlus, source: str, engine: Engine):
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(source)
+	retv = check_and_add_all(tmpfile, engine=engine, sort=AlphabeticalOptions.UPPER)
+
+	result = check_source(source, engine=engine, sort=AlphabeticalOptions.UPPER)
+	assert result.retv == retv
+	if retv != 4:
+		assert result.source == tmpfile.read_text()
+
+	result = check_source(source.encode("UTF-8"), engine=engine, sort=AlphabeticalOptions.UPPER)
+	assert result.retv == retv
+	if retv != 4:
+		assert result.source == tmpfile.read_bytes()
+
+
+def test_check_source_insertion():
+	source = "import os\n\n\ndef foo(): ...\n\n\nclass Bar: ...\n"
+	result = check_source(source, quote_type="'", use_tuple=True)
+
+	assert result == SourceResult(
+			1,
+			"import os\n\n__all__ = ('Bar', 'foo', )\n\n\ndef foo(): ...\n\n\nclass Bar: ...\n",
+			"__all__ = ('Bar', 'foo', )",
+			3,
+			"__all__ is missing. Would add: __all__ = ('Bar', 'foo', )",
+			)
+
+
+def test_check_source_sort():
+	source = "__all__ = [\n\t\"b\",  # the b\n\t\"a\",\n\t]\n\n\ndef a(): ...\n"
+	result = check_source(source, sort=AlphabeticalOptions.UPPER)
+
+	assert result.retv == 1
+	assert result.dunder_all == "__all__ = [\n\t\"a\",\n\t\"b\",  # the b\n\t]"
+	assert result.lineno == 1
+	assert result.message == "__all__ is not sorted alphabetically (uppercase first). Would sort it."
+	assert result.source == f"{result.dunder_all}\n\n\ndef a(): ...\n"
+
+
+@pytest.mark.parametrize(
+		"source",
+		[
+				pytest.param("x = 1\n", id="no_members"),
+				pytest.param("def foo(): ...\n\n\n__all__ = [\"foo\"]\n", id="has_all"),
+				pytest.param(b"# noqa: DALL000\ndef foo(): ...\n", id="noqa"),
+				]
+		)
+def test_check_source_unchanged(source: Union[str, bytes]):
+	assert check_source(source) == SourceResult(0, source)
+
+
+@pytest.mark.parametrize(
+		"source",
+		[
+				pytest.param("def foo(:\n", id="syntax_error"),
+				pytest.param(b"def foo(): return '\xff'\n", id="not_utf8"),
+				pytest.param("# coding: ascii\ndef foo(): return '☃'\n", id="not_encodable"),
+				pytest.param("# coding: not-an-encoding\ndef foo(): ...\n", id="unknown_encoding"),
+				]
+		)
+def test_check_source_invalid(source: Union[str, bytes], capsys):
+	result = check_source(source)
+
+	assert result == SourceResult(4, source, message="The source does not appear to be valid Python.")
+	assert capsys.readouterr().err == ''
+
+
+def test_check_source_threads(capsys):
+	stderr = sys.stderr
+
+	def check(idx: int) -> SourceResult:
+		result = check_source(mangled_source if idx % 2 else testing_source_b)
+		print(f"Checked {idx}", file=sys.stderr)
+		return result
+
+	with ThreadPoolExecutor(max_workers=8) as executor:
+		results = list(executor.map(check, range(200)))
+
+	# Messages written by other threads are never swallowed, and sys.stderr is never replaced
+	assert sys.stderr is stderr
+	assert [result.retv for result in results] == [1, 4] * 100
+	assert sorted(capsys.readouterr().err.splitlines()) == sorted(f"Checked {idx}" for idx in range(200))
+
+
+def test_check_source_encoding():
+	source = "# -*- coding: latin-1 -*-\n\"\"\"Café.\"\"\"\n\ndef foo(): ...\n"
+
+	result = check_source(source)
+	assert result.retv == 1
+	assert result.source == source.replace("\ndef", "\n__all__ = [\"foo\"]\n\n\ndef")
+
+	result = check_source(source.encode("latin-1"))
+	assert result.retv == 1
+	assert isinstance(result.source, bytes)
+	assert result.source.decode("latin-1") == source.replace("\ndef", "\n__all__ = [\"foo\"]\n\n\ndef")
+
+
+def _sources() -> List[str]:
+	return [testing_source_a, testing_source_b, mangled_source, testing_source_e] * 5
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("batch_size", [1, 3, 100])
+def test_check_sources(jobs: int, batch_size: int):
+	sources = _sources()
+	results = list(check_sources(sources, jobs=jobs, batch_size=batch_size))
+
+	assert results == [check_source(source) for source in sources]
+	assert [result.retv for result in results[:4]] == [0, 1, 4, 0]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_check_sources_lazy(jobs: int):
+	sources = _sources()
+	consumed = []
+
+	def generate() -> Iterator[str]:
+		for source in sources:
+			consumed.append(source)
+			yield source
+
+	results = check_sources(generate(), jobs=jobs, batch_size=2)
+	assert next(results).retv == 0
+
+	# Only the batches allowed in flight have been read
+	assert len(consumed) <= 2 * max(jobs, 1) * 2 + 1
+
+	assert len(list(results)) == len(sources) - 1
+	assert len(consumed) == len(sources)
+
+
+def test_check_sources_cache(tmp_pathplus: PathPlus):
+	cache_dir = str(tmp_pathplus / "cache")
+	sources = _sources()
+
+	expected = [check_source(source) for source in sources]
+	assert list(check_sources(sources, cache_dir=cache_dir)) == expected
+	assert list(check_sources(sources, cache_dir=cache_dir, jobs=2, batch_size=2)) == expected
+
+
+def test_check_sources_invalid_batch_size():
+	with pytest.raises(ValueError, match="'batch_size' must be at least 1"):
+		list(check_sources(["x = 1\n"], batch_size=0))
@@ -0,0 +1,241 @@
+# stdlib
+import ast
+import inspect
+import sys
+import tokenize
+import typing
+from typing import Iterator
+
+# 3rd party
+import pytest
+from domdf_python_tools.paths import PathPlus
+
+# this package
+import flake8_dunder_all
+from flake8_dunder_all import Engine, TokenScanner, Visitor, _docstring_end, _mark_end_linenos, check_and_add_all
+from tests import common
+
+edge_source = '''\
+"""Doc
+string"""; import os
+from typing import overload, TYPE_CHECKING
+import typing as t
+
+@overload
+def f(x: int) -> int: ...
+@t.overload
+def f(x: str) -> str: ...
+@overload()
+def g(): ...
+@(overload)
+def h(): ...
+def f(x): return x
+async def af(): pass
+class K: __all__ = ["no"]; import zz
+def inl(): import yy
+
+if TYPE_CHECKING or False:
+	import a
+elif TYPE_CHECKING:
+	import b
+else:
+	c = 1
+if (TYPE_CHECKING := True):
+	import not_type_checking
+if not TYPE_CHECKING:
+	import not_type_checking
+if TYPE_CHECKING and (x or False):
+	import c
+
+	# trailing comment
+
+if x: import q
+else: import r
+
+try: import s
+except ImportError: pass
+
+try:
+	if y:
+		import v
+except: pass
+
+f = lambda x=1: x
+for i in range(3):
+	def in_for(): ...
+else:
+	import in_else
+
+x = [\'\'\'
+\'\'\']; __all__ += ["c"]
+(__all__) = x = ["é", ("b"),
+	"a",  # c
+	]
+'''
+
+match_source = """
+match command:
+	case [x, y]: import w
+	case {"a": b} if (c := 1):
+		import ww
+		def in_match(): ...
+	case _:
+		pass
+
+match = 1
+match: int = 2
+"""
+
+except_star_source = """
+try:
+	import u
+except* ValueError:
+	pass
+
+def a_function(): ...
+"""
+
+docstring_sources = [
+		pytest.param("(\n'doc'\n'more\\\\n'\n)\n\nimport a\ndef f(): ...\n", id="parenthesised"),
+		pytest.param("'''doc'''; import a\ndef f(): ...\n", id="semicolon"),
+		pytest.param("b'''not\nthe\ndocstring'''\ndef f(): ...\n", id="bytes"),
+		pytest.param("f'''not\nthe\ndocstring'''\ndef f(): ...\n", id="f-string"),
+		pytest.param("# comment\n\n'''doc\n'''\ndef f(): ...\n", id="after_comment"),
+		]
+
+
+def _sources() -> Iterator[str]:
+	yield edge_source
+	yield match_source
+	yield except_star_source
+
+	for name, value in vars(common).items():
+		if isinstance(value, str) and not name.startswith('_'):
+			yield value
+
+	for module in (flake8_dunder_all, ast, inspect, tokenize, typing, pytest):
+		yield PathPlus(inspect.getfile(module)).read_text()
+
+
+def _check(source: str) -> TokenScanner:
+	try:
+		tree = ast.parse(source)
+	except SyntaxError:
+		pytest.skip("Not valid Python")
+
+	if sys.version_info < (3, 8):  # pragma: no cover (py38+)
+		_mark_end_linenos(tree, source)
+
+	visitor = Visitor(use_endlineno=True)
+	visitor.visit(tree)
+
+	scanner = TokenScanner()
+	scanner.scan(source)
+
+	assert scanner.result() == visitor.result()
+	assert scanner.docstring_end == _docstring_end(tree)
+
+	return scanner
+
+
+@pytest.mark.skipif(sys.implementation.name == "pypy", reason="Output differs on PyPy")
+@pytest.mark.parametrize("source", [pytest.param(source, id=str(idx)) for idx, source in enumerate(_sources())])
+def test_token_scanner(source: str):
+	_check(source)
+
+
+def test_token_scanner_edge_cases():
+	scanner = _check(edge_source)
+
+	assert scanner.members == {'K', "af", 'f', 'g', "in_for", "inl"}
+	assert scanner.all_members == ["é", 'b', 'a']
+	assert scanner.all_lineno == 53
+	assert scanner.all_positions == [(53, 17), (53, 24), (54, 1)]
+	assert scanner.last_import == 49
+	assert scanner.docstring_end == 2
+
+
+@pytest.mark.parametrize("source", docstring_sources)
+def test_token_scanner_docstring(source: str):
+	_check(source)
+
+
+@pytest.mark.parametrize(
+		"source",
+		[
+				pytest.param("x = (\n", id="unclosed_bracket"),
+				pytest.param("x = '''\n", id="unclosed_string"),
+				pytest.param("x = 1)\n", id="unmatched_bracket"),
+				pytest.param("if True:\n\t\tx = 1\n\ty = 2\n", id="bad_dedent"),
+				]
+		)
+def test_token_scanner_invalid(tmp_pathplus: PathPlus, source: str, capsys):
+	with pytest.raises((SyntaxError, tokenize.TokenError)):
+		TokenScanner().scan(source)
+
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(source)
+	assert check_and_add_all(tmpfile, engine=Engine.TOKENIZE) == 4
+	assert "does not appear to be a valid Python source file." in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+		"source",
+		[
+				pytest.param(common.testing_source_b, id='b'),
+				pytest.param(common.testing_source_d, id='d'),
+				pytest.param(common.testing_source_j, id='j'),
+				pytest.param(common.if_type_checking_try_finally_source, id="type_checking_try"),
+				pytest.param(docstring_sources[0].values[0], id="docstring"),
+				pytest.param(edge_source.replace("(__all__)", "y"), id="edge"),
+				]
+		)
+def test_check_and_add_all_tokenize(tmp_pathplus: PathPlus, source: str, monkeypatch):
+	expected_file = tmp_pathplus / "expected.py"
+	expected_file.write_text(source)
+	expected = check_and_add_all(expected_file)
+
+	parse = ast.parse
+
+	def no_parse(source: str, *args, mode: str = "exec", **kwargs):
+		# Small parts of the module, such as the value of __all__, are still parsed.
+		if mode != "eval":
+			raise AssertionError("The module was parsed")
+		return parse(source, *args, mode=mode, **kwargs)
+
+	tmpfile = tmp_pathplus / "source.py"
+	tmpfile.write_text(source)
+
+	with monkeypatch.context() as m:
+		m.setattr(ast, "parse", no_parse)
+		assert check_and_add_all(tmpfile, engine=Engine.TOKENIZE) == expected
+
+	assert tmpfile.read_text() == expected_file.read_text()
+
+
+def test_engine_auto(tmp_pathplus: PathPlus, monkeypatch):
+	assert Engine.AUTO.for_size(0) is Engine.VISITOR
+	assert Engine.AUTO.for_size(flake8_dunder_all.TOKENIZE_THRESHOLD) is Engine.TOKENIZE
+	assert Engine.SCANNER.for_size(flake8_dunder_all.TOKENIZE_THRESHOLD) is Engine.SCANNER
+
+	small = tmp_pathplus / "small.py"
+	small.write_text(common.testing_source_b)
+	large = tmp_pathplus / "large.py"
+	large.write_text(common.testing_source_b + '#' * 100)
+
+	monkeypatch.setattr(flake8_dunder_all, "TOKENIZE_THRESHOLD", len(common.testing_source_b) + 1)
+
+	scanned = []
+	scan = TokenScanner.scan
+
+	def record_scan(self: TokenScanner, source: str) -> None:
+		scanned.append(source)
+		scan(self, source)
+
+	monkeypatch.setattr(TokenScanner, "scan", record_scan)
+
+	assert check_and_add_all(small, engine=Engine.AUTO) == 1
+	assert scanned == []
+	assert check_and_add_all(large, engine=Engine.AUTO) == 1
+	assert len(scanned) == 1
+	assert "__all__ = [\"a_function\"]" in large.read_text()
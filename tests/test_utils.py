@@ -1,8 +1,28 @@
 # stdlib
 import ast
+from typing import Set
+
+# 3rd party
+import pytest
 
 # this package
-from flake8_dunder_all.utils import get_docstring_lineno, tidy_docstring
+from flake8_dunder_all.utils import decode_source, find_noqa_codes, get_docstring_lineno, tidy_docstring
+
+
+def test_decode_source():
+	assert decode_source(b"x = 1\n") == ("x = 1\n", "utf-8")
+	assert decode_source(b"x = 1\r\ny = 2\rz = 3") == ("x = 1\ny = 2\nz = 3", "utf-8")
+	assert decode_source(b"\xef\xbb\xbfx = 1\n") == ("x = 1\n", "utf-8-sig")
+	assert decode_source(b"# -*- coding: latin-1 -*-\nx = '\xe9'\n") == (
+			"# -*- coding: latin-1 -*-\nx = '\xe9'\n",
+			"iso-8859-1",
+			)
+
+	with pytest.raises(SyntaxError, match="unknown encoding"):
+		decode_source(b"# coding: not-an-encoding\n")
+
+	with pytest.raises(UnicodeDecodeError):
+		decode_source(b"\n\nx = '\xe9'\n")
 
 
 def test_get_docstring_lineno():
@@ -40,3 +60,20 @@ def test_tidy_docstring():
 	""") == '\nhello\n        world'
 
 	assert tidy_docstring(None) == ''
+
+
+@pytest.mark.parametrize(
+		"source, codes",
+		[
+				pytest.param("import foo\n", set(), id="no comments"),
+				pytest.param("import foo  # noqa\n", set(), id="bare noqa"),
+				pytest.param("# noqa: DALL000\nimport foo\n", {"DALL000"}, id="single code"),
+				pytest.param("import foo  # NOQA:e501, dall000\n", {"E501", "DALL000"}, id="multiple codes"),
+				pytest.param("# noqa: E501\nx = 1\n\n# noqa: F401 DALL000\n", {"E501", "F401", "DALL000"}, id="many"),
+				pytest.param('x = """\n# noqa: DALL000\n"""\n', set(), id="in string"),
+				pytest.param('x = """\n# noqa: DALL000\n"""\ny = 1  # noqa: E501\n', {"E501"}, id="string and comment"),
+				pytest.param('x = """\n# noqa: DALL000\n', {"DALL000"}, id="not tokenizable"),
+				],
+		)
+def test_find_noqa_codes(source: str, codes: Set[str]):
+	assert find_noqa_codes(source) == codes
@@ -0,0 +1,153 @@
+# stdlib
+import os
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.walk import ExcludeMatcher, GitIgnore, walk
+from tests.common import testing_source_b, testing_source_e
+
+
+@pytest.fixture()
+def tree(tmp_pathplus: PathPlus) -> PathPlus:
+	root = tmp_pathplus / "project"
+
+	for filename in [
+			"setup.py",
+			"pkg/__init__.py",
+			"pkg/module.py",
+			"pkg/data.txt",
+			"pkg/sub/deep.py",
+			"pkg/generated_x.py",
+			"pkg/__pycache__/cached.py",
+			"pkg/pkg.egg-info/info.py",
+			".git/hooks/hook.py",
+			".tox/py39/lib.py",
+			"build/lib/module.py",
+			"venv/lib/site.py",
+			"docs/conf.py",
+			]:
+		(root / filename).parent.mkdir(parents=True, exist_ok=True)
+		(root / filename).write_text(testing_source_e)
+
+	(root / "venv" / "pyvenv.cfg").write_text('')
+	(root / ".gitignore").write_text("# Comment\ngenerated_*.py\n/docs/\n")
+
+	return root
+
+
+def relative(root: PathPlus, filenames):
+	return [PathPlus(filename).relative_to(root).as_posix() for filename in filenames]
+
+
+def test_walk(tree: PathPlus):
+	assert relative(tree, walk([str(tree)])) == [
+			"setup.py",
+			"pkg/__init__.py",
+			"pkg/module.py",
+			"pkg/sub/deep.py",
+			]
+
+
+def test_walk_no_gitignore(tree: PathPlus):
+	assert relative(tree, walk([str(tree)], gitignore=False)) == [
+			"setup.py",
+			"docs/conf.py",
+			"pkg/__init__.py",
+			"pkg/generated_x.py",
+			"pkg/module.py",
+			"pkg/sub/deep.py",
+			]
+
+
+def test_walk_exclude(tree: PathPlus):
+	assert relative(tree, walk([str(tree)], exclude=["sub", "pkg/module.py", "venv"])) == [
+			"setup.py",
+			".git/hooks/hook.py",
+			".tox/py39/lib.py",
+			"build/lib/module.py",
+			"pkg/__init__.py",
+			"pkg/__pycache__/cached.py",
+			"pkg/pkg.egg-info/info.py",
+			]
+
+
+def test_walk_files(tree: PathPlus):
+	# Files are given back as they are, even if they would otherwise be excluded.
+	filenames = [str(tree / "pkg" / "data.txt"), str(tree / "build" / "lib" / "module.py")]
+	assert list(walk(filenames)) == filenames
+
+
+def test_walk_parent_gitignore(tree: PathPlus):
+	(tree / ".git" / "info").mkdir()
+	(tree / ".git" / "info" / "exclude").write_text("deep.py\n")
+	(tree / "pkg" / ".gitignore").write_text("!generated_x.py\n")
+
+	assert relative(tree, walk([str(tree / "pkg")])) == [
+			"pkg/__init__.py",
+			"pkg/generated_x.py",
+			"pkg/module.py",
+			]
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="Symbolic links are not supported.")
+def test_walk_symlinks(tree: PathPlus):
+	os.symlink(tree / "pkg" / "sub", tree / "pkg" / "link")
+	os.symlink(tree / "pkg" / "module.py", tree / "pkg" / "alias.py")
+	os.symlink(tree, tree / "pkg" / "loop")
+
+	# The first path to each file is used, and the loop is not followed.
+	assert relative(tree, walk([str(tree), str(tree / "pkg")])) == [
+			"setup.py",
+			"pkg/__init__.py",
+			"pkg/alias.py",
+			"pkg/link/deep.py",
+			]
+
+
+@pytest.mark.parametrize(
+		"pattern, path, expected",
+		[
+				("*.py", "a.py", True),
+				("*.py", "a/b.py", False),
+				("a/**/b.py", "a/b.py", True),
+				("a/**/b.py", "a/x/y/b.py", True),
+				("a/**", "a/x/y", True),
+				("[!a]b.py", "cb.py", True),
+				("[!a]b.py", "ab.py", False),
+				("?.py", "ab.py", False),
+				]
+		)
+def test_exclude_matcher(pattern: str, path: str, expected: bool):
+	assert ExcludeMatcher([pattern])(path, path) is expected
+
+
+def test_gitignore():
+	ignore = GitIgnore(["*.pyc", "build/", "!keep.pyc", "/top.py", "foo/bar", '', "\\#hash", "trailing   "])
+
+	assert ignore.match("x/a.pyc", False) is True
+	assert ignore.match("x/keep.pyc", False) is False
+	assert ignore.match("x/build", True) is True
+	assert ignore.match("x/build", False) is None
+	assert ignore.match("top.py", False) is True
+	assert ignore.match("x/top.py", False) is None
+	assert ignore.match("foo/bar", False) is True
+	assert ignore.match("x/foo/bar", False) is None
+	assert ignore.match("#hash", False) is True
+	assert ignore.match("trailing", False) is True
+
+
+def test_main_directory(tree: PathPlus):
+	(tree / "pkg" / "module.py").write_text(testing_source_b)
+
+	runner = CliRunner()
+	result: Result = runner.invoke(main, catch_exceptions=False, args=["--exclude", "sub", str(tree)])
+
+	assert result.exit_code == 1
+	assert result.stdout == ''.join(
+			f"Checking {os.path.join(tree, filename)}\n" for filename in ["setup.py", "pkg/__init__.py", "pkg/module.py"]
+			)
@@ -0,0 +1,185 @@
+# stdlib
+import os
+import sys
+
+# 3rd party
+import pytest
+from consolekit.testing import CliRunner, Result
+from domdf_python_tools.paths import PathPlus
+
+# this package
+from flake8_dunder_all import watch
+from flake8_dunder_all.__main__ import main
+from flake8_dunder_all.walk import DEFAULT_EXCLUDES
+from flake8_dunder_all.watch import (
+		IncrementalChecker,
+		InotifyWatcher,
+		PollingWatcher,
+		Watcher,
+		walk_python_files,
+		watch_files
+		)
+from tests.common import testing_source_b, testing_source_e
+
+
+@pytest.fixture()
+def tree(tmp_pathplus: PathPlus) -> PathPlus:
+	(tmp_pathplus / "pkg" / "sub").mkdir(parents=True)
+	(tmp_pathplus / "pkg" / "__pycache__").mkdir()
+	(tmp_pathplus / "pkg" / ".hidden").mkdir()
+	(tmp_pathplus / "pkg" / "a.py").write_text(testing_source_e)
+	(tmp_pathplus / "pkg" / "sub" / "b.py").write_text(testing_source_e)
+	(tmp_pathplus / "pkg" / "sub" / "c.txt").write_text(testing_source_b)
+	(tmp_pathplus / "pkg" / "__pycache__" / "d.py").write_text(testing_source_b)
+	(tmp_pathplus / "pkg" / ".hidden" / "e.py").write_text(testing_source_b)
+	return tmp_pathplus / "pkg"
+
+
+def _touch_later(path: PathPlus, content: str) -> None:
+	# Make sure the modification time changes, even on filesystems with a coarse timestamp resolution.
+	path.write_text(content)
+	st = os.stat(path)
+	os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_walk_python_files(tree: PathPlus):
+	assert list(walk_python_files([str(tree), str(tree / "sub" / "c.txt")])) == [
+			os.path.join(tree, "a.py"),
+			os.path.join(tree, "sub", "b.py"),
+			str(tree / "sub" / "c.txt"),
+			]
+
+
+def test_incremental_checker(tmp_pathplus: PathPlus):
+	checker = IncrementalChecker()
+	filename = str(tmp_pathplus / "source.py")
+
+	assert checker.check(filename) is None
+
+	_touch_later(tmp_pathplus / "source.py", testing_source_b)
+	assert checker.check(filename) == 1
+	assert checker.result(filename) == 1
+
+	# Unchanged since __all__ was added
+	assert checker.check(filename) is None
+
+	# Saved again without changes
+	_touch_later(tmp_pathplus / "source.py", (tmp_pathplus / "source.py").read_text())
+	assert checker.check(filename) is None
+
+	_touch_later(tmp_pathplus / "source.py", testing_source_e)
+	assert checker.check(filename) == 0
+
+	os.unlink(filename)
+	assert checker.check(filename) is None
+	assert checker.result(filename) is None
+
+
+def test_is_watched(tree: PathPlus):
+	watcher = Watcher([str(tree), str(tree.parent / "other.txt")])
+	assert watcher.is_watched(os.path.join(tree, "new.py"))
+	assert watcher.is_watched(os.path.join(tree, "sub", "new.py"))
+	assert watcher.is_watched(str(tree.parent / "other.txt"))
+	assert not watcher.is_watched(os.path.join(tree, "sub", "new.txt"))
+	assert not watcher.is_watched(os.path.join(tree, "__pycache__", "new.py"))
+	assert not watcher.is_watched(str(tree.parent / "new.py"))
+
+
+def test_is_watched_excluded(tree: PathPlus):
+	(tree / ".gitignore").write_text("ignored/\n")
+	exclude = (*DEFAULT_EXCLUDES, "sub/*_test.py")
+
+	watcher = Watcher([str(tree)], exclude=exclude)
+	assert watcher.is_watched(os.path.join(tree, "sub", "new.py"))
+	assert not watcher.is_watched(os.path.join(tree, "sub", "new_test.py"))
+	assert not watcher.is_watched(os.path.join(tree, "ignored", "new.py"))
+	assert not watcher.is_watched(os.path.join(tree, "__pycache__", "new.py"))
+
+	watcher = Watcher([str(tree)], exclude=exclude, gitignore=False)
+	assert watcher.is_watched(os.path.join(tree, "ignored", "new.py"))
+	assert not watcher.is_watched(os.path.join(tree, "sub", "new_test.py"))
+
+
+def _make_inotify_watcher(paths, **kwargs):
+	try:
+		return InotifyWatcher(paths, **kwargs)
+	except OSError:  # pragma: no cover
+		pytest.skip("inotify is not available.")
+
+
+watchers = pytest.mark.parametrize(
+		"make_watcher",
+		[
+				pytest.param(lambda paths, **kwargs: PollingWatcher(paths, interval=0.01, **kwargs), id="polling"),
+				pytest.param(
+						_make_inotify_watcher,
+						id="inotify",
+						marks=pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only"),
+						),
+				]
+		)
+
+
+@watchers
+def test_watch_files(tree: PathPlus, make_watcher):
+	watcher = make_watcher([str(tree)])
+	checked = watch_files([str(tree)], debounce=0.05, watcher=watcher)
+
+	assert next(checked) == (os.path.join(tree, "a.py"), 0)
+	assert next(checked) == (os.path.join(tree, "sub", "b.py"), 0)
+
+	_touch_later(tree / "sub" / "b.py", testing_source_b)
+	(tree / "new").mkdir()
+	_touch_later(tree / "new" / "c.py", testing_source_b)
+
+	assert sorted([next(checked), next(checked)]) == [
+			(os.path.join(tree, "new", "c.py"), 1),
+			(os.path.join(tree, "sub", "b.py"), 1),
+			]
+
+	checked.close()
+
+
+@watchers
+def test_watch_files_excluded(tree: PathPlus, make_watcher):
+	(tree / ".gitignore").write_text("ignored/\n")
+	(tree / "ignored").mkdir()
+	(tree / "ignored" / "f.py").write_text(testing_source_b)
+	(tree / "sub" / "b_test.py").write_text(testing_source_b)
+
+	watcher = make_watcher([str(tree)], exclude=(*DEFAULT_EXCLUDES, "*_test.py"))
+	checked = watch_files([str(tree)], debounce=0.05, watcher=watcher)
+
+	assert next(checked) == (os.path.join(tree, "a.py"), 0)
+	assert next(checked) == (os.path.join(tree, "sub", "b.py"), 0)
+
+	_touch_later(tree / "ignored" / "f.py", testing_source_e)
+	_touch_later(tree / "sub" / "b_test.py", testing_source_e)
+	(tree / "ignored" / "deeper").mkdir()
+	_touch_later(tree / "ignored" / "deeper" / "g.py", testing_source_b)
+	_touch_later(tree / "sub" / "b.py", testing_source_b)
+
+	assert next(checked) == (os.path.join(tree, "sub", "b.py"), 1)
+
+	checked.close()
+
+
+def test_main_watch(tree: PathPlus, monkeypatch):
+
+	def fake_watch_files(paths, **kwargs):
+		assert paths == [str(tree)]
+		assert kwargs["exclude"] == (*DEFAULT_EXCLUDES, "*_test.py")
+		assert kwargs["gitignore"] is False
+		yield os.path.join(tree, "a.py"), 0
+		raise KeyboardInterrupt
+
+	monkeypatch.setattr(watch, "watch_files", fake_watch_files)
+
+	runner = CliRunner()
+	result: Result = runner.invoke(
+			main,
+			catch_exceptions=False,
+			args=["--watch", "--exclude", "*_test.py", "--no-gitignore", str(tree)],
+			)
+	assert result.exit_code == 0
+	assert result.stdout == f"Checking {os.path.join(tree, 'a.py')}\n"